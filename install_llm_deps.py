@@ -25,6 +25,20 @@ def pip_install(req_file):
     else:
         print(f"⚠️  Archivo {req_file} no encontrado, se omite.")
 
+def convert_local_model():
+    """Con LOCAL_MODEL_PATH, deja los pesos del modelo local listos para cargarlos mapeados en memoria."""
+    output = os.getenv('LOCAL_MODEL_PATH', '')
+    if not output:
+        return False
+    if Path(output).is_dir():
+        print(f"📂 Modelo local ya convertido en {output}, se omite.")
+        return True
+    # El build no suele tener GPU: sin LOCAL_MODEL_DTYPE se guardaría en float32
+    dtype = os.getenv('LOCAL_MODEL_DTYPE') or 'float16'
+    print(f"🔄 Convirtiendo el modelo local a safetensors ({dtype}) en {output} ...")
+    subprocess.check_call([sys.executable, '-m', 'src.providers.local_model', '--output', output, '--dtype', dtype])
+    return True
+
 def parse_providers_from_env():
     env = os.getenv('LLM_PROVIDERS', '')
     if not env:
@@ -69,10 +83,13 @@ def main():
             installed.append(prov)
         else:
             print(f"⚠️  Opción desconocida: {prov}")
+    converted = 'local' in installed and convert_local_model()
     print("\n✅ Resumen de instalación:")
     print(f"- Core (FastAPI, DB, etc): instalado")
     for prov in installed:
         print(f"- {prov}: instalado")
+    if converted:
+        print(f"- modelo local: convertido en {os.getenv('LOCAL_MODEL_PATH')}")
     print("----------------------------------------------")
     print("¡Listo! Solo tienes lo necesario para tu flujo.")
 
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Exporta los mensajes guardados en PostgreSQL a NDJSON o Parquet en streaming.
+
+Uso:
+    python scripts/export_conversations.py -o mensajes.ndjson
+    python scripts/export_conversations.py --format parquet -o mensajes.parquet \\
+        --start 2024-01-01 --end 2024-07-01 --provider gemini
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+from datetime import datetime
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import get_settings
+from src.services import export_service
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Exportación masiva de mensajes")
+    parser.add_argument("-o", "--output", default="-", help="Archivo de salida ('-' para stdout)")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Desde (inclusive, ISO 8601)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Hasta (exclusive, ISO 8601)")
+    parser.add_argument("--provider", help="Solo conversaciones con respuestas de este proveedor")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Filas por bloque / row group")
+    parser.add_argument("--postgres-url", help="URL de la base de datos (por defecto POSTGRES_URL)")
+    return parser.parse_args(argv)
+
+async def run(args) -> int:
+    if args.format == "parquet" and not export_service.parquet_available():
+        print("La exportación a Parquet requiere pyarrow (pip install pyarrow)", file=sys.stderr)
+        return 1
+
+    from src.db import session as db_session
+    await db_session.init_db(args.postgres_url or get_settings().postgres_url, create_tables=False)
+
+    query = export_service.build_export_query(args.start, args.end, args.provider)
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        async for data in export_service.export_messages(
+            db_session.AsyncSessionLocal, args.format, query, args.chunk_size
+        ):
+            out.write(data)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        await db_session.close_db()
+    return 0
+
+def main():
+    sys.exit(asyncio.run(run(parse_args())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Importa mensajes históricos desde NDJSON a PostgreSQL.
+
+Cada línea es un mensaje en el formato de la exportación:
+    {"conversation_id": "...", "role": "user", "content": "Hola", "timestamp": "2024-01-01T10:00:00"}
+(`message_id`, `provider` y `model` son opcionales).
+
+Con --checkpoint la importación es reanudable: al volver a ejecutarla se saltan
+los bloques ya importados.
+
+Uso:
+    python scripts/import_conversations.py legacy.ndjson --checkpoint legacy.ckpt --workers 8
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from dataclasses import asdict
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import get_settings
+from src.services.import_service import BulkImporter
+
+def parse_args(argv=None):
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Importación masiva de mensajes")
+    parser.add_argument("input", help="Archivo NDJSON")
+    parser.add_argument("--checkpoint", help="Archivo de checkpoint para reanudar")
+    parser.add_argument("--chunk-size", type=int, default=settings.import_chunk_size, help="Líneas por bloque")
+    parser.add_argument("--workers", type=int, default=settings.import_workers, help="Bloques en paralelo")
+    parser.add_argument("--postgres-url", help="URL de la base de datos (por defecto POSTGRES_URL)")
+    return parser.parse_args(argv)
+
+async def run(args) -> int:
+    from src.db import session as db_session
+    await db_session.init_db(args.postgres_url or get_settings().postgres_url, create_tables=False)
+    try:
+        importer = BulkImporter(
+            db_session.AsyncSessionLocal,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint
+        )
+        stats = await importer.import_file(args.input)
+    finally:
+        await db_session.close_db()
+    print(json.dumps(asdict(stats), indent=2, ensure_ascii=False))
+    return 1 if stats.rejected else 0
+
+def main():
+    sys.exit(asyncio.run(run(parse_args())))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga end-to-end de POST /conversations/{id}/messages.
+
+Levanta la app FastAPI en el mismo proceso (transporte ASGI, sin red) contra
+sustitutos locales: SQLite en un archivo temporal en lugar de PostgreSQL y
+fakeredis en lugar de Redis. También acepta URLs de instancias efímeras reales
+(--postgres-url / --redis-url). El LLM es el proveedor `synthetic`, que recorre
+todo el pipeline del adapter con latencia configurable, para que las mediciones
+reflejen el camino de la petición y no el proveedor real.
+
+El reporte JSON incluye throughput, percentiles p50/p95/p99 y consultas SQL por
+turno, junto con el commit actual, para poder comparar entre commits:
+
+    python scripts/load_test.py --profile short -o before.json
+    python scripts/load_test.py --profile short --baseline before.json --max-regression 0.15
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import event
+
+from src.main import app
+from src.core.config import Settings, get_settings
+from src.db import session as db_session
+from src.providers.factory import get_current_llm_client, get_llm_client
+
+# Perfiles de carga: conversaciones totales, usuarios concurrentes y turnos por conversación
+PROFILES: Dict[str, Dict[str, int]] = {
+    "smoke": {"conversations": 10, "concurrency": 2, "turns": 2},
+    "short": {"conversations": 200, "concurrency": 16, "turns": 3},
+    "long": {"conversations": 40, "concurrency": 8, "turns": 20},
+    "burst": {"conversations": 400, "concurrency": 64, "turns": 2},
+}
+
+def synthetic_settings(args) -> Settings:
+    """Configuración del proveedor sintético usado durante la prueba."""
+    return get_settings().model_copy(update={
+        "llm_provider": "synthetic",
+        "synthetic_latency_ms": args.llm_latency_ms,
+        "synthetic_latency_distribution": args.latency_distribution,
+        "synthetic_tokens_per_second": args.tokens_per_second,
+        "synthetic_error_rate": args.error_rate,
+        "synthetic_seed": args.seed,
+    })
+
+class QueryCounter:
+    """Cuenta las sentencias SQL ejecutadas por el engine."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+async def setup_backends(args, workdir: str):
+    """Inicializa la base de datos y Redis (reales o sustitutos)."""
+    postgres_url = args.postgres_url or f"sqlite+aiosqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    await db_session.init_db(postgres_url)
+
+    if args.redis_url:
+        from redis.asyncio import Redis
+        app.state.redis = Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        try:
+            from fakeredis import FakeAsyncRedis
+            app.state.redis = FakeAsyncRedis(decode_responses=True)
+        except ImportError:
+            app.state.redis = None
+
+    counter = QueryCounter()
+    event.listen(db_session.engine.sync_engine, "before_cursor_execute", counter)
+    return counter
+
+async def run_profile(profile: Dict[str, int], settings: Settings, counter: QueryCounter) -> Dict[str, Any]:
+    llm = get_llm_client(settings)
+    app.dependency_overrides[get_current_llm_client] = lambda: llm
+    semaphore = asyncio.Semaphore(profile["concurrency"])
+    latencies: List[float] = []
+    errors = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        # Fase 1: crear conversaciones (no se mide)
+        async def create():
+            async with semaphore:
+                response = await client.post("/conversations")
+                response.raise_for_status()
+                return response.json()["id"]
+
+        conv_ids = await asyncio.gather(*(create() for _ in range(profile["conversations"])))
+
+        # Fase 2: turnos medidos
+        async def converse(conv_id: str):
+            nonlocal errors
+            async with semaphore:
+                for turn in range(profile["turns"]):
+                    start = time.perf_counter()
+                    response = await client.post(
+                        f"/conversations/{conv_id}/messages",
+                        json={"msg": {"role": "user", "content": f"Mi hijo tiene fiebre, turno {turn}"}}
+                    )
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        errors += 1
+
+        counter.count = 0
+        start = time.perf_counter()
+        await asyncio.gather(*(converse(conv_id) for conv_id in conv_ids))
+        elapsed = time.perf_counter() - start
+
+    app.dependency_overrides.pop(get_current_llm_client, None)
+    latencies.sort()
+    total_turns = len(latencies)
+    return {
+        "turns": total_turns,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total_turns / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "db_queries_per_turn": round(counter.count / total_turns, 2) if total_turns else 0.0,
+    }
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Devuelve la lista de regresiones respecto a un reporte anterior."""
+    regressions = []
+    for name, result in report["profiles"].items():
+        previous = baseline.get("profiles", {}).get(name)
+        if not previous:
+            continue
+        for key in ("p50", "p95", "p99"):
+            before, after = previous["latency_ms"][key], result["latency_ms"][key]
+            if before and after > before * (1 + max_regression):
+                regressions.append(f"{name}: {key} {before}ms -> {after}ms")
+        if result["db_queries_per_turn"] > previous["db_queries_per_turn"]:
+            regressions.append(
+                f"{name}: db_queries_per_turn {previous['db_queries_per_turn']} -> {result['db_queries_per_turn']}"
+            )
+        if previous["throughput_rps"] and result["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {result['throughput_rps']} rps")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga del endpoint de mensajes")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES), help="Perfil a ejecutar (repetible)")
+    parser.add_argument("--conversations", type=int, help="Perfil personalizado: número de conversaciones")
+    parser.add_argument("--concurrency", type=int, default=8, help="Perfil personalizado: usuarios concurrentes")
+    parser.add_argument("--turns", type=int, default=3, help="Perfil personalizado: turnos por conversación")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Latencia simulada del LLM")
+    parser.add_argument("--latency-distribution", choices=["fixed", "lognormal", "bursty"], default="fixed")
+    parser.add_argument("--tokens-per-second", type=float, help="Velocidad de generación simulada")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de error inyectado del LLM")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del proveedor sintético")
+    parser.add_argument("--postgres-url", help="Usar una base de datos real en lugar de SQLite")
+    parser.add_argument("--redis-url", help="Usar un Redis real en lugar de fakeredis")
+    parser.add_argument("-o", "--output", help="Archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--baseline", help="Reporte JSON anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Regresión relativa tolerada")
+    return parser.parse_args(argv)
+
+async def run(args) -> Dict[str, Any]:
+    profiles = {name: PROFILES[name] for name in (args.profile or [])}
+    if args.conversations:
+        profiles["custom"] = {
+            "conversations": args.conversations,
+            "concurrency": args.concurrency,
+            "turns": args.turns,
+        }
+    if not profiles:
+        profiles["smoke"] = PROFILES["smoke"]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        counter = await setup_backends(args, workdir)
+        try:
+            results = {}
+            for name, profile in profiles.items():
+                print(f"🏃 Ejecutando perfil {name}: {profile}", file=sys.stderr)
+                results[name] = {"config": profile, **await run_profile(profile, synthetic_settings(args), counter)}
+        finally:
+            if getattr(app.state, "redis", None) is not None:
+                await app.state.redis.aclose()
+            await db_session.close_db()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "database": "postgres" if args.postgres_url else "sqlite",
+        "llm": {
+            "latency_ms": args.llm_latency_ms,
+            "distribution": args.latency_distribution,
+            "tokens_per_second": args.tokens_per_second,
+            "error_rate": args.error_rate,
+        },
+        "profiles": results,
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_with_baseline(report, json.load(f), args.max_regression)
+        if regressions:
+            print("❌ Regresiones detectadas:", file=sys.stderr)
+            for regression in regressions:
+                print(f"   {regression}", file=sys.stderr)
+            return 1
+        print("✅ Sin regresiones respecto al baseline", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Ejecuta guiones de conversación (NDJSON) contra el chatbot para evaluación offline.
+
+Cada línea de entrada es un objeto JSON con la forma:
+    {"id": "caso-1", "provider": "gemini", "turns": ["Hola", "Tiene 3 años"]}
+
+Los resultados se escriben en NDJSON a medida que cada conversación termina.
+
+Uso:
+    python scripts/simulate_conversations.py guiones.ndjson -o resultados.ndjson --concurrency 8
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+
+# Agregar el directorio raíz al path para importar módulos
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import get_settings
+from src.services.simulation_service import ConversationSimulator, parse_simulation_scripts
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulación batch de conversaciones")
+    parser.add_argument("input", help="Archivo NDJSON con los guiones ('-' para stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Archivo NDJSON de salida ('-' para stdout)")
+    parser.add_argument("--provider", help="Proveedor por defecto para guiones sin 'provider'")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conversaciones simultáneas por proveedor")
+    parser.add_argument("--persist", action="store_true", help="Guardar las conversaciones en PostgreSQL")
+    return parser.parse_args(argv)
+
+async def run(args) -> int:
+    settings = get_settings()
+    if args.provider:
+        settings = settings.model_copy(update={"llm_provider": args.provider})
+
+    if args.input == "-":
+        scripts = parse_simulation_scripts(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            scripts = parse_simulation_scripts(f)
+
+    session_factory = None
+    if args.persist:
+        from src.db import session as db_session
+        await db_session.init_db(settings.postgres_url)
+        session_factory = db_session.AsyncSessionLocal
+
+    simulator = ConversationSimulator(
+        settings,
+        concurrency=args.concurrency,
+        persist=args.persist,
+        session_factory=session_factory
+    )
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    failed = 0
+    try:
+        async for result in simulator.run(scripts):
+            if result.status != "ok":
+                failed += 1
+            out.write(result.model_dump_json() + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if args.persist:
+            await db_session.close_db()
+
+    print(f"✅ {len(scripts) - failed}/{len(scripts)} conversaciones simuladas correctamente", file=sys.stderr)
+    return 1 if failed else 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        return asyncio.run(run(args))
+    except ValueError as e:
+        print(f"❌ {str(e)}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    exit(main())
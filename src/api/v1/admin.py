@@ -0,0 +1,426 @@
+# src/api/v1/admin.py
+from fastapi import APIRouter, Depends, Path, Query, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from dataclasses import asdict
+from datetime import datetime
+from typing import Literal, Optional
+from uuid import UUID
+from src.core import memory, profiling
+from src.db import partitions
+from src.db import session as db_session
+from src.core.config import get_settings, get_settings_manager
+from src.core.exceptions import APIError, ValidationError, NotFoundError
+from src.core.security import require_admin
+from src.cache.conversations import WORKER_ID
+from src.cache.versions import get_version_store
+from src.services import export_service
+from src.services.import_service import BulkImporter, Checkpoint, ImportBusyError, ImportJob, read_import_status
+from src.services.retention_service import RetentionWorker
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+ProfileFormat = Literal["collapsed", "speedscope"]
+GroupBy = Literal["module", "line"]
+
+async def _invalidate_etags(request: Request):
+    """Las operaciones masivas cambian historiales sin pasar por el servicio: invalidar todos los ETags."""
+    versions = get_version_store(request)
+    if versions:
+        await versions.safe_invalidate_all()
+
+def _check_profiler(seconds: float):
+    max_seconds = get_settings().profiling_max_seconds
+    if seconds > max_seconds:
+        raise ValidationError(f"seconds must be <= {max_seconds}")
+    if profiling.profiler_busy():
+        raise APIError(
+            code="PROFILER_BUSY",
+            message="Another profiling session is running",
+            status_code=status.HTTP_409_CONFLICT
+        )
+
+def _profile_response(profiler: profiling.SamplingProfiler, fmt: ProfileFormat, name: str, requests: Optional[int] = None):
+    headers = {"X-Profile-Samples": str(profiler.sample_count)}
+    if requests is not None:
+        headers["X-Profile-Requests"] = str(requests)
+    if fmt == "speedscope":
+        return JSONResponse(profiler.speedscope(name), headers=headers)
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
+
+@router.post(
+    "/profiling/cpu",
+    summary="Perfilar CPU del proceso durante N segundos",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def profile_cpu(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=100),
+    format: ProfileFormat = "collapsed"
+):
+    """
+    Muestrea las pilas de todos los hilos del worker durante `seconds` segundos
+    y devuelve las pilas en formato collapsed o JSON de speedscope.
+    """
+    _check_profiler(seconds)
+    profiler = await profiling.profile_for(seconds, interval_ms / 1000)
+    return _profile_response(profiler, format, f"cpu-{seconds:g}s")
+
+@router.post(
+    "/profiling/requests",
+    summary="Perfilar peticiones por conversación o ruta",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def profile_matching_requests(
+    conversation_id: Optional[UUID] = None,
+    route: Optional[str] = Query(None, description="Plantilla (/conversations/{conv_id}/messages) o path exacto"),
+    max_requests: Optional[int] = Query(None, ge=1),
+    seconds: float = Query(30, gt=0),
+    interval_ms: float = Query(2, ge=1, le=100),
+    format: ProfileFormat = "collapsed"
+):
+    """
+    Arma una captura y muestrea el event loop solo mientras ejecuta peticiones que
+    coinciden con `conversation_id` y/o `route`. Termina al completar `max_requests`
+    o al cumplirse la ventana de `seconds` segundos.
+    """
+    if not conversation_id and not route:
+        raise ValidationError("conversation_id or route is required")
+    _check_profiler(seconds)
+    profiler, matched = await profiling.profile_requests(
+        seconds,
+        interval_ms / 1000,
+        conversation_id=conversation_id,
+        route=route,
+        max_requests=max_requests
+    )
+    return _profile_response(profiler, format, f"requests-{conversation_id or route}", requests=matched)
+
+@router.get(
+    "/memory",
+    summary="Resumen de memoria del worker",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def memory_summary():
+    """
+    RSS del proceso, estado de tracemalloc, objetos en identity maps de SQLAlchemy
+    y adapters LLM vivos.
+    """
+    return memory.memory_stats()
+
+@router.post(
+    "/memory/tracemalloc/start",
+    summary="Activar tracemalloc",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def start_tracemalloc(frames: int = Query(1, ge=1, le=50)):
+    memory.start_tracing(frames)
+    return {"tracing": True, "frames": frames}
+
+@router.post(
+    "/memory/tracemalloc/stop",
+    summary="Desactivar tracemalloc",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def stop_tracemalloc():
+    memory.stop_tracing()
+    return {"tracing": False}
+
+@router.post(
+    "/memory/snapshots",
+    summary="Tomar un snapshot de tracemalloc",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def take_memory_snapshot(
+    group_by: GroupBy = "module",
+    limit: int = Query(20, ge=1, le=500)
+):
+    """
+    Toma un snapshot (se conservan los últimos cinco) y devuelve los principales
+    sitios de asignación agrupados por módulo o por línea.
+    """
+    try:
+        snapshot_id = memory.take_snapshot()
+    except RuntimeError as e:
+        raise ValidationError(f"{str(e)}. Call /admin/memory/tracemalloc/start first.")
+    return {
+        "id": snapshot_id,
+        "top": memory.top_allocations(snapshot_id, group_by, limit)
+    }
+
+@router.get(
+    "/memory/snapshots/{snapshot_id}/diff",
+    summary="Comparar dos snapshots de tracemalloc",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def diff_memory_snapshots(
+    snapshot_id: int,
+    base: int,
+    group_by: GroupBy = "module",
+    limit: int = Query(20, ge=1, le=500)
+):
+    """Crecimiento de memoria entre el snapshot `base` y `snapshot_id`."""
+    try:
+        diff = memory.diff_snapshots(snapshot_id, base, group_by, limit)
+    except KeyError as e:
+        raise NotFoundError(str(e.args[0]))
+    return {"id": snapshot_id, "base": base, "diff": diff}
+
+def _partition_engine():
+    if not db_session.engine or not partitions.is_postgres(db_session.engine):
+        raise ValidationError("Partition management requires PostgreSQL")
+    return db_session.engine
+
+def _check_partition_name(name: str):
+    try:
+        partitions.parse_partition_name(name)
+    except ValueError as e:
+        raise ValidationError(str(e))
+
+@router.get(
+    "/partitions",
+    summary="Listar particiones de messages",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def list_message_partitions():
+    """Particiones mensuales vinculadas y particiones archivadas en disco."""
+    engine = _partition_engine()
+    async with engine.connect() as conn:
+        attached = await partitions.list_partitions(conn)
+    return {
+        "attached": [{"name": p.name, "from": p.start, "to": p.end} for p in attached],
+        "archived": partitions.list_archives(get_settings().partition_archive_dir),
+    }
+
+@router.post(
+    "/partitions/{name}/archive",
+    summary="Archivar una partición fría",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def archive_message_partition(name: str, request: Request):
+    """
+    Desvincula la partición, exporta sus filas a un CSV comprimido en
+    `partition_archive_dir` y elimina la tabla.
+    """
+    _check_partition_name(name)
+    try:
+        result = await partitions.archive_partition(_partition_engine(), name, get_settings().partition_archive_dir)
+    except KeyError as e:
+        raise NotFoundError(str(e.args[0]))
+    await _invalidate_etags(request)
+    return result
+
+@router.post(
+    "/partitions/{name}/restore",
+    summary="Restaurar una partición archivada",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def restore_message_partition(name: str, request: Request):
+    """Recrea la partición desde su archivo y la vuelve a vincular a messages."""
+    _check_partition_name(name)
+    try:
+        result = await partitions.restore_partition(_partition_engine(), name, get_settings().partition_archive_dir)
+    except KeyError as e:
+        raise NotFoundError(str(e.args[0]))
+    except ValueError as e:
+        raise ValidationError(str(e))
+    await _invalidate_etags(request)
+    return result
+
+@router.get(
+    "/exports/messages",
+    summary="Exportar mensajes en NDJSON o Parquet",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def export_messages(
+    format: export_service.ExportFormat = "ndjson",
+    start: Optional[datetime] = Query(None, description="Desde (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Hasta (exclusive)"),
+    provider: Optional[str] = Query(None, description="Conversaciones con respuestas de este proveedor"),
+    chunk_size: int = Query(5000, ge=100, le=100000)
+):
+    """
+    Vuelca los mensajes guardados en Postgres, ordenados por conversación y fecha,
+    leyendo con un cursor del lado del servidor. La memoria usada es constante.
+    """
+    if not db_session.AsyncSessionLocal:
+        raise ValidationError("Database not initialized")
+    if format == "parquet" and not export_service.parquet_available():
+        raise ValidationError("Parquet export requires pyarrow")
+    query = export_service.build_export_query(start, end, provider)
+    return StreamingResponse(
+        export_service.export_messages(db_session.AsyncSessionLocal, format, query, chunk_size),
+        media_type=export_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="messages.{format}"'}
+    )
+
+@router.post(
+    "/imports/messages",
+    summary="Importar mensajes desde NDJSON",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"conversation_id": "uuid-string", "role": "user", "content": "Hola", "timestamp": "2024-01-01T10:00:00"}'
+                }
+            }
+        }
+    }
+)
+async def import_messages(
+    request: Request,
+    import_id: str = Query(..., pattern=r"^[A-Za-z0-9_-]{1,64}$", description="Reenviar con el mismo ID reanuda la importación")
+):
+    """
+    Importa mensajes en el formato de la exportación (una línea por mensaje),
+    en bloques paralelos. El cuerpo se guarda en disco y la importación sigue
+    en segundo plano: la respuesta (202) llega en cuanto termina la subida y el
+    avance se consulta en `GET /admin/imports/{import_id}`. Si la importación
+    se interrumpe, reenviar el mismo archivo con el mismo `import_id` salta los
+    bloques ya importados.
+    """
+    if not db_session.AsyncSessionLocal:
+        raise ValidationError("Database not initialized")
+    settings = get_settings()
+    job = ImportJob(settings.import_work_dir, import_id)
+    try:
+        job.acquire()
+    except ImportBusyError as e:
+        raise APIError(code="IMPORT_RUNNING", message=str(e), status_code=status.HTTP_409_CONFLICT)
+    try:
+        await job.receive(request.stream())
+        # Un checkpoint de otro archivo se rechaza ya, no en segundo plano
+        Checkpoint(job.checkpoint_path, job.data_path, settings.import_chunk_size)
+        importer = BulkImporter(
+            db_session.AsyncSessionLocal,
+            chunk_size=settings.import_chunk_size,
+            workers=settings.import_workers,
+            checkpoint_path=job.checkpoint_path
+        )
+        job.start(importer, on_finish=lambda: _invalidate_etags(request))
+    except ValueError as e:
+        job.release()
+        raise ValidationError(str(e))
+    except BaseException:
+        job.release()
+        raise
+    return JSONResponse(
+        {"import_id": import_id, "status": "running", "status_url": f"/admin/imports/{import_id}"},
+        status_code=status.HTTP_202_ACCEPTED
+    )
+
+@router.get("/imports/{import_id}", summary="Estado de una importación")
+async def import_status(import_id: str = Path(..., pattern=r"^[A-Za-z0-9_-]{1,64}$")):
+    """Estado de una importación lanzada con `POST /admin/imports/messages`: running, completed, failed o interrupted."""
+    result = read_import_status(get_settings().import_work_dir, import_id)
+    if result is None:
+        raise NotFoundError(f"Import {import_id} not found")
+    return result
+
+@router.post(
+    "/retention/run",
+    summary="Aplicar la política de retención",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def run_retention(
+    request: Request,
+    dry_run: bool = Query(True, description="Solo contar lo que se borraría o anonimizaría")
+):
+    """
+    Ejecuta un ciclo de la política de retención (`retention_days`,
+    `retention_mode`). Por defecto es un dry-run que solo cuenta candidatas.
+    """
+    settings = get_settings()
+    if not settings.retention_days:
+        raise ValidationError("Retention is not configured (RETENTION_DAYS)")
+    if not db_session.AsyncSessionLocal:
+        raise ValidationError("Database not initialized")
+    worker = RetentionWorker.from_settings(
+        db_session.AsyncSessionLocal,
+        settings,
+        versions=get_version_store(request),
+        redis=getattr(request.app.state, "redis", None)
+    )
+    if dry_run:
+        result = await worker.run_once(dry_run=True)
+    else:
+        result = await worker.run_exclusive(dry_run=False)
+        if result is None:
+            raise APIError(
+                code="RETENTION_RUNNING",
+                message="Another worker is running a retention cycle",
+                status_code=status.HTTP_409_CONFLICT
+            )
+    return {**asdict(result), "cutoff": result.cutoff.isoformat()}
+
+@router.post(
+    "/settings/reload",
+    summary="Recargar la configuración",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def reload_settings(request: Request):
+    """
+    Vuelve a leer entorno y `.env` en todos los workers y publica un snapshot
+    nuevo donde algo cambió. La petición se difunde por Redis; la respuesta
+    indica cuántos workers la aplicaron, cuáles la rechazaron y cuántos no
+    confirmaron a tiempo. Sin suscripción a Redis se recarga solo este worker.
+    Si la configuración nueva no es válida, se conserva la vigente.
+    """
+    manager = get_settings_manager()
+    subscriber = getattr(request.app.state, "settings_reload", None)
+    if subscriber is None or not subscriber.active:
+        try:
+            changed = manager.reload()
+        except ValueError as e:
+            raise ValidationError(f"Invalid settings, keeping version {manager.version}: {str(e)}")
+        return {
+            "version": manager.version,
+            "loaded_at": manager.loaded_at.isoformat(),
+            "changed": sorted(changed),
+            "workers": 1,
+            "applied": 1,
+            "failed": [],
+            "missing": 0
+        }
+
+    result = await subscriber.broadcast()
+    local = result.ack_for(WORKER_ID)
+    if local and local["error"]:
+        raise ValidationError(f"Invalid settings, keeping version {manager.version}: {local['error']}")
+    return {
+        "version": manager.version,
+        "loaded_at": manager.loaded_at.isoformat(),
+        "changed": local["changed"] if local else [],
+        "workers": result.workers,
+        "applied": len(result.applied),
+        "failed": [{"worker": ack["worker"], "error": ack["error"]} for ack in result.failed],
+        "missing": result.missing
+    }
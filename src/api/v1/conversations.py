@@ -1,18 +1,48 @@
 # src/api/v1/conversations.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, WebSocket, status
 from uuid import UUID
 from pydantic import BaseModel
 from typing import List
-from src.models.schemas import ConversationResponse, MessageResponse, MessageCreate, ConversationListItem
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError
+from src.models.schemas import ConversationResponse, MessageResponse, MessageCreate, ConversationListItem, ConversationUsage
 from src.services.conversation_service import ConversationService
-from src.db.session import get_repository
-from src.providers.factory import get_llm_client
+from src.services.chat_session import ChatSession
+from src.services.usage_service import conversation_usage_from_messages, get_usage_tracker
+from src.db.deps import conversation_repository_scope, get_conversation_cache, get_conversation_repository
+from src.db.session import get_session
+from src.providers.factory import get_current_llm_client
+from src.core.tracing import traced
+from src.core.admission import admit_request, check_rate_limit
+from src.core.config import get_settings
+from src.core.serialization import (
+    MSGPACK_RESPONSES, history_payload, listing_payload, negotiate, negotiated_response, not_modified, variant
+)
+from src.cache.versions import etag_matches, get_version_store
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
 
-# Dependency Injection: repositorio y cliente LLM
-def get_service(repo=Depends(get_repository), llm=Depends(get_llm_client)):
-    return ConversationService(repo, llm)
+# Dependency Injection: repositorio y cliente LLM de la configuración vigente
+def get_service(request: Request, repo=Depends(get_conversation_repository), llm=Depends(get_current_llm_client)):
+    redis_client = getattr(request.app.state, "redis", None)
+    cache = get_conversation_cache(request)
+    return ConversationService(
+        repo,
+        llm,
+        repo_scope=lambda: conversation_repository_scope(redis_client, cache),
+        usage=get_usage_tracker(request),
+        versions=get_version_store(request)
+    )
+
+async def _conditional_etag(request: Request, media_type: str, conv_id: UUID | None = None) -> str | None:
+    """ETag actual (una consulta a Redis), o None si no hay Redis."""
+    versions = get_version_store(request)
+    if versions is None:
+        return None
+    return await versions.safe_etag(conv_id, variant(media_type))
 
 @router.post(
     "",
@@ -23,6 +53,7 @@ def get_service(repo=Depends(get_repository), llm=Depends(get_llm_client)):
         "requestBody": None
     }
 )
+@traced("route.create_conversation")
 async def create_conversation(
     service: ConversationService = Depends(get_service)
 ):
@@ -52,54 +83,125 @@ async def create_conversation(
         }
     }
 )
+@traced("route.post_message")
 async def post_message(
     conv_id: UUID,
-    msg: MessageCreate,
+    request: Request,
+    msg: MessageCreate = Body(..., embed=True),
     service: ConversationService = Depends(get_service)
 ):
     """
     Envía un mensaje de rol 'user', obtiene la respuesta del LLM y la devuelve.
+    Las emergencias se responden de inmediato, sin pasar por la cola de
+    admisión (pero sí por el límite por cliente).
     """
+    await check_rate_limit(request, get_settings())
     try:
-        return await service.handle_message(conv_id, msg)
+        emergency = await service.safety_fast_path(conv_id, msg)
+        if emergency:
+            return emergency
+        async with admit_request(request, rate_limit=False) as queue_seconds:
+            return await service.handle_message(conv_id, msg, queue_seconds=queue_seconds)
     except KeyError:
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.websocket("/{conv_id}/ws")
+async def conversation_socket(websocket: WebSocket, conv_id: UUID, after: UUID | None = None):
+    """
+    Chat en vivo sobre la conversación: la respuesta llega en fragmentos y el
+    historial se mantiene en memoria mientras dura la conexión. Con `after`
+    (id del último mensaje recibido) solo se reenvían los mensajes posteriores.
+    Protocolo en src/services/chat_session.py.
+    """
+    redis_client = getattr(websocket.app.state, "redis", None)
+    cache = get_conversation_cache(websocket)
+    service = ConversationService(
+        None,
+        get_current_llm_client(),
+        repo_scope=lambda: conversation_repository_scope(redis_client, cache),
+        usage=get_usage_tracker(websocket),
+        versions=get_version_store(websocket)
+    )
+    await ChatSession(websocket, conv_id, service).run(after)
+
 @router.get(
     "/{conv_id}/history",
     response_model=ConversationResponse,
     summary="Obtener historial",
+    responses=MSGPACK_RESPONSES,
     openapi_extra={
         "requestBody": None
     }
 )
+@traced("route.get_history")
 async def get_history(
     conv_id: UUID,
+    request: Request,
     service: ConversationService = Depends(get_service)
 ):
     """
     Recupera todo el historial de mensajes de la conversación.
+    Con `Accept: application/msgpack` la respuesta se codifica en MessagePack.
+    Con `If-None-Match` y el ETag de la última respuesta, devuelve 304 sin
+    cargar los mensajes si la conversación no cambió.
     """
+    media_type = negotiate(request.headers.get("accept"))
+    etag = await _conditional_etag(request, media_type, conv_id)
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
     try:
-        conv = await service.get_conversation(conv_id)
-        return ConversationResponse(
-            id=conv.id,
-            messages=[MessageResponse.from_orm(msg) for msg in conv.messages]
-        )
+        rows = await service.get_history_rows(conv_id)
     except KeyError:
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
+    headers = {"ETag": etag} if etag else None
+    return negotiated_response(request, history_payload(conv_id, rows), headers, media_type)
+
+@router.get(
+    "/{conv_id}/usage",
+    response_model=ConversationUsage,
+    summary="Consumo de tokens y latencia de la conversación",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+@traced("route.get_usage")
+async def get_usage(
+    conv_id: UUID,
+    request: Request,
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Tokens, latencia del proveedor y espera en cola de las respuestas del
+    asistente, en total y por fase de la conversación.
+    """
+    tracker = get_usage_tracker(request)
+    usage = await tracker.conversation_usage(conv_id) if tracker else None
+    if usage is None:
+        usage = await conversation_usage_from_messages(session, conv_id)
+        if usage is None:
+            raise HTTPException(status_code=404, detail="Conversación no encontrada")
+        # El agregado expiró: se guarda el recalculado para las consultas siguientes
+        if tracker and usage.totals.messages:
+            try:
+                await tracker.store(usage)
+            except RedisError as e:
+                logger.warning(f"Recomputed usage not stored for conversation {conv_id}: {str(e)}")
+    return usage
 
 @router.get(
     "",
     response_model=List[ConversationListItem],
     summary="Listar todas las conversaciones",
+    responses=MSGPACK_RESPONSES,
     openapi_extra={
         "requestBody": None
     }
 )
+@traced("route.list_conversations")
 async def list_conversations(
+    request: Request,
     service: ConversationService = Depends(get_service)
 ):
     """
@@ -107,5 +209,13 @@ async def list_conversations(
     - ID de la conversación
     - Cantidad de mensajes
     - Timestamp del último mensaje
+
+    Con `Accept: application/msgpack` la respuesta se codifica en MessagePack.
+    Admite `If-None-Match` como el historial.
     """
-    return await service.list_conversations()
+    media_type = negotiate(request.headers.get("accept"))
+    etag = await _conditional_etag(request, media_type)
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    headers = {"ETag": etag} if etag else None
+    return negotiated_response(request, listing_payload(await service.list_summary_rows()), headers, media_type)
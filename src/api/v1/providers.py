@@ -1,9 +1,12 @@
 # src/api/v1/providers.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request, status
+from typing import List, Dict
 from pydantic import BaseModel
-from src.providers.factory import get_available_providers, get_llm_client
-from src.core.config import get_settings, Settings
+from src.core.config import get_settings
+from src.providers.health import ProviderStatus, get_health_monitor
+from src.models.schemas import ProviderUsage
+from src.services.usage_service import get_usage_tracker
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,12 +19,29 @@ class ProviderInfo(BaseModel):
     configured: bool
     model: str | None = None
     temperature: float | None = None
+    status: str = "unknown"
+    latency_ms: Dict[str, float] | None = None
+    last_checked: datetime | None = None
+    last_error: str | None = None
 
 class ProviderListResponse(BaseModel):
     providers: List[ProviderInfo]
     current_provider: str
     total_available: int
 
+def _provider_info(provider: ProviderStatus) -> ProviderInfo:
+    return ProviderInfo(
+        name=provider.name,
+        available=True,
+        configured=provider.configured,
+        model=provider.model,
+        temperature=provider.temperature,
+        status=provider.status,
+        latency_ms=provider.latency_stats(),
+        last_checked=provider.last_checked,
+        last_error=provider.last_error
+    )
+
 @router.get(
     "",
     response_model=ProviderListResponse,
@@ -32,48 +52,15 @@ class ProviderListResponse(BaseModel):
 )
 async def list_providers():
     """
-    Lista todos los proveedores LLM disponibles y su estado de configuración.
+    Lista todos los proveedores LLM disponibles, su estado de configuración y
+    su salud según el último sondeo del monitor (no llama a los proveedores).
     """
-    try:
-        settings = get_settings()
-        available_providers = get_available_providers()
-        
-        providers_info = []
-        for provider_name in available_providers:
-            # Verificar si está configurado
-            configured = False
-            model = None
-            temperature = None
-            
-            try:
-                # Intentar crear el adapter para verificar configuración
-                adapter = get_llm_client(settings)
-                configured = True
-                model = settings.llm_model
-                temperature = settings.llm_temperature
-            except Exception as e:
-                logger.warning(f"Provider {provider_name} not properly configured: {str(e)}")
-            
-            providers_info.append(ProviderInfo(
-                name=provider_name,
-                available=True,
-                configured=configured,
-                model=model,
-                temperature=temperature
-            ))
-        
-        return ProviderListResponse(
-            providers=providers_info,
-            current_provider=settings.llm_provider,
-            total_available=len([p for p in providers_info if p.configured])
-        )
-        
-    except Exception as e:
-        logger.error(f"Error listing providers: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error listing providers: {str(e)}"
-        )
+    providers_info = [_provider_info(p) for p in get_health_monitor().snapshot()]
+    return ProviderListResponse(
+        providers=providers_info,
+        current_provider=get_settings().llm_provider,
+        total_available=len([p for p in providers_info if p.configured])
+    )
 
 @router.get(
     "/health",
@@ -84,28 +71,38 @@ async def list_providers():
 )
 async def health_check():
     """
-    Verifica la salud de todos los proveedores configurados.
+    Salud del proveedor activo según el último sondeo del monitor. Responde
+    503 si el proveedor está caído o todavía no se ha sondeado.
     """
-    try:
-        settings = get_settings()
-        adapter = get_llm_client(settings)
-        
-        # Test simple de salud
-        test_message = "Hola"
-        test_context = []
-        
-        # Intentar generar una respuesta simple
-        response = await adapter.generate(test_context)
-        
-        return {
-            "status": "healthy",
-            "provider": settings.llm_provider,
-            "message": "Provider is responding correctly"
-        }
-        
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+    settings = get_settings()
+    provider = get_health_monitor().status(settings.llm_provider)
+    if provider.status != "healthy":
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Provider health check failed: {str(e)}"
+            detail=f"Provider health check failed: {provider.last_error or provider.status}"
         )
+    return {
+        "status": "healthy",
+        "provider": settings.llm_provider,
+        "message": "Provider is responding correctly",
+        "latency_ms": provider.latency_stats(),
+        "last_checked": provider.last_checked
+    }
+
+@router.get(
+    "/usage",
+    response_model=List[ProviderUsage],
+    summary="Consumo de tokens y latencia por proveedor y modelo",
+    openapi_extra={
+        "requestBody": None
+    }
+)
+async def provider_usage(request: Request):
+    """
+    Tokens, latencia del proveedor y espera en cola acumulados por proveedor y
+    modelo, en total y por fase. Se mantienen de forma incremental en Redis.
+    """
+    tracker = get_usage_tracker(request)
+    if tracker is None:
+        return []
+    return await tracker.provider_usage()
@@ -0,0 +1,77 @@
+# src/api/v1/simulations.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from src.core.config import get_settings
+from src.core.security import require_admin
+from src.db import session as db_session
+from src.services.simulation_service import ConversationSimulator, parse_simulation_scripts
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cada guion hace llamadas de pago al proveedor sin pasar por la admisión ni los
+# límites de peticiones: solo para administradores
+router = APIRouter(prefix="/simulations", tags=["simulations"], dependencies=[Depends(require_admin)])
+
+async def _read_body(request: Request, limit: int) -> bytes:
+    """Cuerpo completo de la petición; 413 si supera `limit` bytes."""
+    too_large = HTTPException(status_code=413, detail=f"El cuerpo supera {limit} bytes")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+@router.post(
+    "",
+    summary="Simular conversaciones en lote",
+    response_class=StreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/x-ndjson": {
+                    "example": '{"id": "caso-1", "turns": ["Hola, mi niño tiene fiebre", "Tiene 3 años"]}\n'
+                }
+            }
+        }
+    }
+)
+async def simulate_conversations(
+    request: Request,
+    persist: bool = Query(False, description="Guardar las conversaciones en la base de datos"),
+    concurrency: int = Query(4, ge=1, le=64, description="Conversaciones simultáneas por proveedor")
+):
+    """
+    Recibe guiones NDJSON (`{"id", "provider", "turns": [...]}` por línea), los ejecuta
+    con concurrencia acotada por proveedor y devuelve un resultado NDJSON por
+    conversación a medida que termina.
+    """
+    settings = get_settings()
+    body = await _read_body(request, settings.simulation_max_body_bytes)
+    try:
+        scripts = parse_simulation_scripts(body.decode("utf-8").splitlines())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(scripts) > settings.simulation_max_scripts:
+        raise HTTPException(status_code=400, detail=f"Como máximo {settings.simulation_max_scripts} guiones por petición")
+
+    if persist and not db_session.AsyncSessionLocal:
+        raise HTTPException(status_code=503, detail="Base de datos no inicializada")
+
+    simulator = ConversationSimulator(
+        settings,
+        concurrency=concurrency,
+        persist=persist,
+        session_factory=db_session.AsyncSessionLocal
+    )
+    logger.info(f"Starting simulation of {len(scripts)} scripts (persist={persist}, concurrency={concurrency})")
+
+    async def stream_results():
+        async for result in simulator.run(scripts):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
@@ -0,0 +1,368 @@
+# src/cache/conversations.py
+"""
+Caché en memoria del worker para las conversaciones usadas recientemente.
+
+`CachedConversationRepository` envuelve el repositorio de la petición. get()
+sirve el historial desde memoria y add_message() actualiza la entrada después
+de guardar. Así, los turnos siguientes de una conversación que vuelven al mismo
+worker no consultan el historial. Cada entrada guarda también el análisis
+clínico del adapter, que se actualiza mensaje a mensaje (`context_info`).
+
+La caché es LRU y tiene dos límites: número de entradas y memoria estimada.
+Cada entrada caduca a los `ttl` segundos por si se pierde una invalidación.
+Cuando se agrega un mensaje, VersionStore.touch() publica el cambio en el canal
+`conv:invalidate` de Redis, en el mismo pipeline que sube la versión.
+`ConversationCacheSubscriber` descarta las entradas afectadas en los demás
+workers; el que escribió ya tiene su entrada al día. Sin suscripción activa la
+caché no se usa, y al reconectarse se vacía porque pudo perder avisos.
+
+Una invalidación que llega mientras get() carga la conversación del repositorio
+interno no debe quedar pisada por esa carga: get() toma `generation()` antes de
+cargar y put() descarta el resultado si la conversación se invalidó después.
+"""
+import asyncio
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
+import logging
+
+import redis.asyncio as redis
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.core.config import Settings
+from src.core.metrics import CONVERSATION_CACHE_EVICTIONS, CONVERSATION_CACHE_REQUESTS, CONVERSATION_CACHE_SIZE
+from src.db.repository import ConversationRepository, MessageRow, SummaryRow
+from src.models.schemas import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "conv:invalidate"
+# Identifica a este proceso en los avisos que publica
+WORKER_ID = uuid4().hex
+
+# Estimación de memoria por mensaje (objeto del ORM, estado y lista) y por entrada
+_MESSAGE_OVERHEAD = 800
+_ENTRY_OVERHEAD = 1200
+
+# Invalidaciones recordadas para descartar cargas en curso; al superarlo se
+# olvidan todas y se descartan todas las cargas en curso
+_MAX_TRACKED_INVALIDATIONS = 10000
+
+_MESSAGE_COLUMNS = [column.name for column in Message.__table__.columns if column.name != "conversation_id"]
+
+# Actualiza el análisis de contexto con un mensaje (BaseLLMAdapter.update_context_info)
+ContextUpdate = Callable[[Optional[Dict[str, Any]], Optional[Message]], Dict[str, Any]]
+
+def detached_copy(message: Message) -> Message:
+    """Copia de un mensaje sin sesión ni conversación asociadas."""
+    return Message(**{name: getattr(message, name) for name in _MESSAGE_COLUMNS})
+
+def invalidation_payload(conversation_ids: Optional[Iterable[UUID]], origin: Optional[str] = None) -> str:
+    """
+    Aviso de invalidación: `<origen> <id> <id>...`. `*` en lugar de los IDs
+    invalida todas las conversaciones. Sin origen (`-`) se invalida también en
+    el worker que publica.
+    """
+    ids = "*" if conversation_ids is None else " ".join(str(i) for i in conversation_ids)
+    return f"{origin or '-'} {ids}"
+
+def _message_size(message: Message) -> int:
+    return _MESSAGE_OVERHEAD + sys.getsizeof(message.content or "")
+
+@dataclass
+class CachedConversation:
+    created_at: Optional[datetime]
+    messages: List[Message]
+    size: int
+    expires_at: float
+    # Análisis de contexto y cuántos mensajes incluye
+    context_info: Optional[Dict[str, Any]] = None
+    analyzed: int = 0
+
+class ConversationCache:
+    """
+    Args:
+        max_entries: Conversaciones en memoria como máximo
+        max_bytes: Memoria estimada máxima; una conversación más grande no se guarda
+        ttl: Segundos de vida de cada entrada
+    """
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        # Solo se usa mientras hay suscripción a las invalidaciones
+        self.active = False
+        self.bytes = 0
+        self._entries: "OrderedDict[UUID, CachedConversation]" = OrderedDict()
+        # Contador de invalidaciones y en qué valor se invalidó cada conversación
+        self._generation = 0
+        self._invalidated: Dict[UUID, int] = {}
+        self._cleared_at = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ConversationCache":
+        return cls(
+            max_entries=settings.conversation_cache_max_entries,
+            max_bytes=int(settings.conversation_cache_max_mb * 1024 * 1024),
+            ttl=settings.conversation_cache_ttl_seconds
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, conversation_id: UUID) -> Optional[CachedConversation]:
+        if not self.active:
+            return None
+        entry = self._entries.get(conversation_id)
+        if entry is not None and entry.expires_at <= self.clock():
+            self._drop(conversation_id, "expired")
+            entry = None
+        CONVERSATION_CACHE_REQUESTS.labels(result="miss" if entry is None else "hit").inc()
+        if entry is not None:
+            self._entries.move_to_end(conversation_id)
+        return entry
+
+    def generation(self) -> int:
+        """Valor a pasar a put() para una carga que empieza ahora."""
+        return self._generation
+
+    def _stale(self, conversation_id: UUID, generation: int) -> bool:
+        return self._cleared_at > generation or self._invalidated.get(conversation_id, -1) > generation
+
+    def put(
+        self,
+        conversation_id: UUID,
+        created_at: Optional[datetime],
+        messages: Iterable[Message],
+        generation: Optional[int] = None
+    ):
+        """
+        Guarda copias de los mensajes de la conversación, desplazando las menos
+        recientes si hace falta. Con `generation` (tomada antes de cargar los
+        mensajes) no guarda nada si la conversación se invalidó desde entonces.
+        """
+        if not self.active:
+            return
+        if generation is not None and self._stale(conversation_id, generation):
+            return
+        self._drop(conversation_id)
+        messages = [detached_copy(m) for m in messages]
+        size = _ENTRY_OVERHEAD + sum(_message_size(m) for m in messages)
+        if size > self.max_bytes:
+            return
+        self._entries[conversation_id] = CachedConversation(created_at, messages, size, self.clock() + self.ttl)
+        self.bytes += size
+        self._evict()
+
+    def append(self, conversation_id: UUID, message: Message):
+        """
+        Agrega a la entrada un mensaje ya guardado. Sin entrada, lo anota como
+        invalidación: una carga en curso en este worker pudo leer el historial
+        sin el mensaje (los avisos propios por pub/sub se ignoran).
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            self._mark_invalidated(conversation_id)
+            return
+        entry.messages.append(detached_copy(message))
+        size = _message_size(message)
+        entry.size += size
+        self.bytes += size
+        self._evict()
+
+    def context_info(self, conversation_id: UUID, update: ContextUpdate) -> Optional[Dict[str, Any]]:
+        """Análisis de contexto de la conversación, incorporando solo los mensajes nuevos desde la última vez."""
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return None
+        if entry.context_info is None:
+            entry.context_info = update(None, None)
+        for message in entry.messages[entry.analyzed:]:
+            update(entry.context_info, message)
+        entry.analyzed = len(entry.messages)
+        return entry.context_info
+
+    def _mark_invalidated(self, *conversation_ids: UUID):
+        self._generation += 1
+        if len(self._invalidated) > _MAX_TRACKED_INVALIDATIONS:
+            self._invalidated.clear()
+            self._cleared_at = self._generation
+        for conversation_id in conversation_ids:
+            self._invalidated[conversation_id] = self._generation
+
+    def invalidate(self, conversation_ids: Iterable[UUID]):
+        conversation_ids = list(conversation_ids)
+        self._mark_invalidated(*conversation_ids)
+        for conversation_id in conversation_ids:
+            self._drop(conversation_id, "invalidated")
+
+    def clear(self):
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._invalidated.clear()
+        if self._entries:
+            CONVERSATION_CACHE_EVICTIONS.labels(reason="cleared").inc(len(self._entries))
+        self._entries.clear()
+        self.bytes = 0
+        self._update_size()
+
+    def _drop(self, conversation_id: UUID, reason: Optional[str] = None):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        if reason:
+            CONVERSATION_CACHE_EVICTIONS.labels(reason=reason).inc()
+        self._update_size()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            reason = "size" if len(self._entries) > self.max_entries else "memory"
+            _, entry = self._entries.popitem(last=False)
+            self.bytes -= entry.size
+            CONVERSATION_CACHE_EVICTIONS.labels(reason=reason).inc()
+        self._update_size()
+
+    def _update_size(self):
+        CONVERSATION_CACHE_SIZE.labels(unit="entries").set(len(self._entries))
+        CONVERSATION_CACHE_SIZE.labels(unit="bytes").set(self.bytes)
+
+class CachedConversationRepository(ConversationRepository):
+    """
+    Repositorio con la caché del worker delante de get() e history_rows().
+
+    Nunca entrega objetos de la sesión del repositorio interno: get() devuelve
+    una conversación nueva, fuera de la sesión, y add_message() guarda una copia
+    del mensaje. Así, los mensajes que el servicio agrega a esa conversación no
+    pasan a la sesión de SQLAlchemy.
+    """
+    # Origen de los avisos de invalidación de las escrituras hechas por este repositorio
+    origin = WORKER_ID
+
+    def __init__(self, inner: ConversationRepository, cache: ConversationCache):
+        self.inner = inner
+        self.cache = cache
+
+    async def get(self, conversation_id: UUID) -> Optional[Conversation]:
+        entry = self.cache.get(conversation_id)
+        if entry is None:
+            generation = self.cache.generation()
+            conversation = await self.inner.get(conversation_id)
+            if conversation is None:
+                return None
+            self.cache.put(conversation_id, conversation.created_at, conversation.messages, generation)
+            created_at, messages = conversation.created_at, [detached_copy(m) for m in conversation.messages]
+        else:
+            created_at, messages = entry.created_at, list(entry.messages)
+        result = Conversation(id=conversation_id, created_at=created_at)
+        set_committed_value(result, "messages", messages)
+        return result
+
+    async def exists(self, conversation_id: UUID) -> bool:
+        return self.cache.get(conversation_id) is not None or await self.inner.exists(conversation_id)
+
+    async def create(self, conversation: Conversation) -> Conversation:
+        conversation = await self.inner.create(conversation)
+        self.cache.put(conversation.id, conversation.created_at, [])
+        return conversation
+
+    async def add_message(self, conversation_id: UUID, message: Message) -> Message:
+        if message.id is None:
+            message.id = uuid4()
+        if message.timestamp is None:
+            message.timestamp = datetime.utcnow()
+        await self.inner.add_message(conversation_id, detached_copy(message))
+        self.cache.append(conversation_id, message)
+        return message
+
+    async def list_all(self) -> List[Conversation]:
+        return await self.inner.list_all()
+
+    async def history_rows(self, conversation_id: UUID) -> Optional[List[MessageRow]]:
+        entry = self.cache.get(conversation_id)
+        if entry is None:
+            return await self.inner.history_rows(conversation_id)
+        return [(m.id, m.role, m.content, m.timestamp) for m in entry.messages]
+
+    async def list_summaries(self) -> List[SummaryRow]:
+        return await self.inner.list_summaries()
+
+class ConversationCacheSubscriber:
+    """
+    Escucha `conv:invalidate` y descarta las entradas que otros workers (o las
+    tareas de mantenimiento) modificaron. Activa la caché mientras está suscrito.
+
+    Args:
+        redis_client: Cliente Redis
+        cache: Caché del worker
+        retry_interval: Segundos entre reintentos de suscripción
+    """
+    def __init__(self, redis_client: redis.Redis, cache: ConversationCache, retry_interval: float = 1.0):
+        self.redis = redis_client
+        self.cache = cache
+        self.retry_interval = retry_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def handle(self, data):
+        payload = data.decode() if isinstance(data, bytes) else data
+        origin, _, ids = payload.partition(" ")
+        if origin == WORKER_ID:
+            return
+        if ids == "*":
+            self.cache.clear()
+            return
+        try:
+            self.cache.invalidate([UUID(i) for i in ids.split()])
+        except ValueError:
+            logger.warning(f"Ignoring malformed cache invalidation: {payload}")
+
+    async def run(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Los avisos publicados mientras no había suscripción se perdieron
+                self.cache.clear()
+                self.cache.active = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Conversation cache invalidation feed lost: {str(e)}")
+            finally:
+                self.cache.active = False
+                self.cache.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="conversation-cache-subscriber")
+        logger.info(
+            f"Conversation cache started (entries={self.cache.max_entries}, "
+            f"bytes={self.cache.max_bytes}, ttl={self.cache.ttl}s)"
+        )
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,3 +1,4 @@
+import asyncio
 import redis.asyncio as redis
 from src.core.config import get_settings
 
@@ -6,5 +7,11 @@ async def init_redis():
     redis_client = redis.from_url(settings.redis_url)
     return redis_client
 
+async def warm_up_redis(redis_client: redis.Redis, connections: int):
+    """Abre `connections` conexiones del pool con PINGs concurrentes."""
+    if connections <= 0:
+        return
+    await asyncio.gather(*(redis_client.ping() for _ in range(connections)))
+
 async def close_redis(redis_client: redis.Redis):
-    await redis_client.close() 
\ No newline at end of file
+    await redis_client.close()
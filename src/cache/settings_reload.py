@@ -0,0 +1,168 @@
+# src/cache/settings_reload.py
+"""
+Recarga de la configuración en todos los workers.
+
+`POST /admin/settings/reload` llega a un solo worker. Para que todos apliquen
+la misma configuración, el endpoint publica la petición en el canal
+`settings:reload` de Redis y cada worker (incluido el que la publica) llama a
+`SettingsManager.reload()` y responde en `settings:reload:ack:<id>` con su
+versión, los campos cambiados o el error de validación. El endpoint espera las
+respuestas hasta `ack_timeout` segundos e informa de cuántos workers aplicaron
+la recarga.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+import logging
+
+import redis.asyncio as redis
+
+from src.cache.conversations import WORKER_ID
+from src.core.config import Settings, SettingsManager
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHANNEL = "settings:reload"
+
+def _ack_channel(request_id: str) -> str:
+    return f"{RELOAD_CHANNEL}:ack:{request_id}"
+
+def _decode(data) -> str:
+    return data.decode() if isinstance(data, bytes) else data
+
+@dataclass
+class BroadcastResult:
+    """Resultado de una recarga difundida: suscriptores alcanzados y respuestas recibidas."""
+    workers: int
+    acks: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def applied(self) -> List[Dict[str, Any]]:
+        return [ack for ack in self.acks if not ack.get("error")]
+
+    @property
+    def failed(self) -> List[Dict[str, Any]]:
+        return [ack for ack in self.acks if ack.get("error")]
+
+    @property
+    def missing(self) -> int:
+        return max(self.workers - len(self.acks), 0)
+
+    def ack_for(self, worker: str) -> Optional[Dict[str, Any]]:
+        return next((ack for ack in self.acks if ack.get("worker") == worker), None)
+
+class SettingsReloadSubscriber:
+    """
+    Escucha `settings:reload`, recarga la configuración del worker y confirma
+    el resultado. `active` indica si la suscripción está establecida; sin ella
+    el endpoint recarga solo el worker local.
+
+    Args:
+        redis_client: Cliente Redis
+        manager: Configuración del worker
+        ack_timeout: Segundos que `broadcast()` espera las confirmaciones
+        retry_interval: Segundos entre reintentos de suscripción
+    """
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        manager: SettingsManager,
+        ack_timeout: float = 5.0,
+        retry_interval: float = 1.0
+    ):
+        self.redis = redis_client
+        self.manager = manager
+        self.ack_timeout = ack_timeout
+        self.retry_interval = retry_interval
+        self.active = False
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, redis_client: redis.Redis, manager: SettingsManager, settings: Settings) -> "SettingsReloadSubscriber":
+        return cls(redis_client, manager, ack_timeout=settings.settings_reload_ack_timeout_seconds)
+
+    def apply(self) -> Dict[str, Any]:
+        """Recarga el worker local y devuelve la confirmación a publicar."""
+        ack: Dict[str, Any] = {"worker": WORKER_ID, "changed": [], "error": None}
+        try:
+            ack["changed"] = sorted(self.manager.reload())
+        except ValueError as e:
+            logger.error(f"Settings reload failed, keeping version {self.manager.version}: {str(e)}")
+            ack["error"] = str(e)
+        ack["version"] = self.manager.version
+        ack["loaded_at"] = self.manager.loaded_at.isoformat()
+        return ack
+
+    async def handle(self, data):
+        request_id = _decode(data)
+        ack = self.apply()
+        await self.redis.publish(_ack_channel(request_id), json.dumps(ack))
+
+    async def run(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(RELOAD_CHANNEL)
+                self.active = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Settings reload feed lost: {str(e)}")
+            finally:
+                self.active = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(self.retry_interval)
+
+    async def broadcast(self) -> BroadcastResult:
+        """
+        Pide la recarga a todos los workers suscritos y espera sus confirmaciones
+        hasta `ack_timeout`. Los que no respondan a tiempo cuentan como `missing`.
+        """
+        request_id = uuid4().hex
+        pubsub = self.redis.pubsub()
+        try:
+            # Suscribirse antes de publicar para no perder confirmaciones rápidas
+            await pubsub.subscribe(_ack_channel(request_id))
+            result = BroadcastResult(workers=await self.redis.publish(RELOAD_CHANNEL, request_id))
+            deadline = time.monotonic() + self.ack_timeout
+            while len(result.acks) < result.workers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is None or message["type"] != "message":
+                    continue
+                try:
+                    result.acks.append(json.loads(_decode(message["data"])))
+                except ValueError:
+                    logger.warning(f"Ignoring malformed settings reload ack: {message['data']!r}")
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+        if result.missing:
+            logger.warning(f"Settings reload: {result.missing} of {result.workers} workers did not confirm")
+        return result
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="settings-reload-subscriber")
+        logger.info(f"Settings reload subscriber started (channel={RELOAD_CHANNEL})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
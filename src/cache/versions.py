@@ -0,0 +1,138 @@
+# src/cache/versions.py
+"""
+Versiones en Redis para ETags y GET condicionales del historial y el listado.
+
+- `version:conv:{id}`: cambia con cada mensaje de la conversación
+- `version:conversations`: cambia al crear una conversación o agregar cualquier
+  mensaje (el listado muestra número de mensajes y fecha del último)
+- `version:epoch`: cambia con operaciones masivas (importación, archivado o
+  restauración de particiones) e invalida todos los ETags a la vez
+
+Cada cambio se publica además en `conv:invalidate`, en el mismo pipeline, para
+la caché en memoria de los workers (ver src/cache/conversations.py).
+
+Una clave que no existe (nueva, expirada o perdida en un reinicio de Redis) se
+crea con un valor aleatorio en lugar de 0, así que nunca se vuelve a emitir un
+ETag que un cliente pueda tener guardado para otro contenido. La versión se lee
+antes de cargar los datos y se incrementa después de escribirlos: en caso de
+carrera el ETag queda por detrás del contenido y el cliente recibe un 200 de
+más, nunca un 304 indebido.
+"""
+import random
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+import logging
+
+import redis.asyncio as redis
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from src.cache.conversations import INVALIDATION_CHANNEL, invalidation_payload
+from src.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+LISTING_KEY = "version:conversations"
+EPOCH_KEY = "version:epoch"
+
+def _conversation_key(conversation_id) -> str:
+    return f"version:conv:{conversation_id}"
+
+def _initial_version() -> int:
+    return random.getrandbits(48)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Comparación débil de If-None-Match (RFC 9110): ignora el prefijo W/. `*` no
+    cuenta como coincidencia, porque sin cargar los datos no se sabe si la
+    conversación existe.
+    """
+    if not if_none_match:
+        return False
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+class VersionStore:
+    def __init__(self, redis_client: redis.Redis, conversation_ttl: int = 30 * 86400):
+        self.redis = redis_client
+        self.conversation_ttl = conversation_ttl
+
+    def _ensure(self, pipe, key: str, ttl: Optional[int] = None):
+        pipe.set(key, _initial_version(), nx=True, ex=ttl)
+
+    async def _read(self, *keys: str) -> List[int]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                self._ensure(pipe, key, self.conversation_ttl if key.startswith("version:conv:") else None)
+                pipe.get(key)
+            replies = await pipe.execute()
+        return [int(value) for value in replies[1::2]]
+
+    async def conversation_version(self, conversation_id: UUID) -> Tuple[int, int]:
+        """(época, versión) del historial; cambia con cada mensaje y cada operación masiva."""
+        epoch, version = await self._read(EPOCH_KEY, _conversation_key(conversation_id))
+        return epoch, version
+
+    async def conversation_etag(self, conversation_id: UUID, variant: str) -> str:
+        """ETag del historial en la representación `variant` (json, msgpack...)."""
+        epoch, version = await self._read(EPOCH_KEY, _conversation_key(conversation_id))
+        return f'"{epoch:x}.{version:x}-{variant}"'
+
+    async def listing_etag(self, variant: str) -> str:
+        epoch, version = await self._read(EPOCH_KEY, LISTING_KEY)
+        return f'"{epoch:x}.{version:x}-{variant}"'
+
+    async def touch(self, conversation_ids: Iterable[UUID], origin: Optional[str] = None):
+        """
+        Nueva versión de las conversaciones y del listado, en un solo pipeline.
+        `origin` es el worker que ya tiene su caché al día (no la invalida).
+        """
+        conversation_ids = list(conversation_ids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for conversation_id in conversation_ids:
+                key = _conversation_key(conversation_id)
+                self._ensure(pipe, key, self.conversation_ttl)
+                pipe.incr(key)
+                pipe.expire(key, self.conversation_ttl)
+            self._ensure(pipe, LISTING_KEY)
+            pipe.incr(LISTING_KEY)
+            pipe.publish(INVALIDATION_CHANNEL, invalidation_payload(conversation_ids, origin))
+            await pipe.execute()
+
+    async def invalidate_all(self):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._ensure(pipe, EPOCH_KEY)
+            pipe.incr(EPOCH_KEY)
+            pipe.publish(INVALIDATION_CHANNEL, invalidation_payload(None))
+            await pipe.execute()
+
+    async def safe_etag(self, conversation_id: Optional[UUID], variant: str) -> Optional[str]:
+        """ETag del historial (o del listado si `conversation_id` es None); None si Redis falla."""
+        try:
+            if conversation_id is None:
+                return await self.listing_etag(variant)
+            return await self.conversation_etag(conversation_id, variant)
+        except RedisError as e:
+            logger.warning(f"ETag lookup skipped: {str(e)}")
+            return None
+
+    async def safe_touch(self, *conversation_ids: UUID, origin: Optional[str] = None):
+        """touch() sin propagar errores de Redis."""
+        try:
+            await self.touch(conversation_ids, origin)
+        except RedisError as e:
+            logger.warning(f"Version bump failed for {len(conversation_ids)} conversations: {str(e)}")
+
+    async def safe_invalidate_all(self):
+        try:
+            await self.invalidate_all()
+        except RedisError as e:
+            logger.warning(f"ETag invalidation failed: {str(e)}")
+
+def get_version_store(request: Request) -> Optional[VersionStore]:
+    redis_client = getattr(request.app.state, "redis", None)
+    if redis_client is None:
+        return None
+    return VersionStore(redis_client, get_settings().conversation_version_ttl_days * 86400)
@@ -0,0 +1,257 @@
+# src/core/admission.py
+"""
+Control de admisión para el envío de mensajes.
+
+Cuando los proveedores se ralentizan, las peticiones se acumulan sin límite y
+todas terminan por timeout a la vez. Este módulo las acota antes de hacer
+ningún trabajo:
+- presupuesto por worker y por proveedor: N mensajes en curso y una cola FIFO
+  acotada; con la cola llena, o tras esperar `queue_timeout`, se responde 503
+  de inmediato con Retry-After estimado a partir del tiempo de servicio;
+- límite por cliente con un token bucket guardado en Redis, compartido por
+  todos los workers; al agotarse se responde 429 con Retry-After.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional, Set
+import logging
+
+import redis.asyncio as redis
+from fastapi import Request
+from redis.exceptions import RedisError, WatchError
+
+from src.core.config import Settings, get_settings, get_settings_manager
+from src.core.exceptions import OverloadedError, RateLimitedError
+from src.core.metrics import ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTIONS, ADMISSION_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_AFTER = 60
+
+def _retry_after(seconds: float) -> int:
+    return min(max(math.ceil(seconds), 1), MAX_RETRY_AFTER)
+
+class ConcurrencyBudget:
+    """
+    Semáforo con cola acotada: `max_in_flight` en curso y hasta `max_queue`
+    esperando. Al liberar, el turno pasa directamente al primero de la cola.
+    """
+    # Peso de la última muestra en la media móvil del tiempo de servicio
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, scope: str, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.scope = scope
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.service_time = 1.0
+        self._waiters: Deque[asyncio.Future] = deque()
+        ADMISSION_REQUESTS.labels(scope=scope, state="in_flight").set_function(lambda: self.in_flight)
+        ADMISSION_REQUESTS.labels(scope=scope, state="queued").set_function(lambda: len(self._waiters))
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Segundos estimados hasta que se vacíe la cola actual."""
+        return _retry_after(self.service_time * (len(self._waiters) + 1) / self.max_in_flight)
+
+    async def acquire(self):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTIONS.labels(reason="queue_full").inc()
+            raise OverloadedError(self.retry_after(), details={"scope": self.scope, "reason": "queue_full"})
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            ADMISSION_REJECTIONS.labels(reason="queue_timeout").inc()
+            raise OverloadedError(self.retry_after(), details={"scope": self.scope, "reason": "queue_timeout"})
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future):
+        """Sale de la cola; si el turno ya se le había cedido, lo libera."""
+        if waiter.done() and not waiter.cancelled():
+            self.release()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def release(self, service_time: Optional[float] = None):
+        if service_time is not None:
+            self.service_time += self.EWMA_ALPHA * (service_time - self.service_time)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # El turno pasa al siguiente sin decrementar in_flight
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+class AdmissionController:
+    """Presupuesto del worker más uno por proveedor (solo los configurados en `provider_limits`)."""
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_queue: int = 128,
+        queue_timeout: float = 10.0,
+        provider_limits: Optional[Dict[str, int]] = None
+    ):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.provider_limits = provider_limits or {}
+        self.worker = ConcurrencyBudget("worker", max_in_flight, max_queue, queue_timeout)
+        self.providers: Dict[str, ConcurrencyBudget] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AdmissionController":
+        return cls(
+            max_in_flight=settings.admission_max_in_flight,
+            max_queue=settings.admission_max_queue,
+            queue_timeout=settings.admission_queue_timeout_seconds,
+            provider_limits=settings.admission_provider_limits
+        )
+
+    def provider_budget(self, provider: str) -> Optional[ConcurrencyBudget]:
+        if provider not in self.provider_limits:
+            return None
+        if provider not in self.providers:
+            self.providers[provider] = ConcurrencyBudget(
+                f"provider:{provider}", self.provider_limits[provider], self.max_queue, self.queue_timeout
+            )
+        return self.providers[provider]
+
+    @asynccontextmanager
+    async def admit(self, provider: str):
+        """
+        Reserva turno en el proveedor y después en el worker (así una petición
+        encolada tras un proveedor lento no ocupa turno del worker). Entrega los
+        segundos de espera en cola.
+        """
+        start = time.perf_counter()
+        budget = self.provider_budget(provider)
+        if budget:
+            await budget.acquire()
+        try:
+            await self.worker.acquire()
+        except BaseException:
+            if budget:
+                budget.release()
+            raise
+        admitted = time.perf_counter()
+        ADMISSION_QUEUE_SECONDS.labels(provider=provider).observe(admitted - start)
+        try:
+            yield admitted - start
+        finally:
+            elapsed = time.perf_counter() - admitted
+            self.worker.release(elapsed)
+            if budget:
+                budget.release(elapsed)
+
+class RedisTokenBucket:
+    """
+    Token bucket por clave en un hash de Redis (`tokens`, `ts`), actualizado con
+    WATCH/MULTI para que los workers compartan el mismo límite. El reloj es el
+    de Redis (TIME), así que no depende de la hora de cada máquina.
+    """
+    def __init__(self, redis_client: redis.Redis, rate: float, burst: int, prefix: str = "ratelimit"):
+        self.redis = redis_client
+        self.rate = rate
+        self.burst = burst
+        self.prefix = prefix
+        self.ttl = math.ceil(burst / rate) + 1
+
+    async def consume(self, key: str) -> float:
+        """Consume un token. Devuelve 0 si se admite o los segundos hasta el próximo token."""
+        bucket_key = f"{self.prefix}:{key}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(bucket_key)
+                    tokens, ts = await pipe.hmget(bucket_key, "tokens", "ts")
+                    seconds, micros = await pipe.time()
+                    now = seconds + micros / 1_000_000
+                    if tokens is None:
+                        available = float(self.burst)
+                    else:
+                        available = min(float(self.burst), float(tokens) + (now - float(ts)) * self.rate)
+                    if available < 1:
+                        await pipe.unwatch()
+                        return (1 - available) / self.rate
+                    pipe.multi()
+                    pipe.hset(bucket_key, mapping={"tokens": repr(available - 1), "ts": repr(now)})
+                    pipe.expire(bucket_key, self.ttl)
+                    await pipe.execute()
+                    return 0.0
+                except WatchError:
+                    continue
+
+_controller: Optional[AdmissionController] = None
+
+def get_admission_controller() -> AdmissionController:
+    """Controlador del proceso (los presupuestos son por worker)."""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController.from_settings(get_settings())
+    return _controller
+
+def _on_settings_changed(old: Settings, new: Settings, changed: Set[str]):
+    """
+    Con límites nuevos se crea otro controlador; las peticiones en curso
+    liberan su turno en el anterior.
+    """
+    global _controller
+    if changed & {"admission_max_in_flight", "admission_max_queue", "admission_queue_timeout_seconds", "admission_provider_limits"}:
+        _controller = None
+
+get_settings_manager().subscribe(_on_settings_changed)
+
+def client_key(request: Request, settings: Settings) -> str:
+    client_id = request.headers.get(settings.admission_client_header)
+    if client_id:
+        return f"client:{client_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+async def check_rate_limit(request: Request, settings: Settings):
+    """Aplica el token bucket del cliente; si Redis falla, se admite la petición."""
+    if not settings.admission_rate_limit_per_minute:
+        return
+    redis_client = getattr(request.app.state, "redis", None)
+    if redis_client is None:
+        return
+    bucket = RedisTokenBucket(
+        redis_client, settings.admission_rate_limit_per_minute / 60.0, settings.admission_rate_limit_burst
+    )
+    try:
+        wait = await bucket.consume(client_key(request, settings))
+    except RedisError as e:
+        logger.warning(f"Rate limit check skipped: {str(e)}")
+        return
+    if wait > 0:
+        ADMISSION_REJECTIONS.labels(reason="rate_limited").inc()
+        raise RateLimitedError(_retry_after(wait))
+
+@asynccontextmanager
+async def admit_request(request: Request, rate_limit: bool = True):
+    """
+    Admisión de POST /conversations/{id}/messages: límite por cliente y turno
+    en los presupuestos de admisión mientras dura el bloque. Con
+    `rate_limit=False`, quien llama ya aplicó check_rate_limit() (antes de la
+    vía rápida de emergencias, que no pasa por los presupuestos).
+    """
+    settings = get_settings()
+    if rate_limit:
+        await check_rate_limit(request, settings)
+    async with get_admission_controller().admit(settings.llm_provider) as queue_seconds:
+        yield queue_seconds
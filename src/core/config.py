@@ -1,9 +1,13 @@
 # src/core/config.py
-from functools import lru_cache
+import asyncio
 import os
-from typing import Optional, Literal
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Literal, Set
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, field_validator
+from pydantic import AliasChoices, Field, field_validator
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Settings(BaseSettings):
     # App settings
@@ -11,7 +15,7 @@ class Settings(BaseSettings):
     debug: bool = False
     
     # LLM Provider settings
-    llm_provider: Literal["gemini", "openai", "deepseek", "local"] = "gemini"  # Por defecto usamos Gemini
+    llm_provider: Literal["gemini", "openai", "deepseek", "local", "synthetic"] = "gemini"  # Por defecto usamos Gemini
     
     # API Keys
     gemini_api_key: Optional[str] = os.getenv("GEMINI_API_KEY")
@@ -23,13 +27,134 @@ class Settings(BaseSettings):
     llm_temperature: float = 0.7
     llm_max_tokens: Optional[int] = None
     
+    # Synthetic provider (pruebas de capacidad sin proveedores reales)
+    synthetic_response_mode: Literal["deterministic", "template"] = "deterministic"
+    synthetic_response_template: str = "Entiendo, gracias por la información ({message_count} mensajes). ¿Desde cuándo ocurre esto?"
+    synthetic_latency_distribution: Literal["fixed", "lognormal", "bursty"] = "fixed"
+    synthetic_latency_ms: float = 0.0  # Latencia fija, o mediana para lognormal/bursty
+    synthetic_latency_sigma: float = 0.5  # Dispersión de la distribución lognormal
+    synthetic_burst_probability: float = 0.05  # Probabilidad de una respuesta lenta en modo bursty
+    synthetic_burst_latency_ms: float = 2000.0
+    synthetic_tokens_per_second: Optional[float] = None  # None = sin límite de velocidad de generación
+    synthetic_stream_chunk_tokens: int = 8
+    synthetic_error_rate: float = 0.0
+    synthetic_timeout_rate: float = 0.0
+    synthetic_timeout_ms: float = 30000.0
+    synthetic_seed: Optional[int] = None
+    
     # Database settings
     redis_url: str = "redis://redis:6379/0"
     postgres_url: str = "postgresql+asyncpg://postgres:postgres@db:5432/docochat"
     
+    # Almacenamiento de conversaciones: solo Postgres, o Redis (activas) + Postgres (archivo)
+    conversation_store: Literal["postgres", "tiered"] = "postgres"
+    hot_tier_idle_seconds: float = 1800.0  # Inactividad tras la que se archiva en Postgres
+    archive_interval_seconds: float = 60.0
+    archive_batch_size: int = 100
+    
+    # Particionado mensual de messages (solo Postgres)
+    partition_premake_months: int = 3  # Meses futuros con partición creada de antemano
+    partition_retention_months: Optional[int] = None  # Archivar particiones más antiguas (None = nunca)
+    partition_archive_dir: str = "archive/partitions"
+    partition_maintenance_interval_seconds: float = 3600.0
+    
+    # Retención: borrar o anonimizar conversaciones sin actividad desde hace N días
+    retention_days: Optional[int] = None  # None = sin retención
+    retention_mode: Literal["delete", "anonymize"] = "delete"
+    retention_batch_size: int = 1000  # Conversaciones por lote (y transacción)
+    retention_max_load: float = 0.2  # Fracción del tiempo que el job puede ocupar la base de datos
+    retention_interval_seconds: float = 3600.0
+    retention_dry_run: bool = False
+    
+    # Importación masiva (NDJSON)
+    import_chunk_size: int = 5000  # Líneas por bloque y transacción
+    import_workers: int = 4  # Bloques en paralelo
+    import_work_dir: str = "imports"  # Archivos recibidos por el endpoint y sus checkpoints
+
+    # Simulaciones por lote (/simulations, solo con X-Admin-Token)
+    simulation_max_body_bytes: int = 1024 * 1024
+    simulation_max_scripts: int = 100
+    
+    # Pool de conexiones a Postgres
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # Segundos esperando una conexión libre antes de fallar
+    db_pool_recycle: int = -1  # Vida máxima de una conexión en segundos (-1 = sin límite)
+    db_pool_pre_ping: bool = False  # Verificar la conexión en cada checkout
+    db_statement_timeout_ms: Optional[int] = None  # Timeout por sentencia (statement_timeout de Postgres)
+    db_request_timeout_ms: Optional[int] = None  # Presupuesto total de BD por petición
+    db_pgbouncer_mode: bool = False  # Sin caché de prepared statements (PgBouncer en modo transaction)
+    
+    # Control de admisión de POST /conversations/{id}/messages (por worker)
+    admission_max_in_flight: int = 64  # Mensajes procesándose a la vez
+    admission_max_queue: int = 128  # Mensajes esperando turno; más allá se responde 503
+    admission_queue_timeout_seconds: float = 10.0  # Espera máxima en cola antes de responder 503
+    admission_provider_limits: Dict[str, int] = {}  # Máximo en curso por proveedor, p. ej. {"local": 2}
+    admission_rate_limit_per_minute: Optional[float] = None  # Token bucket por cliente en Redis (None = sin límite)
+    admission_rate_limit_burst: int = 10
+    admission_client_header: str = "X-Client-Id"  # Identidad del cliente (si falta, la IP)
+    admission_max_background_writes: int = 256  # Escrituras en segundo plano de emergencias; más allá se guardan en línea
+    
+    # Monitor de salud de proveedores (sondeos baratos en segundo plano)
+    provider_health_interval_seconds: float = 15.0
+    provider_health_timeout_seconds: float = 5.0
+    provider_health_window: int = 20  # Sondeos usados para las estadísticas de latencia
+    provider_health_unhealthy_after: int = 2  # Fallos consecutivos para marcar un proveedor como caído
+    
+    # Contabilidad de tokens y latencia
+    usage_conversation_ttl_days: int = 30  # Vida del agregado por conversación en Redis sin actividad
+    
+    # GET condicionales (ETag) del historial y el listado
+    conversation_version_ttl_days: int = 30  # Vida de la versión de una conversación en Redis sin actividad
+    
+    # Caché en memoria de conversaciones recientes, por worker (invalidada por pub/sub de Redis)
+    conversation_cache_max_entries: int = 1000  # 0 = sin caché
+    conversation_cache_max_mb: float = 64.0  # Memoria estimada máxima de la caché
+    conversation_cache_ttl_seconds: float = 300.0  # Vida máxima de una entrada (cota de invalidaciones perdidas)
+    
+    # Modelo local: en el proceso de cada worker o en un servidor compartido por nodo
+    local_inference_mode: Literal["in_process", "server"] = "in_process"
+    local_inference_url: str = "unix:///tmp/docochat-local.sock"  # unix://<ruta> o http://host:puerto
+    local_inference_autostart: bool = True  # En modo server, el primer worker arranca el servidor si no responde
+    local_inference_max_batch: int = 4  # Prompts generados juntos como máximo
+    local_inference_batch_wait_ms: float = 10.0  # Espera del primer prompt a que lleguen más
+    local_inference_queue_size: int = 64  # Peticiones en cola del servidor; más allá responde 503
+    local_inference_timeout_seconds: float = 120.0  # Tiempo máximo de una generación vista desde el worker
+    local_inference_start_timeout_seconds: float = 600.0  # Espera máxima a que el servidor cargue el modelo
+    # Pesos convertidos a safetensors (python -m src.providers.local_model). Admite también
+    # LOCAL_MODEL_PATH en mayúsculas: es el nombre que usan el Dockerfile e install_llm_deps.py
+    local_model_path: Optional[str] = Field(None, validation_alias=AliasChoices("local_model_path", "LOCAL_MODEL_PATH"))
+    
+    # Canal WebSocket /conversations/{id}/ws
+    ws_heartbeat_interval_seconds: float = 20.0  # Cada cuánto se envía un ping
+    ws_heartbeat_timeout_seconds: float = 60.0  # Sin mensajes del cliente (ni pong) durante este tiempo, se cierra
+    ws_send_queue_size: int = 256  # Eventos pendientes de envío por conexión
+    ws_send_timeout_seconds: float = 10.0  # Con la cola llena más tiempo, se cierra la conexión (cliente lento)
+    ws_resume_wait_seconds: float = 5.0  # Al reconectar, espera máxima a que se guarde el turno anterior
+    
+    # Arranque: DDL y pre-calentamiento antes de aceptar tráfico
+    db_create_tables_on_startup: bool = True
+    warmup_db_connections: int = 0
+    warmup_redis_connections: int = 0
+    warmup_llm_adapter: bool = False
+    
     # Optional settings
     sentry_dsn: Optional[str] = None
     prometheus_port: int = 9090
+    trace_export_path: Optional[str] = None  # Archivo OTLP JSON para exportar trazas por petición
+    
+    # Admin endpoints (deshabilitados si no hay token)
+    admin_token: Optional[str] = None
+    profiling_max_seconds: int = 120
+    
+    # Diagnóstico de memoria
+    memory_request_logging: bool = False  # Registrar el delta de memoria de peticiones lentas
+    memory_slow_request_ms: float = 1000.0
+    
+    # Recarga en caliente: cada cuánto se comprueba si cambió el .env (0 = solo vía /admin/settings/reload)
+    settings_reload_interval_seconds: float = 5.0
+    # Segundos que /admin/settings/reload espera la confirmación de cada worker
+    settings_reload_ack_timeout_seconds: float = 5.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -45,11 +170,25 @@ class Settings(BaseSettings):
     @field_validator("llm_provider")
     @classmethod
     def validate_llm_provider(cls, v):
-        valid_providers = ["gemini", "openai", "deepseek", "local"]
+        valid_providers = ["gemini", "openai", "deepseek", "local", "synthetic"]
         if v not in valid_providers:
             raise ValueError(f"Invalid LLM provider. Must be one of: {valid_providers}")
         return v
     
+    @field_validator("synthetic_error_rate", "synthetic_timeout_rate", "synthetic_burst_probability")
+    @classmethod
+    def validate_probability(cls, v):
+        if not 0.0 <= v <= 1.0:
+            raise ValueError("Probability must be between 0.0 and 1.0")
+        return v
+    
+    @field_validator("retention_max_load")
+    @classmethod
+    def validate_max_load(cls, v):
+        if not 0.0 < v <= 1.0:
+            raise ValueError("retention_max_load must be in (0.0, 1.0]")
+        return v
+    
     @field_validator("llm_temperature")
     @classmethod
     def validate_temperature(cls, v):
@@ -63,14 +202,15 @@ class Settings(BaseSettings):
             "gemini": self.gemini_api_key,
             "openai": self.openai_api_key,
             "deepseek": self.deepseek_api_key,
-            "local": None  # Local no requiere API key
+            "local": None,  # Local no requiere API key
+            "synthetic": None
         }
         return api_key_map.get(self.llm_provider)
     
     def validate_provider_config(self) -> bool:
         """Valida que la configuración del proveedor sea correcta."""
-        if self.llm_provider == "local":
-            return True  # Local no requiere validación de API key
+        if self.llm_provider in ("local", "synthetic"):
+            return True  # Local y synthetic no requieren validación de API key
         
         api_key = self.get_required_api_key()
         if not api_key:
@@ -78,6 +218,125 @@ class Settings(BaseSettings):
         
         return True
 
-@lru_cache()
+class SettingsSnapshot(Settings):
+    """Configuración publicada por `SettingsManager`: inmutable para poder compartirla entre peticiones."""
+    model_config = SettingsConfigDict(frozen=True)
+
+# Campos que solo se aplican al arrancar (pools, conexiones y tareas en segundo plano)
+RESTART_REQUIRED_FIELDS = {"redis_url", "postgres_url", "conversation_store", "prometheus_port", "trace_export_path"}
+RESTART_REQUIRED_PREFIXES = ("db_", "warmup_", "archive_", "partition_", "retention_", "provider_health_", "settings_reload_", "conversation_cache_", "local_inference_", "local_model_")
+
+SettingsListener = Callable[[Settings, Settings, Set[str]], None]
+
+class SettingsManager:
+    """
+    Parsea la configuración una sola vez y publica un snapshot inmutable.
+    `reload()` vuelve a leer entorno y `.env`; si algo cambió, sustituye el
+    snapshot en una sola asignación y avisa a los suscriptores con
+    (anterior, nuevo, campos cambiados). Si la configuración nueva no valida,
+    se conserva la anterior.
+    """
+    def __init__(self, loader: Callable[[], Settings] = SettingsSnapshot):
+        self._loader = loader
+        self._current = loader()
+        self._listeners: List[SettingsListener] = []
+        self.version = 1
+        self.loaded_at = datetime.utcnow()
+
+    @property
+    def current(self) -> Settings:
+        return self._current
+
+    def subscribe(self, listener: SettingsListener):
+        self._listeners.append(listener)
+
+    def reload(self) -> Set[str]:
+        """Devuelve los campos cambiados; ValueError si la configuración nueva no es válida."""
+        new = self._loader()
+        old = self._current
+        old_values, new_values = old.model_dump(), new.model_dump()
+        changed = {name for name in old_values.keys() | new_values.keys() if old_values.get(name) != new_values.get(name)}
+        if not changed:
+            return changed
+
+        self._current = new
+        self.version += 1
+        self.loaded_at = datetime.utcnow()
+        logger.info(f"Settings reloaded (version {self.version}): {', '.join(sorted(changed))}")
+        restart = sorted(
+            name for name in changed
+            if name in RESTART_REQUIRED_FIELDS or name.startswith(RESTART_REQUIRED_PREFIXES)
+        )
+        if restart:
+            logger.warning(f"Settings changes require a restart to take effect: {', '.join(restart)}")
+        for listener in self._listeners:
+            try:
+                listener(old, new, changed)
+            except Exception as e:
+                logger.error(f"Settings listener {getattr(listener, '__qualname__', listener)} failed: {str(e)}", exc_info=True)
+        return changed
+
+class SettingsWatcher:
+    """Recarga la configuración cuando cambia la fecha de modificación del `.env`."""
+    def __init__(self, manager: SettingsManager, path: str = ".env", interval: float = 5.0):
+        self.manager = manager
+        self.path = path
+        self.interval = interval
+        self._mtime = self._stat()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, manager: SettingsManager, settings: Settings) -> "SettingsWatcher":
+        return cls(
+            manager,
+            path=settings.model_config.get("env_file") or ".env",
+            interval=settings.settings_reload_interval_seconds
+        )
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def run_once(self) -> Set[str]:
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return set()
+        self._mtime = mtime
+        return self.manager.reload()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Settings reload failed, keeping version {self.manager.version}: {str(e)}")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="settings-watcher")
+        logger.info(f"Settings watcher started (path={self.path}, interval={self.interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+_manager: Optional[SettingsManager] = None
+
+def get_settings_manager() -> SettingsManager:
+    global _manager
+    if _manager is None:
+        _manager = SettingsManager()
+    return _manager
+
 def get_settings() -> Settings:
-    return Settings()
+    """Snapshot vigente; no vuelve a parsear el entorno."""
+    return get_settings_manager().current
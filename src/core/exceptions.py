@@ -8,17 +8,22 @@ import logging
 logger = logging.getLogger(__name__)
 
 class APIError(Exception):
+    # False en errores esperables y frecuentes (rechazos por sobrecarga): se registran sin traza
+    log_traceback = True
+
     def __init__(
         self,
         code: str,
         message: str,
         status_code: int = status.HTTP_400_BAD_REQUEST,
-        details: Optional[Dict[str, Any]] = None
+        details: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
     ):
         self.code = code
         self.message = message
         self.status_code = status_code
         self.details = details or {}
+        self.headers = headers
         super().__init__(self.message)
 
 class NotFoundError(APIError):
@@ -57,6 +62,39 @@ class AuthorizationError(APIError):
             details=details
         )
 
+class DatabaseTimeoutError(APIError):
+    def __init__(self, message: str = "Database timeout", details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            code="DATABASE_TIMEOUT",
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            details=details
+        )
+
+class RateLimitedError(APIError):
+    log_traceback = False
+
+    def __init__(self, retry_after: int, message: str = "Rate limit exceeded", details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            code="RATE_LIMITED",
+            message=message,
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            details=details,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class OverloadedError(APIError):
+    log_traceback = False
+
+    def __init__(self, retry_after: int, message: str = "Service overloaded", details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            code="SERVICE_OVERLOADED",
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            details=details,
+            headers={"Retry-After": str(retry_after)}
+        )
+
 class InternalServerError(APIError):
     def __init__(self, message: str = "Internal server error", details: Optional[Dict[str, Any]] = None):
         super().__init__(
@@ -68,7 +106,10 @@ class InternalServerError(APIError):
 
 async def api_exception_handler(request: Request, exc: APIError) -> JSONResponse:
     """Manejador de excepciones personalizado para errores de la API."""
-    logger.error(f"API Error: {exc.code} - {exc.message}", exc_info=True)
+    if exc.log_traceback:
+        logger.error(f"API Error: {exc.code} - {exc.message}", exc_info=True)
+    else:
+        logger.warning(f"API Error: {exc.code} - {exc.message}")
     return JSONResponse(
         status_code=exc.status_code,
         content={
@@ -77,7 +118,8 @@ async def api_exception_handler(request: Request, exc: APIError) -> JSONResponse
                 "message": exc.message,
                 "details": exc.details
             }
-        }
+        },
+        headers=exc.headers
     )
 
 async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
@@ -0,0 +1,213 @@
+# src/core/memory.py
+"""
+Diagnóstico de memoria por worker y por petición.
+
+Ofrece snapshots de tracemalloc bajo demanda (y sus diferencias) agrupados por
+módulo, conteos en vivo de objetos ORM en los identity maps y de adapters LLM
+vivos, y un registro opcional del delta de memoria de las peticiones lentas.
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Dict, List, Optional
+import logging
+
+from fastapi import Request
+
+from src.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 5
+
+_snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+_snapshot_ids = count(1)
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+def rss_bytes() -> Optional[int]:
+    """RSS actual del proceso (Linux); None si no está disponible."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _module_for(filename: str) -> str:
+    """Convierte una ruta de archivo en el módulo (o paquete de terceros) al que pertenece."""
+    path = os.path.abspath(filename)
+    best = ""
+    for entry in sys.path:
+        entry = os.path.abspath(entry or os.getcwd())
+        if path.startswith(entry + os.sep) and len(entry) > len(best):
+            best = entry
+    if not best:
+        return filename
+    relative = os.path.splitext(os.path.relpath(path, best))[0].split(os.sep)
+    if relative[-1] == "__init__":
+        relative = relative[:-1]
+    # Código propio con detalle de módulo; dependencias agrupadas por paquete
+    if relative and relative[0] == "src":
+        return ".".join(relative)
+    return relative[0] if relative else filename
+
+def _group_by_module(stats) -> List[Dict[str, Any]]:
+    grouped: Dict[str, Dict[str, int]] = {}
+    for stat in stats:
+        module = _module_for(stat.traceback[0].filename)
+        entry = grouped.setdefault(module, {"size": 0, "count": 0, "size_diff": 0, "count_diff": 0})
+        entry["size"] += stat.size
+        entry["count"] += stat.count
+        entry["size_diff"] += getattr(stat, "size_diff", 0)
+        entry["count_diff"] += getattr(stat, "count_diff", 0)
+    return [{"module": module, **values} for module, values in grouped.items()]
+
+def start_tracing(frames: int = 1):
+    """Activa tracemalloc (sin efecto si ya está activo)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logger.info(f"tracemalloc started with {frames} frames")
+
+def stop_tracing():
+    """Desactiva tracemalloc y descarta los snapshots guardados."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("tracemalloc stopped")
+    _snapshots.clear()
+
+def take_snapshot() -> int:
+    """Toma y guarda un snapshot; conserva solo los últimos MAX_SNAPSHOTS."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    snapshot_id = next(_snapshot_ids)
+    _snapshots[snapshot_id] = snapshot
+    while len(_snapshots) > MAX_SNAPSHOTS:
+        _snapshots.popitem(last=False)
+    return snapshot_id
+
+def list_snapshots() -> List[int]:
+    return list(_snapshots.keys())
+
+def _get_snapshot(snapshot_id: int) -> tracemalloc.Snapshot:
+    if snapshot_id not in _snapshots:
+        raise KeyError(f"Snapshot {snapshot_id} not found")
+    return _snapshots[snapshot_id]
+
+def top_allocations(snapshot_id: int, group_by: str = "module", limit: int = 20) -> List[Dict[str, Any]]:
+    """Principales sitios de asignación de un snapshot, por módulo ("module") o por línea ("line")."""
+    snapshot = _get_snapshot(snapshot_id)
+    if group_by == "module":
+        rows = _group_by_module(snapshot.statistics("filename"))
+        for row in rows:
+            del row["size_diff"], row["count_diff"]
+    else:
+        rows = [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size": stat.size, "count": stat.count}
+            for stat in snapshot.statistics("lineno")
+        ]
+    rows.sort(key=lambda row: row["size"], reverse=True)
+    return rows[:limit]
+
+def diff_snapshots(snapshot_id: int, base_id: int, group_by: str = "module", limit: int = 20) -> List[Dict[str, Any]]:
+    """Diferencia entre dos snapshots, ordenada por crecimiento absoluto."""
+    snapshot, base = _get_snapshot(snapshot_id), _get_snapshot(base_id)
+    if group_by == "module":
+        rows = _group_by_module(snapshot.compare_to(base, "filename"))
+    else:
+        rows = [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size": stat.size,
+                "count": stat.count,
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in snapshot.compare_to(base, "lineno")
+        ]
+    rows.sort(key=lambda row: abs(row["size_diff"]), reverse=True)
+    return rows[:limit]
+
+def orm_object_counts(objects: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """Objetos en los identity maps de las sesiones SQLAlchemy vivas, por clase."""
+    from sqlalchemy.orm import Session
+
+    objects = gc.get_objects() if objects is None else objects
+    sessions = [obj for obj in objects if isinstance(obj, Session)]
+    by_class: Dict[str, int] = {}
+    for session in sessions:
+        for obj in list(session.identity_map.values()):
+            name = type(obj).__name__
+            by_class[name] = by_class.get(name, 0) + 1
+    return {
+        "sessions": len(sessions),
+        "identity_map_objects": sum(by_class.values()),
+        "by_class": by_class,
+    }
+
+def adapter_counts(objects: Optional[List[Any]] = None) -> Dict[str, int]:
+    """Adapters LLM vivos en el proceso, por clase."""
+    from src.providers.adapters.base_adapter import BaseLLMAdapter
+
+    counts: Dict[str, int] = {}
+    for obj in gc.get_objects() if objects is None else objects:
+        if isinstance(obj, BaseLLMAdapter):
+            name = type(obj).__name__
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+def memory_stats() -> Dict[str, Any]:
+    """Resumen de memoria del worker."""
+    traced_current, traced_peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    objects = gc.get_objects()
+    return {
+        "pid": os.getpid(),
+        "rss_bytes": rss_bytes(),
+        "tracemalloc": {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": traced_current,
+            "peak_bytes": traced_peak,
+            "snapshots": list_snapshots(),
+        },
+        "gc": {
+            "objects": len(objects),
+            "counts": gc.get_count(),
+        },
+        "orm": orm_object_counts(objects),
+        "adapters": adapter_counts(objects),
+    }
+
+async def memory_middleware(request: Request, call_next):
+    """
+    Si `memory_request_logging` está activo, registra el delta de memoria de las
+    peticiones más lentas que `memory_slow_request_ms`. Con tracemalloc activo el
+    delta es de memoria trazada; si no, de RSS. El valor es aproximado porque
+    incluye lo asignado por peticiones concurrentes en el mismo worker.
+    """
+    settings = get_settings()
+    if not settings.memory_request_logging:
+        return await call_next(request)
+
+    tracing = tracemalloc.is_tracing()
+    before = tracemalloc.get_traced_memory()[0] if tracing else rss_bytes()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if elapsed_ms >= settings.memory_slow_request_ms and before is not None:
+        after = tracemalloc.get_traced_memory()[0] if tracing and tracemalloc.is_tracing() else rss_bytes()
+        if after is not None:
+            logger.warning(
+                f"Slow request {request.method} {request.url.path}: {elapsed_ms:.0f}ms, "
+                f"{'traced' if tracing else 'rss'} memory delta {(after - before) / 1024:+.1f} KiB"
+            )
+    return response
@@ -0,0 +1,243 @@
+# src/core/metrics.py
+"""
+Métricas Prometheus de la aplicación.
+
+prometheus_client es una dependencia opcional (requirements-dev.txt / monitoring):
+si no está instalada, todas las métricas son no-op y la app funciona igual.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+import logging
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest, start_http_server
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # pragma: no cover - depende del entorno
+    PROMETHEUS_AVAILABLE = False
+
+class _NoopMetric:
+    """Métrica vacía usada cuando prometheus_client no está instalado."""
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+    def set_function(self, *args, **kwargs):
+        pass
+
+def _histogram(name, documentation, labelnames, buckets=None):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    if buckets:
+        return Histogram(name, documentation, labelnames, buckets=buckets)
+    return Histogram(name, documentation, labelnames)
+
+def _counter(name, documentation, labelnames):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+def _gauge(name, documentation, labelnames):
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Gauge(name, documentation, labelnames)
+
+# Etapas del pipeline de generación (BaseLLMAdapter.generate): microsegundos a segundos
+_STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+GENERATION_STAGE_SECONDS = _histogram(
+    "docochat_generation_stage_seconds",
+    "Duración de cada etapa del pipeline de generación",
+    ["provider", "model", "phase", "stage"],
+    buckets=_STAGE_BUCKETS
+)
+REPOSITORY_SECONDS = _histogram(
+    "docochat_repository_seconds",
+    "Duración de las operaciones del repositorio de conversaciones",
+    ["operation"],
+    buckets=_STAGE_BUCKETS
+)
+DB_POOL_WAIT_SECONDS = _histogram(
+    "docochat_db_pool_wait_seconds",
+    "Tiempo de espera para obtener una conexión del pool (incluye abrirla si hace falta)",
+    [],
+    buckets=_STAGE_BUCKETS
+)
+DB_POOL_CONNECTIONS = _gauge(
+    "docochat_db_pool_connections",
+    "Conexiones del pool de base de datos por estado",
+    ["state"]
+)
+DB_TIMEOUTS = _counter(
+    "docochat_db_timeouts_total",
+    "Operaciones de base de datos abortadas por timeout",
+    ["reason"]
+)
+ARCHIVED_CONVERSATIONS = _counter(
+    "docochat_archived_conversations_total",
+    "Conversaciones movidas de Redis a Postgres por el migrador",
+    []
+)
+RETENTION_CONVERSATIONS = _counter(
+    "docochat_retention_conversations_total",
+    "Conversaciones borradas o anonimizadas por la política de retención",
+    ["action"]
+)
+RETENTION_MESSAGES = _counter(
+    "docochat_retention_messages_total",
+    "Mensajes borrados o anonimizados por la política de retención",
+    ["action"]
+)
+RETENTION_PENDING = _gauge(
+    "docochat_retention_pending_conversations",
+    "Conversaciones pendientes de la política de retención al inicio del último ciclo",
+    []
+)
+ADMISSION_QUEUE_SECONDS = _histogram(
+    "docochat_admission_queue_seconds",
+    "Tiempo de espera en la cola de admisión antes de procesar el mensaje",
+    ["provider"],
+    buckets=_STAGE_BUCKETS
+)
+ADMISSION_REQUESTS = _gauge(
+    "docochat_admission_requests",
+    "Mensajes en curso o en cola por presupuesto de admisión",
+    ["scope", "state"]
+)
+ADMISSION_REJECTIONS = _counter(
+    "docochat_admission_rejections_total",
+    "Mensajes rechazados por el control de admisión",
+    ["reason"]
+)
+BACKGROUND_WRITE_FAILURES = _counter(
+    "docochat_background_write_failures_total",
+    "Mensajes que no se pudieron guardar en segundo plano, por origen",
+    ["source"]
+)
+CONVERSATION_CACHE_REQUESTS = _counter(
+    "docochat_conversation_cache_requests_total",
+    "Lecturas de la caché en memoria de conversaciones",
+    ["result"]
+)
+CONVERSATION_CACHE_EVICTIONS = _counter(
+    "docochat_conversation_cache_evictions_total",
+    "Entradas descartadas de la caché en memoria de conversaciones, por motivo",
+    ["reason"]
+)
+CONVERSATION_CACHE_SIZE = _gauge(
+    "docochat_conversation_cache_size",
+    "Tamaño de la caché en memoria de conversaciones (entradas y bytes estimados)",
+    ["unit"]
+)
+WEBSOCKET_CONNECTIONS = _gauge(
+    "docochat_websocket_connections",
+    "Conexiones WebSocket de chat abiertas",
+    []
+)
+WEBSOCKET_CLOSES = _counter(
+    "docochat_websocket_closes_total",
+    "Conexiones WebSocket de chat cerradas, por motivo",
+    ["reason"]
+)
+HTTP_REQUEST_SECONDS = _histogram(
+    "docochat_http_request_seconds",
+    "Duración de las peticiones HTTP por ruta",
+    ["method", "route", "status"]
+)
+FALLBACK_RESPONSES = _counter(
+    "docochat_fallback_responses_total",
+    "Respuestas de fallback por errores del proveedor",
+    ["provider", "model"]
+)
+SAFETY_SHORT_CIRCUITS = _counter(
+    "docochat_safety_short_circuits_total",
+    "Respuestas de emergencia emitidas sin llamar al proveedor",
+    ["provider"]
+)
+FORCED_QUESTION_REWRITES = _counter(
+    "docochat_forced_question_rewrites_total",
+    "Respuestas reescritas para forzar la pregunta específica de la fase",
+    ["provider", "phase"]
+)
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str):
+    """Acumula en `timings` la duración (segundos) del bloque bajo el nombre `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def observe_generation_stages(provider: str, model: str, phase: str, timings: Dict[str, float]):
+    """Registra las duraciones de las etapas de una generación."""
+    for stage, seconds in timings.items():
+        GENERATION_STAGE_SECONDS.labels(provider=provider, model=model, phase=phase, stage=stage).observe(seconds)
+
+def track_repository(operation: str):
+    """Decorador que mide la duración de un método asíncrono del repositorio."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                REPOSITORY_SECONDS.labels(operation=operation).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+async def metrics_middleware(request: Request, call_next):
+    """Middleware HTTP que mide cada petición etiquetada por la plantilla de ruta."""
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Usar la plantilla (/conversations/{conv_id}/messages) para acotar la cardinalidad
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.labels(
+            method=request.method,
+            route=route_path,
+            status=str(status_code)
+        ).observe(time.perf_counter() - start)
+
+def metrics_response() -> Response:
+    """Respuesta con las métricas en formato de exposición de Prometheus."""
+    if not PROMETHEUS_AVAILABLE:
+        return Response("prometheus_client no está instalado\n", status_code=503, media_type="text/plain")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def start_metrics_server(port: Optional[int]) -> bool:
+    """
+    Inicia el servidor de métricas de Prometheus en `port` (0 o None lo desactiva).
+    Con varios workers solo el primero obtiene el puerto; el resto sigue sirviendo /metrics.
+    """
+    if not port or not PROMETHEUS_AVAILABLE:
+        return False
+    try:
+        start_http_server(port)
+        logger.info(f"Prometheus metrics server listening on port {port}")
+        return True
+    except OSError as e:
+        logger.warning(f"Could not start Prometheus metrics server on port {port}: {str(e)}")
+        return False
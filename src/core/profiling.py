@@ -0,0 +1,244 @@
+# src/core/profiling.py
+"""
+Profiler de CPU por muestreo activable en caliente.
+
+Un hilo en segundo plano toma muestras periódicas de las pilas de Python
+(`sys._current_frames`) sin instrumentar el código, así que cubre adapters,
+consultas SQLAlchemy y serialización pydantic por igual. Los resultados se
+exportan en formato "collapsed" (flamegraph.pl / speedscope) y en JSON de speedscope.
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+import logging
+
+from fastapi.requests import HTTPConnection
+
+logger = logging.getLogger(__name__)
+
+Frame = Tuple[str, str, int]  # (función, archivo, línea de definición)
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """Pila desde la raíz hasta la hoja."""
+    frames = []
+    while frame is not None:
+        frames.append(_frame_key(frame))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+class SamplingProfiler:
+    """
+    Muestrea las pilas de los hilos del proceso a intervalos fijos.
+
+    Args:
+        interval: Segundos entre muestras
+        thread_ids: Hilos a muestrear (None = todos menos el propio muestreador)
+        sample_filter: Si se indica, solo se registran muestras cuando devuelve True
+    """
+    def __init__(
+        self,
+        interval: float = 0.005,
+        thread_ids: Optional[Set[int]] = None,
+        sample_filter: Optional[Callable[[], bool]] = None
+    ):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.sample_filter = sample_filter
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="docochat-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - (self.started_at or time.perf_counter())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if self.sample_filter and not self.sample_filter():
+                continue
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                thread_frame: Frame = (f"thread:{names.get(thread_id, thread_id)}", "", 0)
+                self.samples[(thread_frame,) + _stack(frame)] += 1
+            self.sample_count += 1
+
+    @staticmethod
+    def _frame_name(frame: Frame) -> str:
+        name, filename, line = frame
+        return f"{name} ({filename}:{line})" if filename else name
+
+    def collapsed(self) -> str:
+        """Pilas en formato collapsed: `raíz;...;hoja cantidad` por línea."""
+        lines = []
+        for stack, count in self.samples.most_common():
+            lines.append(";".join(self._frame_name(f).replace(";", ":") for f in stack) + f" {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self, name: str = "docochat") -> Dict[str, Any]:
+        """Perfil en el formato JSON de speedscope (tipo 'sampled')."""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        for stack, count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    entry = {"name": frame[0]}
+                    if frame[1]:
+                        entry.update({"file": frame[1], "line": frame[2]})
+                    frames.append(entry)
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        total = sum(weights)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "docochat",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": total,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+class RequestCapture:
+    """
+    Captura armada para perfilar solo las peticiones que coinciden con una
+    conversación o una ruta. Las muestras se registran únicamente mientras la
+    tarea activa del event loop es una de esas peticiones.
+    """
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        conversation_id: Optional[UUID] = None,
+        route: Optional[str] = None,
+        max_requests: Optional[int] = None
+    ):
+        self.loop = loop
+        self.conversation_id = str(conversation_id) if conversation_id else None
+        self.route = route
+        self.max_requests = max_requests
+        self.matched = 0
+        self.active_tasks: Set[asyncio.Task] = set()
+        self.done = asyncio.Event()
+
+    def matches(self, request: HTTPConnection) -> bool:
+        if self.max_requests is not None and self.matched >= self.max_requests:
+            return False
+        if self.conversation_id and str(request.path_params.get("conv_id")) != self.conversation_id:
+            return False
+        if self.route:
+            route = request.scope.get("route")
+            if self.route not in (getattr(route, "path", None), request.url.path):
+                return False
+        return True
+
+    def is_capturing(self) -> bool:
+        # Leer la tarea actual del loop desde el hilo del profiler (lectura de un dict, segura con el GIL)
+        return asyncio.current_task(self.loop) in self.active_tasks
+
+    def finish_request(self, task: asyncio.Task):
+        self.active_tasks.discard(task)
+        if self.max_requests is not None and self.matched >= self.max_requests and not self.active_tasks:
+            self.done.set()
+
+_capture: Optional[RequestCapture] = None
+_lock = asyncio.Lock()
+
+def profiler_busy() -> bool:
+    return _lock.locked()
+
+async def profile_for(seconds: float, interval: float) -> SamplingProfiler:
+    """Muestrea todo el proceso durante `seconds` segundos."""
+    async with _lock:
+        profiler = SamplingProfiler(interval=interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+        logger.info(f"CPU profile finished: {profiler.sample_count} samples in {profiler.duration:.1f}s")
+        return profiler
+
+async def profile_requests(
+    seconds: float,
+    interval: float,
+    conversation_id: Optional[UUID] = None,
+    route: Optional[str] = None,
+    max_requests: Optional[int] = None
+) -> Tuple[SamplingProfiler, int]:
+    """
+    Perfila las peticiones coincidentes durante una ventana de `seconds` segundos
+    (o hasta completar `max_requests`). Devuelve el profiler y las peticiones capturadas.
+    """
+    global _capture
+    async with _lock:
+        loop = asyncio.get_running_loop()
+        capture = RequestCapture(loop, conversation_id, route, max_requests)
+        profiler = SamplingProfiler(
+            interval=interval,
+            thread_ids={threading.get_ident()},
+            sample_filter=capture.is_capturing
+        )
+        _capture = capture
+        profiler.start()
+        try:
+            await asyncio.wait_for(capture.done.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            _capture = None
+            profiler.stop()
+        logger.info(f"Request profile finished: {capture.matched} requests, {profiler.sample_count} samples")
+        return profiler, capture.matched
+
+async def request_profiling_hook(request: HTTPConnection):
+    """
+    Dependencia global: si hay una captura armada y la petición coincide,
+    registra la tarea actual para que el profiler la muestree.
+    """
+    capture = _capture
+    if capture is None or not capture.matches(request):
+        yield
+        return
+
+    task = asyncio.current_task()
+    capture.matched += 1
+    capture.active_tasks.add(task)
+    try:
+        yield
+    finally:
+        capture.finish_request(task)
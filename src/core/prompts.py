@@ -1,5 +1,5 @@
 # src/core/prompts.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from enum import Enum
 
 class ConversationPhase(Enum):
@@ -181,7 +181,7 @@ LÍMITES IMPORTANTES:
             return "¿Hay algo más que deba saber sobre la situación?"
 
     @classmethod
-    def get_safety_check(cls, user_message: str) -> str:
+    def get_safety_check(cls, user_message: str) -> Optional[str]:
         """Verifica si hay síntomas de emergencia en el mensaje del usuario"""
         emergency_keywords = {
             'dificultad para respirar': 'URGENTE: Busca atención médica inmediata',
@@ -200,4 +200,12 @@ LÍMITES IMPORTANTES:
             if keyword in message_lower:
                 return response
         
-        return None 
\ No newline at end of file
+        return None
+
+    @classmethod
+    def get_safety_response(cls, user_message: str) -> Optional[str]:
+        """Respuesta completa de emergencia para el mensaje, o None si no hay síntomas de emergencia"""
+        safety_alert = cls.get_safety_check(user_message)
+        if not safety_alert:
+            return None
+        return f"🚨 {safety_alert}\n\nPor favor, busca atención médica inmediata. Esta información no reemplaza la consulta médica profesional." 
\ No newline at end of file
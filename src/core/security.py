@@ -0,0 +1,18 @@
+# src/core/security.py
+import secrets
+from typing import Optional
+from fastapi import Header
+from src.core.config import get_settings
+from src.core.exceptions import AuthenticationError, AuthorizationError
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependencia para endpoints de administración.
+    Requiere el header `X-Admin-Token` igual a `Settings.admin_token`;
+    si no hay token configurado los endpoints quedan deshabilitados.
+    """
+    admin_token = get_settings().admin_token
+    if not admin_token:
+        raise AuthorizationError("Admin endpoints are disabled. Set ADMIN_TOKEN to enable them.")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, admin_token):
+        raise AuthenticationError("Invalid admin token")
@@ -0,0 +1,101 @@
+# src/core/serialization.py
+"""
+Serialización rápida de las respuestas de lectura (historial y listado).
+
+Las rutas reciben filas ya proyectadas por el repositorio y las codifican
+directamente con orjson, o con MessagePack si el cliente lo pide en `Accept`,
+sin construir modelos de pydantic ni volver a validar `response_model`. La
+forma del JSON es la misma que la de `ConversationResponse` y
+`ConversationListItem`; en MessagePack los UUID y las fechas viajan como el
+mismo texto que en JSON.
+"""
+from datetime import datetime
+from typing import Any, List, Optional
+from uuid import UUID
+
+import msgpack
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+from src.db.repository import MessageRow, SummaryRow
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack"}
+
+# Documentación OpenAPI de las rutas que admiten MessagePack
+MSGPACK_RESPONSES = {200: {"content": {MSGPACK_MEDIA_TYPE: {}}}}
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Tipo de respuesta según `Accept`: MessagePack si el cliente lo incluye con
+    una q mayor o igual que la de JSON; en cualquier otro caso, JSON.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    json_q = msgpack_q = 0.0
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.lower()
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            json_q = max(json_q, q)
+    return MSGPACK_MEDIA_TYPE if msgpack_q > 0 and msgpack_q >= json_q else JSON_MEDIA_TYPE
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+def encode(payload: Any, media_type: str) -> bytes:
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+    return orjson.dumps(payload)
+
+def history_payload(conversation_id: UUID, rows: List[MessageRow]) -> dict:
+    return {
+        "id": conversation_id,
+        "messages": [
+            {"role": role, "content": content, "id": message_id, "timestamp": timestamp}
+            for message_id, role, content, timestamp in rows
+        ]
+    }
+
+def listing_payload(rows: List[SummaryRow]) -> list:
+    return [
+        {"id": conversation_id, "message_count": count, "last_message_timestamp": last}
+        for conversation_id, count, last in rows
+    ]
+
+def variant(media_type: str) -> str:
+    """Sufijo del ETag para cada representación: json o msgpack."""
+    return media_type.rsplit("/", 1)[-1]
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+
+def negotiated_response(
+    request: Request,
+    payload: Any,
+    headers: Optional[dict] = None,
+    media_type: Optional[str] = None
+) -> Response:
+    """Codifica `payload` en el formato que acepta el cliente."""
+    media_type = media_type or negotiate(request.headers.get("accept"))
+    return Response(
+        encode(payload, media_type),
+        media_type=media_type,
+        headers={"Vary": "Accept", **(headers or {})}
+    )
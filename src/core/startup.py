@@ -0,0 +1,44 @@
+# src/core/startup.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+import logging
+
+from src.core.config import Settings
+from src.providers.factory import get_llm_client
+
+logger = logging.getLogger(__name__)
+
+class StartupTimer:
+    """Registra la duración de cada fase del arranque."""
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    def record(self, phase: str, seconds: float):
+        self.phases[phase] = seconds
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def report(self) -> str:
+        total = self.phases.get("import", 0.0) + (time.perf_counter() - self._started)
+        breakdown = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.phases.items())
+        return f"Startup completed in {total * 1000:.0f}ms ({breakdown})"
+
+async def warm_up_llm_adapter(settings: Settings):
+    """
+    Construye el adapter configurado y lo deja en la caché del factory.
+    Se ejecuta en un hilo porque algunos adapters (local) cargan el modelo de forma bloqueante.
+    Un proveedor mal configurado no impide el arranque.
+    """
+    try:
+        await asyncio.to_thread(get_llm_client, settings)
+    except Exception as e:
+        logger.warning(f"Could not warm up LLM adapter for {settings.llm_provider}: {str(e)}")
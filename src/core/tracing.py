@@ -0,0 +1,200 @@
+# src/core/tracing.py
+"""
+Trazas por petición con spans anidados.
+
+Cada petición HTTP abre una traza; las rutas, el servicio, el repositorio y la
+llamada al proveedor registran spans sobre ella. Al terminar se devuelve un
+header `Server-Timing` con el desglose y, si `trace_export_path` está configurado,
+la traza se agrega a un archivo en formato OTLP JSON (una línea por traza, el
+formato del receiver `otlpjsonfile` del OpenTelemetry Collector).
+"""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import logging
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+@dataclass
+class Trace:
+    trace_id: str
+    spans: List[Span] = field(default_factory=list)
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("docochat_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("docochat_span", default=None)
+
+def _new_id(num_bytes: int) -> str:
+    return os.urandom(num_bytes).hex()
+
+def current_trace() -> Optional[Trace]:
+    """Traza activa en el contexto actual (None fuera de una petición)."""
+    return _current_trace.get()
+
+@contextmanager
+def start_trace():
+    """Abre una traza nueva para el contexto actual."""
+    trace = Trace(trace_id=_new_id(16))
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Registra un span hijo del span activo. No hace nada si no hay traza."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(
+        name=name,
+        trace_id=trace.trace_id,
+        span_id=_new_id(8),
+        parent_id=parent.span_id if parent else None,
+        start_ns=time.time_ns(),
+        attributes=attributes
+    )
+    token = _current_span.set(current)
+    start = time.perf_counter_ns()
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        # Duración con reloj monotónico; el inicio con reloj de pared para exportar
+        current.end_ns = current.start_ns + (time.perf_counter_ns() - start)
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+def traced(name: str):
+    """Decorador que envuelve una función asíncrona en un span."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing_header(trace: Trace) -> str:
+    """
+    Construye el header Server-Timing agregando los spans por nombre.
+    Los spans repetidos (p. ej. varias consultas) se suman e indican la cantidad.
+    """
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for s in trace.spans:
+        totals[s.name] = totals.get(s.name, 0.0) + s.duration_ms
+        counts[s.name] = counts.get(s.name, 0) + 1
+
+    entries = []
+    for name, duration in totals.items():
+        entry = f"{name};dur={duration:.2f}"
+        if counts[name] > 1:
+            entry += f';desc="x{counts[name]}"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+class OTLPFileExporter:
+    """Agrega trazas a un archivo en formato OTLP JSON (ExportTraceServiceRequest por línea)."""
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def to_otlp(self, trace: Trace) -> Dict[str, Any]:
+        spans = []
+        for s in trace.spans:
+            otlp_span = {
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,  # SERVER para la raíz, INTERNAL para el resto
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": _otlp_attributes(s.attributes),
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            }
+            if s.parent_id:
+                otlp_span["parentSpanId"] = s.parent_id
+            spans.append(otlp_span)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "docochat"}, "spans": spans}],
+            }]
+        }
+
+    def export(self, trace: Trace):
+        line = json.dumps(self.to_otlp(trace), separators=(",", ":"))
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Could not export trace to {self.path}: {str(e)}")
+
+_exporter: Optional[OTLPFileExporter] = None
+
+def configure_tracing(export_path: Optional[str], service_name: str = "docochat"):
+    """Configura (o desactiva, con None) la exportación de trazas a archivo."""
+    global _exporter
+    _exporter = OTLPFileExporter(export_path, service_name) if export_path else None
+    if _exporter:
+        logger.info(f"Exporting traces to {export_path}")
+
+async def tracing_middleware(request: Request, call_next):
+    """Middleware HTTP que abre la traza de la petición y devuelve el header Server-Timing."""
+    with start_trace() as trace:
+        with span("total", **{"http.method": request.method, "http.target": request.url.path}) as root:
+            response = await call_next(request)
+            route = request.scope.get("route")
+            root.attributes["http.route"] = getattr(route, "path", "unmatched")
+            root.attributes["http.status_code"] = response.status_code
+
+    response.headers["Server-Timing"] = server_timing_header(trace)
+    if _exporter:
+        # Escribir el archivo fuera del event loop sin demorar la respuesta
+        asyncio.get_running_loop().run_in_executor(None, _exporter.export, trace)
+    return response
@@ -1,19 +1,63 @@
-from fastapi import Depends
+# src/db/deps.py
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import redis.asyncio as redis
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.cache.conversations import CachedConversationRepository, ConversationCache
+from src.core.config import get_settings
 from src.db.redis_repository import RedisConversationRepository
 from src.db.postgres_repository import PostgresConversationRepository
-from src.db.session import init_redis
-
-async def get_redis_repo():
-    redis = await init_redis()
-    return RedisConversationRepository(redis)
-
-async def get_postgres_repo():
-    # asegurar init_db si es necesario
-    return PostgresConversationRepository()
-
-def get_repository(
-    repo_type: str = "redis"  # o leer de settings
-):
-    if repo_type == "postgres":
-        return Depends(get_postgres_repo)
-    return Depends(get_redis_repo)
+from src.db.tiered_repository import TieredConversationRepository
+from src.db import session as db_session
+from src.db.session import get_session
+from src.db.repository import ConversationRepository
+
+async def get_redis_repo(request: Request) -> RedisConversationRepository:
+    return RedisConversationRepository(request.app.state.redis)
+
+async def get_postgres_repo(session: AsyncSession = Depends(get_session)) -> PostgresConversationRepository:
+    return PostgresConversationRepository(session)
+
+def _repository(
+    redis_client: redis.Redis,
+    session: AsyncSession,
+    cache: Optional[ConversationCache]
+) -> ConversationRepository:
+    if get_settings().conversation_store == "tiered":
+        repo = TieredConversationRepository(
+            RedisConversationRepository(redis_client),
+            PostgresConversationRepository(session)
+        )
+    else:
+        repo = PostgresConversationRepository(session)
+    return CachedConversationRepository(repo, cache) if cache is not None else repo
+
+def get_conversation_cache(request: Request) -> Optional[ConversationCache]:
+    """Caché en memoria del worker, o None si está desactivada."""
+    return getattr(request.app.state, "conversation_cache", None)
+
+async def get_conversation_repository(
+    request: Request,
+    session: AsyncSession = Depends(get_session)
+) -> ConversationRepository:
+    """
+    Repositorio según `conversation_store`, detrás de la caché en memoria del
+    worker si está activada. En modo "tiered" la sesión SQL solo toma una
+    conexión si la lectura cae a Postgres.
+    """
+    return _repository(getattr(request.app.state, "redis", None), session, get_conversation_cache(request))
+
+@asynccontextmanager
+async def conversation_repository_scope(
+    redis_client: redis.Redis,
+    cache: Optional[ConversationCache] = None
+) -> AsyncIterator[ConversationRepository]:
+    """
+    Repositorio con sesión propia, para escrituras en segundo plano que
+    terminan después de la petición (la sesión de `get_session` ya estará cerrada).
+    """
+    async with db_session.AsyncSessionLocal() as session:
+        yield _repository(redis_client, session, cache)
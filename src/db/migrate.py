@@ -0,0 +1,159 @@
+# src/db/migrate.py
+"""
+Migración de bases de datos existentes al esquema actual.
+
+`python -m src.db.migrate` lleva una base creada con una versión anterior al
+esquema de src/models/schemas.py. Es idempotente: cada paso comprueba antes si
+hace falta, así que puede ejecutarse en cada despliegue. Todo ocurre en una
+sola transacción; si un paso falla, la base queda como estaba.
+
+Pasos:
+1. Columnas nuevas (todas anulables): `conversations.created_at` y
+   `anonymized_at`, `messages.provider`/`model` y las columnas de consumo
+2. `conversations.created_at` vacío: el timestamp del primer mensaje de la
+   conversación o, sin mensajes, la fecha de la migración
+3. Solo Postgres: si `messages` no está particionada, se renombra la tabla
+   antigua, se crea la particionada (clave primaria `(id, timestamp)`) con las
+   particiones de los meses con datos, se copian las filas y se elimina la antigua
+4. Tablas que falten y particiones de los próximos meses
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from typing import List
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from src.core.config import get_settings
+from src.db.partitions import PARENT_TABLE, create_partition, ensure_partitions, is_partitioned
+from src.models.schemas import Base, Message
+
+logger = logging.getLogger(__name__)
+
+LEGACY_TABLE = f"{PARENT_TABLE}_unpartitioned"
+
+def _existing_columns(sync_conn, table: str):
+    inspector = inspect(sync_conn)
+    if not inspector.has_table(table):
+        return None
+    return {column["name"] for column in inspector.get_columns(table)}
+
+async def _add_missing_columns(conn: AsyncConnection) -> List[str]:
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = await conn.run_sync(_existing_columns, table.name)
+        if existing is None:
+            continue
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                raise RuntimeError(f"Cannot add required column {table.name}.{column.name} automatically")
+            column_type = column.type.compile(dialect=conn.dialect)
+            await conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+async def _backfill_created_at(conn: AsyncConnection) -> int:
+    """Rellena `conversations.created_at`; devuelve las conversaciones actualizadas."""
+    from_messages = await conn.execute(text("""
+        UPDATE conversations SET created_at = (
+            SELECT MIN(m.timestamp) FROM messages m WHERE m.conversation_id = conversations.id
+        )
+        WHERE created_at IS NULL
+    """))
+    await conn.execute(
+        text("UPDATE conversations SET created_at = :now WHERE created_at IS NULL"),
+        {"now": datetime.utcnow()}
+    )
+    return from_messages.rowcount or 0
+
+async def _rename_legacy_objects(conn: AsyncConnection):
+    """Los nombres de índices y restricciones son únicos por esquema: los de la tabla antigua se renombran."""
+    constraints = await conn.execute(
+        text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass)"),
+        {"table": LEGACY_TABLE}
+    )
+    for name in constraints.scalars().all():
+        await conn.execute(text(f'ALTER TABLE {LEGACY_TABLE} RENAME CONSTRAINT "{name}" TO "{LEGACY_TABLE}_{name}"'))
+    indexes = await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname NOT LIKE :prefix"),
+        {"table": LEGACY_TABLE, "prefix": f"{LEGACY_TABLE}%"}
+    )
+    for name in indexes.scalars().all():
+        await conn.execute(text(f'ALTER INDEX "{name}" RENAME TO "{LEGACY_TABLE}_{name}"'))
+
+async def _partition_messages(conn: AsyncConnection, months_ahead: int) -> int:
+    """Convierte `messages` en tabla particionada; devuelve las filas copiadas (-1 si ya lo estaba)."""
+    exists = await conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": PARENT_TABLE})
+    if not exists.scalar_one() or await is_partitioned(conn):
+        return -1
+    await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} RENAME TO {LEGACY_TABLE}"))
+    await _rename_legacy_objects(conn)
+    await conn.run_sync(lambda sync_conn: Message.__table__.create(sync_conn, checkfirst=True))
+    await ensure_partitions(conn, months_ahead)
+    months = await conn.execute(text(
+        f"SELECT DISTINCT CAST(date_trunc('month', timestamp) AS date) FROM {LEGACY_TABLE} WHERE timestamp IS NOT NULL"
+    ))
+    for month in months.scalars().all():
+        await create_partition(conn, month)
+
+    columns = [column.name for column in Message.__table__.columns]
+    # La clave primaria incluye timestamp: las filas antiguas sin él toman la fecha de la migración
+    select_list = ", ".join("COALESCE(timestamp, :now)" if name == "timestamp" else name for name in columns)
+    copied = await conn.execute(
+        text(f"INSERT INTO {PARENT_TABLE} ({', '.join(columns)}) SELECT {select_list} FROM {LEGACY_TABLE}"),
+        {"now": datetime.utcnow()}
+    )
+    await conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    return copied.rowcount or 0
+
+async def migrate(engine: AsyncEngine, months_ahead: int = 3) -> List[str]:
+    """Aplica los pasos pendientes y devuelve una descripción de cada uno."""
+    applied = []
+    async with engine.begin() as conn:
+        added = await _add_missing_columns(conn)
+        if added:
+            applied.append(f"added columns: {', '.join(added)}")
+        if await conn.run_sync(_existing_columns, "conversations") is not None:
+            backfilled = await _backfill_created_at(conn)
+            if backfilled:
+                applied.append(f"backfilled conversations.created_at for {backfilled} conversations")
+        if engine.dialect.name == "postgresql":
+            copied = await _partition_messages(conn, months_ahead)
+            if copied >= 0:
+                applied.append(f"partitioned {PARENT_TABLE} ({copied} rows copied)")
+        await conn.run_sync(Base.metadata.create_all)
+        if engine.dialect.name == "postgresql":
+            created = await ensure_partitions(conn, months_ahead)
+            if created:
+                applied.append(f"created partitions: {', '.join(created)}")
+    for step in applied:
+        logger.info(f"Migration: {step}")
+    return applied
+
+async def _main(url: str, months_ahead: int):
+    engine = create_async_engine(url)
+    try:
+        applied = await migrate(engine, months_ahead)
+    finally:
+        await engine.dispose()
+    if applied:
+        for step in applied:
+            print(f"✅ {step}")
+    else:
+        print("✅ El esquema ya estaba al día")
+
+def main():
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Migra una base de datos existente al esquema actual")
+    parser.add_argument("--url", default=settings.postgres_url, help="Por defecto POSTGRES_URL de la configuración")
+    parser.add_argument("--months-ahead", type=int, default=settings.partition_premake_months)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(_main(args.url, args.months_ahead))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# src/db/partitions.py
+"""
+Particionado mensual de la tabla `messages` (solo Postgres).
+
+La tabla se declara `PARTITION BY RANGE (timestamp)` en el modelo. Este módulo:
+- crea por adelantado las particiones mensuales (`messages_YYYY_MM`) y una
+  partición DEFAULT que recoge filas fuera de rango;
+- archiva particiones frías: las desvincula (DETACH), exporta sus filas a un CSV
+  comprimido con gzip más un manifiesto JSON y elimina la tabla;
+- restaura bajo demanda una partición archivada desde esos archivos.
+
+Todos los workers ejecutan el mantenimiento: la creación de particiones y el
+archivado/restauración de cada partición se serializan con advisory locks de
+Postgres, de modo que solo un proceso opera sobre una partición a la vez.
+
+Así vacuum, bloat de índices y backups crecen con el historial activo y no con todo el historial.
+"""
+import asyncio
+import gzip
+import json
+import os
+import re
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.cache.versions import VersionStore
+from src.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "messages"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+_NAME_RE = re.compile(rf"^{PARENT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+def parse_partition_name(name: str) -> date:
+    """Mes de una partición a partir de su nombre; ValueError si no es `messages_YYYY_MM`."""
+    match = _NAME_RE.match(name)
+    if not match:
+        raise ValueError(f"Invalid partition name: {name}")
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+@dataclass
+class Partition:
+    name: str
+    start: date
+    end: date
+
+    @classmethod
+    def for_month(cls, month: date) -> "Partition":
+        month = month_start(month)
+        return cls(partition_name(month), month, add_months(month, 1))
+
+# Claves de los advisory locks (espacio de `hashtext`)
+_MAINTENANCE_LOCK = f"{PARENT_TABLE}:partitions"
+
+@asynccontextmanager
+async def _partition_lock(conn: AsyncConnection, name: str) -> AsyncIterator[None]:
+    """
+    Lock de sesión sobre una partición: abarca varias transacciones de `conn`
+    (DETACH, COPY y DROP). Espera si otro proceso la está archivando o restaurando.
+    """
+    key = {"key": f"{PARENT_TABLE}:partition:{name}"}
+    await conn.execute(text("SELECT pg_advisory_lock(hashtext(:key))"), key)
+    await conn.commit()
+    try:
+        yield
+    finally:
+        await conn.rollback()
+        await conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), key)
+        await conn.commit()
+
+def is_postgres(engine: AsyncEngine) -> bool:
+    return engine.dialect.name == "postgresql"
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """True si `messages` existe como tabla particionada (las instalaciones previas no lo están)."""
+    result = await conn.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('p', 'r')"),
+        {"name": PARENT_TABLE}
+    )
+    return result.scalar_one_or_none() == "p"
+
+async def list_partitions(conn: AsyncConnection) -> List[Partition]:
+    """Particiones mensuales vinculadas, ordenadas por mes."""
+    result = await conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+    """), {"parent": PARENT_TABLE})
+    partitions = []
+    for name in result.scalars():
+        if _NAME_RE.match(name):
+            partitions.append(Partition.for_month(parse_partition_name(name)))
+    return sorted(partitions, key=lambda p: p.start)
+
+async def _table_exists(conn: AsyncConnection, name: str) -> bool:
+    result = await conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+    return bool(result.scalar_one())
+
+async def _attach(conn: AsyncConnection, partition: Partition):
+    """
+    Vincula una tabla ya creada como partición. Antes mueve desde la partición
+    DEFAULT las filas del rango, que de otro modo harían fallar el ATTACH.
+    """
+    bounds = {"start": partition.start, "end": partition.end}
+    if await _table_exists(conn, DEFAULT_PARTITION):
+        await conn.execute(text(f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE timestamp >= :start AND timestamp < :end
+                RETURNING *
+            )
+            INSERT INTO {partition.name} SELECT * FROM moved
+        """), bounds)
+    await conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {partition.name} "
+        f"FOR VALUES FROM ('{partition.start.isoformat()}') TO ('{partition.end.isoformat()}')"
+    ))
+
+async def create_partition(conn: AsyncConnection, month: date) -> Optional[str]:
+    """Crea la partición del mes si no existe. Devuelve su nombre, o None si ya existía."""
+    partition = Partition.for_month(month)
+    if await _table_exists(conn, partition.name):
+        return None
+    await conn.execute(text(
+        f"CREATE TABLE {partition.name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    await _attach(conn, partition)
+    logger.info(f"Created partition {partition.name}")
+    return partition.name
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int, today: Optional[date] = None) -> List[str]:
+    """
+    Garantiza la partición DEFAULT y las del mes actual y los `months_ahead` siguientes.
+    Sin efecto si `messages` no está particionada (esquema anterior).
+    """
+    if not await is_partitioned(conn):
+        logger.warning(f"Table {PARENT_TABLE} is not partitioned; skipping partition maintenance")
+        return []
+    # Hasta el final de la transacción: los workers que arrancan a la vez no crean la misma partición
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": _MAINTENANCE_LOCK})
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    current = month_start(today or datetime.utcnow().date())
+    created = []
+    for offset in range(months_ahead + 1):
+        name = await create_partition(conn, add_months(current, offset))
+        if name:
+            created.append(name)
+    return created
+
+def _archive_paths(directory: str, name: str):
+    base = Path(directory) / name
+    return base.with_suffix(".csv.gz"), base.with_suffix(".json")
+
+async def _raw_connection(conn: AsyncConnection):
+    """Conexión asyncpg subyacente, para COPY."""
+    raw = await conn.get_raw_connection()
+    return raw.driver_connection
+
+async def archive_partition(engine: AsyncEngine, name: str, directory: str) -> Dict[str, Any]:
+    """
+    Desvincula la partición, exporta sus filas a `{directory}/{name}.csv.gz` con
+    un manifiesto `{name}.json` y elimina la tabla. Si una ejecución anterior se
+    interrumpió tras el DETACH, retoma desde la tabla desvinculada. Si otro
+    proceso la archivó mientras se esperaba el lock, devuelve su manifiesto.
+    """
+    partition = Partition.for_month(parse_partition_name(name))
+    data_path, manifest_path = _archive_paths(directory, name)
+    os.makedirs(directory, exist_ok=True)
+
+    async with engine.connect() as conn, _partition_lock(conn, name):
+        if not await _table_exists(conn, name):
+            if manifest_path.exists():
+                return json.loads(manifest_path.read_text())
+            raise KeyError(f"Partition {name} not found")
+        attached = name in {p.name for p in await list_partitions(conn)}
+        if attached:
+            await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            await conn.commit()
+
+        # Temporal propio de esta ejecución, en el mismo directorio para que os.replace sea atómico
+        fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=f"{name}.", suffix=".tmp")
+        tmp_path = Path(tmp_name)
+        try:
+            connection = await _raw_connection(conn)
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                status = await connection.copy_from_table(name, output=f, format="csv", header=True)
+            await asyncio.to_thread(os.replace, tmp_path, data_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        rows = int(status.split()[-1])
+
+        manifest = {
+            "partition": name,
+            "from": partition.start.isoformat(),
+            "to": partition.end.isoformat(),
+            "rows": rows,
+            "file": data_path.name,
+            "archived_at": datetime.utcnow().isoformat(),
+        }
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+
+        # Solo se elimina si sigue desvinculada: vinculada de nuevo, el archivo ya no tiene todas sus filas
+        if name in {p.name for p in await list_partitions(conn)}:
+            raise RuntimeError(f"Partition {name} was re-attached during archiving; not dropping it")
+        await conn.execute(text(f"DROP TABLE {name}"))
+        await conn.commit()
+    logger.info(f"Archived partition {name}: {rows} rows to {data_path}")
+    return manifest
+
+async def restore_partition(engine: AsyncEngine, name: str, directory: str) -> Dict[str, Any]:
+    """Recrea y vuelve a vincular una partición archivada con `archive_partition`."""
+    data_path, manifest_path = _archive_paths(directory, name)
+    partition = Partition.for_month(parse_partition_name(name))
+
+    async with engine.connect() as conn, _partition_lock(conn, name):
+        if not manifest_path.exists() or not data_path.exists():
+            raise KeyError(f"No archive found for partition {name}")
+        manifest = json.loads(manifest_path.read_text())
+        if await _table_exists(conn, name):
+            raise ValueError(f"Partition {name} already exists")
+        await conn.execute(text(
+            f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        connection = await _raw_connection(conn)
+        with gzip.open(data_path, "rb") as f:
+            await connection.copy_to_table(name, source=f, format="csv", header=True)
+        await _attach(conn, partition)
+        await conn.commit()
+    logger.info(f"Restored partition {name} ({manifest['rows']} rows)")
+    return manifest
+
+def list_archives(directory: str) -> List[Dict[str, Any]]:
+    """Manifiestos de las particiones archivadas en `directory`."""
+    path = Path(directory)
+    if not path.is_dir():
+        return []
+    return [json.loads(p.read_text()) for p in sorted(path.glob(f"{PARENT_TABLE}_*.json"))]
+
+class PartitionMaintainer:
+    """
+    Tarea periódica que crea las particiones futuras y, si hay retención
+    configurada, archiva las particiones más antiguas que `retention_months`.
+    Archivar una partición invalida todos los ETags (`versions`).
+    """
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        months_ahead: int = 3,
+        retention_months: Optional[int] = None,
+        archive_dir: str = "archive/partitions",
+        interval: float = 3600.0,
+        versions: Optional[VersionStore] = None
+    ):
+        self.engine = engine
+        self.months_ahead = months_ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.versions = versions
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(
+        cls,
+        engine: AsyncEngine,
+        settings: Settings,
+        versions: Optional[VersionStore] = None
+    ) -> "PartitionMaintainer":
+        return cls(
+            engine,
+            months_ahead=settings.partition_premake_months,
+            retention_months=settings.partition_retention_months,
+            archive_dir=settings.partition_archive_dir,
+            interval=settings.partition_maintenance_interval_seconds,
+            versions=versions
+        )
+
+    async def run_once(self, today: Optional[date] = None) -> Dict[str, List[str]]:
+        today = today or datetime.utcnow().date()
+        async with self.engine.begin() as conn:
+            created = await ensure_partitions(conn, self.months_ahead, today)
+            partitions = await list_partitions(conn) if self.retention_months else []
+
+        archived = []
+        if self.retention_months:
+            cutoff = add_months(month_start(today), -self.retention_months)
+            for partition in partitions:
+                if partition.end <= cutoff:
+                    await archive_partition(self.engine, partition.name, self.archive_dir)
+                    archived.append(partition.name)
+        if archived and self.versions:
+            await self.versions.safe_invalidate_all()
+        return {"created": created, "archived": archived}
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="partition-maintainer")
+        logger.info(f"Partition maintainer started (months_ahead={self.months_ahead}, retention={self.retention_months})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,33 +1,76 @@
 # src/db/postgres_repository.py
-from src.db.repository import ConversationRepository
-from src.db.session import AsyncSessionLocal
-from src.models.schemas import Conversation
-from uuid import UUID
-from sqlalchemy import Table, Column, String, MetaData
+"""
+Tier frío de conversaciones: Postgres, con las tablas del modelo ORM.
+"""
+from datetime import datetime
+from typing import List
+from sqlalchemy import insert, select
 
-# Supongamos una tabla sencilla de auditoría
-metadata = MetaData()
-conversations_table = Table(
-    "conversations", metadata,
-    Column("id", String, primary_key=True),
-    Column("data", String)
-)
+from src.models.schemas import Conversation, Message
+from src.repositories.conversation_repository import ConversationRepository as SQLConversationRepository
+from src.core.metrics import track_repository
+from src.core.tracing import traced
+from src.db.timeouts import enforce_db_deadline
 
-class PostgresConversationRepository(ConversationRepository):
-    async def save(self, conv: Conversation) -> None:
-        async with AsyncSessionLocal() as session:
-            await session.execute(
-                conversations_table.insert().values(
-                    id=str(conv.id),
-                    data=conv.json()
-                )
-            )
-            await session.commit()
+def _created_at(conversation: Conversation) -> datetime:
+    """created_at no puede ser posterior a ningún mensaje: es la cota de poda de particiones."""
+    candidates = [m.timestamp for m in conversation.messages if m.timestamp is not None]
+    if conversation.created_at is not None:
+        candidates.append(conversation.created_at)
+    return min(candidates) if candidates else datetime.utcnow()
 
-    async def get(self, conv_id: UUID) -> Conversation | None:
-        async with AsyncSessionLocal() as session:
-            result = await session.execute(
-                conversations_table.select().where(conversations_table.c.id == str(conv_id))
-            )
-            row = result.first()
-            return Conversation.parse_raw(row.data) if row else None
+class PostgresConversationRepository(SQLConversationRepository):
+    """Repositorio SQL con escritura por lotes de conversaciones archivadas desde Redis."""
+
+    @track_repository("archive")
+    @traced("db.archive")
+    @enforce_db_deadline
+    async def archive(self, conversations: List[Conversation]) -> int:
+        """
+        Inserta las conversaciones y los mensajes que aún no existen en Postgres,
+        en una sola transacción. Es idempotente: repetir un lote (por ejemplo, si
+        la eliminación en Redis no llegó a hacerse) no duplica filas.
+
+        Returns:
+            int: Mensajes insertados
+        """
+        if not conversations:
+            return 0
+        ids = [conversation.id for conversation in conversations]
+        existing_conversations = set(
+            (await self.session.execute(select(Conversation.id).where(Conversation.id.in_(ids)))).scalars()
+        )
+        existing_messages = set(
+            (await self.session.execute(select(Message.id).where(Message.conversation_id.in_(ids)))).scalars()
+        )
+
+        new_conversations = [
+            {"id": c.id, "created_at": _created_at(c)}
+            for c in conversations
+            if c.id not in existing_conversations
+        ]
+        new_messages = [
+            {
+                "id": m.id,
+                "role": m.role,
+                "content": m.content,
+                "timestamp": m.timestamp,
+                "conversation_id": c.id,
+                "provider": m.provider,
+                "model": m.model,
+                "phase": m.phase,
+                "prompt_tokens": m.prompt_tokens,
+                "completion_tokens": m.completion_tokens,
+                "queue_ms": m.queue_ms,
+                "provider_latency_ms": m.provider_latency_ms,
+            }
+            for c in conversations
+            for m in c.messages
+            if m.id not in existing_messages
+        ]
+        if new_conversations:
+            await self.session.execute(insert(Conversation), new_conversations)
+        if new_messages:
+            await self.session.execute(insert(Message), new_messages)
+        await self.session.commit()
+        return len(new_messages)
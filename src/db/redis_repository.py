@@ -1,17 +1,295 @@
 # src/db/redis_repository.py
-import json
-from src.db.session import init_redis
-from src.db.repository import ConversationRepository
-from src.models.schemas import Conversation
-from uuid import UUID
+"""
+Tier caliente de conversaciones en Redis.
+
+Cada conversación activa ocupa:
+- `conv:{id}`: hash con `created_at`, `last_activity` y `message_count`
+- `conv:{id}:messages`: lista con los IDs de sus mensajes, en orden
+- `msg:{id}`: hash por mensaje (`role`, `content`, `timestamp`, `conversation_id`, `provider`, `model`
+  y las columnas de consumo)
+- `conv:active`: sorted set de conversaciones por última actividad
+
+Agregar un mensaje es O(1) (HSET + RPUSH) y no depende del tamaño del historial.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from redis.exceptions import WatchError
+
+from src.db.repository import ConversationRepository, MessageRow, SummaryRow
+from src.models.schemas import Conversation, Message
+from src.core.metrics import track_repository
+from src.core.tracing import traced
+
+ACTIVE_KEY = "conv:active"
+
+def _meta_key(conversation_id) -> str:
+    return f"conv:{conversation_id}"
+
+def _messages_key(conversation_id) -> str:
+    return f"conv:{conversation_id}:messages"
+
+def _message_key(message_id) -> str:
+    return f"msg:{message_id}"
+
+def _str(value) -> Optional[str]:
+    """El cliente de la app no decodifica respuestas; aceptar bytes y str."""
+    return value.decode() if isinstance(value, bytes) else value
+
+def _decode_hash(data: Dict) -> Dict[str, str]:
+    return {_str(k): _str(v) for k, v in data.items()}
+
+# Columnas opcionales de consumo: en el hash se guardan como "" cuando son None
+_USAGE_FIELDS = {
+    "phase": str,
+    "prompt_tokens": int,
+    "completion_tokens": int,
+    "queue_ms": float,
+    "provider_latency_ms": float,
+}
+
+def _message_mapping(conversation_id: UUID, message: Message) -> Dict[str, str]:
+    mapping = {
+        "role": message.role,
+        "content": message.content,
+        "timestamp": message.timestamp.isoformat(),
+        "conversation_id": str(conversation_id),
+        "provider": message.provider or "",
+        "model": message.model or "",
+    }
+    for name in _USAGE_FIELDS:
+        value = getattr(message, name)
+        mapping[name] = "" if value is None else str(value)
+    return mapping
+
+def _usage_values(row: Dict[str, str]) -> Dict[str, Any]:
+    return {name: cast(row[name]) if row.get(name) else None for name, cast in _USAGE_FIELDS.items()}
 
 class RedisConversationRepository(ConversationRepository):
     def __init__(self, redis):
         self.redis = redis
 
-    async def save(self, conv: Conversation) -> None:
-        await self.redis.set(str(conv.id), conv.json())
+    @track_repository("hot_get")
+    @traced("redis.get")
+    async def get(self, conversation_id: UUID) -> Optional[Conversation]:
+        """Obtiene una conversación activa por su ID"""
+        snapshot = await self.snapshot(conversation_id)
+        return snapshot[0] if snapshot else None
+
+    async def snapshot(self, conversation_id: UUID) -> Optional[Tuple[Conversation, str]]:
+        """
+        Lee la conversación junto con su `last_activity`. Metadatos y lista de
+        mensajes se leen en una transacción, así que el valor es consistente con
+        los mensajes devueltos.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hgetall(_meta_key(conversation_id))
+            pipe.lrange(_messages_key(conversation_id), 0, -1)
+            meta, message_ids = await pipe.execute()
+        if not meta:
+            return None
+
+        messages = []
+        if message_ids:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for message_id in message_ids:
+                    pipe.hgetall(_message_key(_str(message_id)))
+                rows = await pipe.execute()
+            if not all(rows):
+                # El migrador archivó la conversación entre ambas lecturas
+                return None
+            for message_id, row in zip(message_ids, rows):
+                row = _decode_hash(row)
+                messages.append(Message(
+                    id=UUID(_str(message_id)),
+                    role=row["role"],
+                    content=row["content"],
+                    timestamp=datetime.fromisoformat(row["timestamp"]),
+                    conversation_id=conversation_id,
+                    provider=row.get("provider") or None,
+                    model=row.get("model") or None,
+                    **_usage_values(row)
+                ))
+        meta = _decode_hash(meta)
+        conversation = Conversation(
+            id=conversation_id,
+            created_at=datetime.utcfromtimestamp(float(meta["created_at"])),
+            messages=messages
+        )
+        return conversation, meta["last_activity"]
+
+    @track_repository("hot_exists")
+    @traced("redis.exists")
+    async def exists(self, conversation_id: UUID) -> bool:
+        """Si la conversación está en el tier caliente"""
+        return bool(await self.redis.exists(_meta_key(conversation_id)))
+
+    @track_repository("hot_history_rows")
+    @traced("redis.history_rows")
+    async def history_rows(self, conversation_id: UUID) -> Optional[List[MessageRow]]:
+        """Historial como filas: solo `role`, `content` y `timestamp` de cada mensaje (HMGET)"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.exists(_meta_key(conversation_id))
+            pipe.lrange(_messages_key(conversation_id), 0, -1)
+            exists, message_ids = await pipe.execute()
+        if not exists:
+            return None
+        if not message_ids:
+            return []
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for message_id in message_ids:
+                pipe.hmget(_message_key(_str(message_id)), "role", "content", "timestamp")
+            rows = await pipe.execute()
+        if any(role is None for role, _, _ in rows):
+            # El migrador archivó la conversación entre ambas lecturas
+            return None
+        return [
+            (UUID(_str(message_id)), _str(role), _str(content), datetime.fromisoformat(_str(timestamp)))
+            for message_id, (role, content, timestamp) in zip(message_ids, rows)
+        ]
+
+    @track_repository("hot_create")
+    @traced("redis.create")
+    async def create(self, conversation: Conversation) -> Conversation:
+        """Crea una nueva conversación en el tier caliente"""
+        if conversation.id is None:
+            conversation.id = uuid4()
+        await self.restore(conversation)
+        return conversation
+
+    async def restore(self, conversation: Conversation, exclude: Optional[Message] = None) -> bool:
+        """
+        Copia una conversación completa (por ejemplo, archivada) al tier caliente.
+        Si ya está en Redis no la toca y devuelve False: otra petición la restauró
+        antes y reescribirla borraría los mensajes que agregó después.
+        """
+        now = repr(time.time())
+        created_at = now
+        if conversation.created_at is not None:
+            created_at = repr(conversation.created_at.replace(tzinfo=timezone.utc).timestamp())
+        messages = [m for m in conversation.messages if m is not exclude]
+        meta_key = _meta_key(conversation.id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(meta_key)
+                    if await pipe.exists(meta_key):
+                        await pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.delete(_messages_key(conversation.id))
+                    for message in messages:
+                        pipe.hset(_message_key(message.id), mapping=_message_mapping(conversation.id, message))
+                    if messages:
+                        pipe.rpush(_messages_key(conversation.id), *(str(m.id) for m in messages))
+                    pipe.hset(meta_key, mapping={
+                        "created_at": created_at,
+                        "last_activity": now,
+                        "message_count": len(messages),
+                    })
+                    pipe.zadd(ACTIVE_KEY, {str(conversation.id): float(now)})
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    @track_repository("hot_add_message")
+    @traced("redis.add_message")
+    async def add_message(self, conversation_id: UUID, message: Message) -> Message:
+        """
+        Agrega un mensaje a una conversación activa. Lanza KeyError si la
+        conversación no está en Redis (no existe o ya fue archivada).
+        """
+        if message.id is None:
+            message.id = uuid4()
+        if message.timestamp is None:
+            message.timestamp = datetime.utcnow()
+
+        meta_key = _meta_key(conversation_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    # WATCH evita escribir sobre una conversación que el migrador acaba de archivar
+                    await pipe.watch(meta_key)
+                    if not await pipe.exists(meta_key):
+                        raise KeyError(f"Conversación {conversation_id} no encontrada")
+                    now = repr(time.time())
+                    pipe.multi()
+                    pipe.hset(_message_key(message.id), mapping=_message_mapping(conversation_id, message))
+                    pipe.rpush(_messages_key(conversation_id), str(message.id))
+                    pipe.hset(meta_key, "last_activity", now)
+                    pipe.hincrby(meta_key, "message_count", 1)
+                    pipe.zadd(ACTIVE_KEY, {str(conversation_id): float(now)})
+                    await pipe.execute()
+                    return message
+                except WatchError:
+                    continue
+
+    @track_repository("hot_list_all")
+    @traced("redis.list_all")
+    async def list_all(self) -> List[Conversation]:
+        """Lista las conversaciones activas"""
+        conversations = []
+        for conversation_id in await self.redis.zrange(ACTIVE_KEY, 0, -1):
+            conversation = await self.get(UUID(_str(conversation_id)))
+            if conversation:
+                conversations.append(conversation)
+        return conversations
+
+    @track_repository("hot_list_summaries")
+    @traced("redis.list_summaries")
+    async def list_summaries(self) -> List[SummaryRow]:
+        """Resumen de las conversaciones activas: `message_count` y el timestamp del último mensaje"""
+        ids = [UUID(_str(conversation_id)) for conversation_id in await self.redis.zrange(ACTIVE_KEY, 0, -1)]
+        if not ids:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for conversation_id in ids:
+                pipe.hget(_meta_key(conversation_id), "message_count")
+                pipe.lindex(_messages_key(conversation_id), -1)
+            replies = await pipe.execute()
+        counts, last_ids = replies[0::2], replies[1::2]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for last_id in last_ids:
+                if last_id is not None:
+                    pipe.hget(_message_key(_str(last_id)), "timestamp")
+            timestamps = iter(await pipe.execute())
+
+        summaries = []
+        for conversation_id, count, last_id in zip(ids, counts, last_ids):
+            timestamp = next(timestamps) if last_id is not None else None
+            if count is None:
+                continue  # Archivada entre ambas lecturas
+            last = datetime.fromisoformat(_str(timestamp)) if timestamp else None
+            summaries.append((conversation_id, int(count), last))
+        return summaries
+
+    async def idle_conversations(self, idle_before: float, limit: int) -> List[UUID]:
+        """Conversaciones sin actividad desde `idle_before` (epoch), las más antiguas primero."""
+        ids = await self.redis.zrangebyscore(ACTIVE_KEY, "-inf", idle_before, start=0, num=limit)
+        return [UUID(_str(conversation_id)) for conversation_id in ids]
 
-    async def get(self, conv_id: UUID) -> Conversation | None:
-        data = await self.redis.get(str(conv_id))
-        return Conversation.parse_raw(data) if data else None
+    async def evict(self, conversation: Conversation, last_activity: str) -> bool:
+        """
+        Elimina la conversación del tier caliente si no tuvo actividad desde
+        `last_activity`. Devuelve False si llegó un mensaje nuevo entretanto.
+        """
+        meta_key = _meta_key(conversation.id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(meta_key)
+                if _str(await pipe.hget(meta_key, "last_activity")) != last_activity:
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.delete(meta_key, _messages_key(conversation.id))
+                for message in conversation.messages:
+                    pipe.delete(_message_key(message.id))
+                pipe.zrem(ACTIVE_KEY, str(conversation.id))
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
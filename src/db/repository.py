@@ -1,10 +1,47 @@
 # src/db/repository.py
 from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import List, Optional, Tuple
 from uuid import UUID
-from src.models.schemas import Conversation
+from src.models.schemas import Conversation, Message
+
+# (id, role, content, timestamp) de cada mensaje del historial, en orden
+MessageRow = Tuple[UUID, str, str, datetime]
+# (id, message_count, last_message_timestamp) de cada conversación
+SummaryRow = Tuple[UUID, int, Optional[datetime]]
 
 class ConversationRepository(ABC):
+    """
+    Interfaz de almacenamiento de conversaciones que usa ConversationService.
+    La implementan el repositorio SQL, el tier caliente en Redis y el
+    repositorio por niveles (Redis + Postgres).
+    """
     @abstractmethod
-    async def save(self, conv: Conversation) -> None: ...
+    async def get(self, conversation_id: UUID) -> Optional[Conversation]: ...
+
     @abstractmethod
-    async def get(self, conv_id: UUID) -> Conversation | None: ...
+    async def create(self, conversation: Conversation) -> Conversation: ...
+
+    @abstractmethod
+    async def add_message(self, conversation_id: UUID, message: Message) -> Message: ...
+
+    @abstractmethod
+    async def list_all(self) -> List[Conversation]: ...
+
+    async def exists(self, conversation_id: UUID) -> bool:
+        """Si la conversación existe. Por defecto se deriva de get(); las implementaciones lo hacen sin cargar el historial."""
+        return await self.get(conversation_id) is not None
+
+    async def history_rows(self, conversation_id: UUID) -> Optional[List[MessageRow]]:
+        """Historial proyectado en filas, sin construir mensajes. Por defecto se deriva de get()."""
+        conversation = await self.get(conversation_id)
+        if conversation is None:
+            return None
+        return [(m.id, m.role, m.content, m.timestamp) for m in conversation.messages]
+
+    async def list_summaries(self) -> List[SummaryRow]:
+        """Resumen de cada conversación. Por defecto se deriva de list_all()."""
+        return [
+            (c.id, len(c.messages), max((m.timestamp for m in c.messages), default=None))
+            for c in await self.list_all()
+        ]
@@ -1,14 +1,25 @@
 # src/db/session.py
-from typing import AsyncGenerator
+import asyncio
+import logging
+import time
+from typing import Any, AsyncGenerator, Dict
+from uuid import uuid4
 from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import make_url, text
 from fastapi import Depends
 
-from src.core.config import get_settings
+from src.core.config import Settings, get_settings
+from src.core.metrics import DB_POOL_CONNECTIONS, DB_POOL_WAIT_SECONDS
+from src.db.timeouts import set_request_deadline
+from src.db.partitions import ensure_partitions, is_postgres
 from src.repositories.conversation_repository import ConversationRepository
 from src.models.schemas import Base
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
 # Redis pool asíncrono
@@ -49,18 +60,78 @@ async def close_redis():
 engine = None
 AsyncSessionLocal = None
 
-async def init_db(postgres_url: str):
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Pool asíncrono que registra cuánto espera cada checkout por una conexión."""
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+
+def _register_pool_metrics(pool):
+    """Publica el estado del pool en el gauge `docochat_db_pool_connections`."""
+    if not isinstance(pool, InstrumentedAsyncQueuePool):
+        return
+    DB_POOL_CONNECTIONS.labels(state="in_use").set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels(state="idle").set_function(pool.checkedin)
+    # overflow() es negativo mientras el pool base no está completo
+    DB_POOL_CONNECTIONS.labels(state="overflow").set_function(lambda: max(pool.overflow(), 0))
+
+def engine_options(url: str, settings: Settings) -> Dict[str, Any]:
+    """
+    Argumentos de create_async_engine según la configuración del pool.
+
+    SQLite en memoria usa su propio pool (StaticPool) y no admite estas opciones.
+    Con asyncpg se aplican el timeout por sentencia y el modo PgBouncer.
+    """
+    options: Dict[str, Any] = {"future": True}
+    db_url = make_url(url)
+    if db_url.get_backend_name() == "sqlite" and db_url.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping
+    )
+    if db_url.get_driver_name() != "asyncpg":
+        return options
+
+    connect_args: Dict[str, Any] = {}
+    if settings.db_statement_timeout_ms:
+        if not settings.db_pgbouncer_mode:
+            # PgBouncer rechaza parámetros de arranque desconocidos; ahí solo aplica el timeout del cliente
+            connect_args["server_settings"] = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+        # Margen para que, si hay timeout de servidor, se reporte ese error antes que el del cliente
+        connect_args["command_timeout"] = settings.db_statement_timeout_ms / 1000 + 1
+    if settings.db_pgbouncer_mode:
+        # En modo transaction los prepared statements no sobreviven entre transacciones
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+async def init_db(postgres_url: str, create_tables: bool = True):
     """
     Inicializa la base de datos creando todas las tablas definidas en los modelos.
     
     Args:
         postgres_url (str): URL de conexión a PostgreSQL
+        create_tables (bool): Ejecutar el DDL (create_all). Desactivarlo acelera el
+            arranque cuando el esquema ya se creó con `python -m src.db.init_db`
     """
     global engine, AsyncSessionLocal
     
     try:
-        # Crear el engine con la URL proporcionada
-        engine = create_async_engine(postgres_url, future=True)
+        # Crear el engine con la URL proporcionada y el pool configurado
+        engine = create_async_engine(postgres_url, **engine_options(postgres_url, get_settings()))
+        _register_pool_metrics(engine.pool)
         AsyncSessionLocal = sessionmaker(
             bind=engine,
             class_=AsyncSession,
@@ -68,18 +139,67 @@ async def init_db(postgres_url: str):
         )
         
         # Crear todas las tablas
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        if create_tables:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                if is_postgres(engine):
+                    await ensure_partitions(conn, get_settings().partition_premake_months)
         print("✅ Base de datos inicializada correctamente")
     except Exception as e:
         print(f"❌ Error al inicializar la base de datos: {str(e)}")
         raise
 
+async def warm_up_pool(connections: int):
+    """
+    Abre `connections` conexiones en paralelo y las devuelve al pool, para que
+    las primeras peticiones no paguen el establecimiento de la conexión. Nunca
+    más de las que admite el pool: la barrera esperaría a checkouts imposibles.
+    """
+    if not engine or connections <= 0:
+        return
+    pool = engine.pool
+    # max_overflow=-1: overflow sin límite
+    if isinstance(pool, AsyncAdaptedQueuePool) and pool._max_overflow >= 0:
+        capacity = pool.size() + pool._max_overflow
+        if connections > capacity:
+            logger.warning(f"Capping DB pool warm-up at {capacity} connections (requested {connections})")
+            connections = capacity
+
+    async def checkout():
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                # Mantener todas abiertas a la vez para forzar conexiones distintas
+                await barrier.wait()
+        except Exception:
+            barrier.release()
+            raise
+
+    barrier = _Barrier(connections)
+    await asyncio.gather(*(checkout() for _ in range(connections)))
+
+class _Barrier:
+    """Barrera mínima para asyncio (asyncio.Barrier solo existe desde Python 3.11)."""
+    def __init__(self, parties: int):
+        self.parties = parties
+        self.arrived = 0
+        self.event = asyncio.Event()
+
+    async def wait(self):
+        self.arrived += 1
+        if self.arrived >= self.parties:
+            self.event.set()
+        await self.event.wait()
+
+    def release(self):
+        self.event.set()
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     if not AsyncSessionLocal:
         raise RuntimeError("Database not initialized. Call init_db first.")
     
     async with AsyncSessionLocal() as session:
+        set_request_deadline(session, settings.db_request_timeout_ms)
         try:
             yield session
         finally:
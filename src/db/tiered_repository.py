@@ -0,0 +1,185 @@
+# src/db/tiered_repository.py
+"""
+Almacenamiento por niveles: Redis (conversaciones activas) + Postgres (archivo).
+
+Las escrituras van siempre a Redis. Las lecturas consultan Redis y, si la
+conversación no está, caen a Postgres. Escribir en una conversación archivada la
+devuelve al tier caliente. `ConversationArchiver` mueve en segundo plano a
+Postgres las conversaciones inactivas durante más de `hot_tier_idle_seconds`.
+"""
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+import logging
+
+from src.core.config import Settings
+from src.core.metrics import ARCHIVED_CONVERSATIONS
+from src.db.repository import ConversationRepository, MessageRow, SummaryRow
+from src.db.redis_repository import RedisConversationRepository
+from src.db.postgres_repository import PostgresConversationRepository
+from src.models.schemas import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_LOCK_KEY = "conv:archive:lock"
+
+class TieredConversationRepository(ConversationRepository):
+    def __init__(self, hot: RedisConversationRepository, cold: PostgresConversationRepository):
+        self.hot = hot
+        self.cold = cold
+        # Conversaciones leídas de Postgres en esta petición, para no releerlas al escribir
+        self._cold_reads: Dict[UUID, Conversation] = {}
+
+    async def get(self, conversation_id: UUID) -> Optional[Conversation]:
+        """Obtiene una conversación de Redis o, si fue archivada, de Postgres"""
+        conversation = await self.hot.get(conversation_id)
+        if conversation:
+            return conversation
+        conversation = await self.cold.get(conversation_id)
+        if conversation:
+            self._cold_reads[conversation_id] = conversation
+        return conversation
+
+    async def exists(self, conversation_id: UUID) -> bool:
+        """Si la conversación está en Redis o archivada en Postgres"""
+        return await self.hot.exists(conversation_id) or await self.cold.exists(conversation_id)
+
+    async def create(self, conversation: Conversation) -> Conversation:
+        """Crea una nueva conversación (solo en Redis)"""
+        return await self.hot.create(conversation)
+
+    async def add_message(self, conversation_id: UUID, message: Message) -> Message:
+        """Agrega un mensaje en Redis, restaurando antes la conversación si estaba archivada"""
+        try:
+            return await self.hot.add_message(conversation_id, message)
+        except KeyError:
+            pass
+
+        archived = self._cold_reads.pop(conversation_id, None) or await self.cold.get(conversation_id)
+        if not archived:
+            raise KeyError(f"Conversación {conversation_id} no encontrada")
+        # El servicio puede haber agregado ya el mensaje a la lista en memoria
+        # Si otra petición la restauró a la vez, se agrega sobre su copia
+        if await self.hot.restore(archived, exclude=message):
+            logger.info(f"Conversation {conversation_id} restored to the hot tier")
+        return await self.hot.add_message(conversation_id, message)
+
+    async def list_all(self) -> List[Conversation]:
+        """Lista las conversaciones activas y las archivadas"""
+        active = await self.hot.list_all()
+        active_ids = {conversation.id for conversation in active}
+        archived = [c for c in await self.cold.list_all() if c.id not in active_ids]
+        return active + archived
+
+    async def history_rows(self, conversation_id: UUID) -> Optional[List[MessageRow]]:
+        """Historial como filas, de Redis o, si fue archivada, de Postgres"""
+        rows = await self.hot.history_rows(conversation_id)
+        if rows is not None:
+            return rows
+        return await self.cold.history_rows(conversation_id)
+
+    async def list_summaries(self) -> List[SummaryRow]:
+        """Resumen de las conversaciones activas y las archivadas"""
+        active = await self.hot.list_summaries()
+        active_ids = {row[0] for row in active}
+        return active + [row for row in await self.cold.list_summaries() if row[0] not in active_ids]
+
+class ConversationArchiver:
+    """
+    Migrador en segundo plano de Redis a Postgres.
+
+    Cada ciclo toma hasta `batch_size` conversaciones inactivas, las inserta en
+    Postgres en una transacción y solo entonces las elimina de Redis (si no
+    recibieron mensajes mientras tanto). Con varios workers, un lock en Redis
+    evita trabajo duplicado; de todos modos el proceso es idempotente.
+
+    Args:
+        redis: Cliente Redis
+        session_factory: Fábrica de AsyncSession para el tier frío
+        idle_seconds: Inactividad a partir de la cual se archiva una conversación
+        batch_size: Conversaciones por lote
+        interval: Segundos entre ciclos
+    """
+    def __init__(
+        self,
+        redis,
+        session_factory: Callable,
+        idle_seconds: float = 1800.0,
+        batch_size: int = 100,
+        interval: float = 60.0
+    ):
+        self.redis = redis
+        self.hot = RedisConversationRepository(redis)
+        self.session_factory = session_factory
+        self.idle_seconds = idle_seconds
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, redis, session_factory: Callable, settings: Settings) -> "ConversationArchiver":
+        return cls(
+            redis,
+            session_factory,
+            idle_seconds=settings.hot_tier_idle_seconds,
+            batch_size=settings.archive_batch_size,
+            interval=settings.archive_interval_seconds
+        )
+
+    async def run_once(self, now: Optional[float] = None) -> int:
+        """Archiva un lote de conversaciones inactivas. Devuelve cuántas salieron de Redis."""
+        now = time.time() if now is None else now
+        ids = await self.hot.idle_conversations(now - self.idle_seconds, self.batch_size)
+        if not ids:
+            return 0
+
+        snapshots = [s for s in await asyncio.gather(*(self.hot.snapshot(i) for i in ids)) if s]
+        async with self.session_factory() as session:
+            inserted = await PostgresConversationRepository(session).archive([c for c, _ in snapshots])
+
+        evicted = 0
+        for conversation, last_activity in snapshots:
+            if await self.hot.evict(conversation, last_activity):
+                evicted += 1
+        ARCHIVED_CONVERSATIONS.inc(evicted)
+        logger.info(f"Archived {evicted} conversations ({inserted} messages) to Postgres")
+        return evicted
+
+    async def _acquire_lock(self, token: str) -> bool:
+        return bool(await self.redis.set(ARCHIVE_LOCK_KEY, token, nx=True, px=int(self.interval * 1000)))
+
+    async def _release_lock(self, token: str):
+        value = await self.redis.get(ARCHIVE_LOCK_KEY)
+        if value in (token, token.encode()):
+            await self.redis.delete(ARCHIVE_LOCK_KEY)
+
+    async def run(self):
+        while True:
+            token = uuid4().hex
+            try:
+                if await self._acquire_lock(token):
+                    try:
+                        # Vaciar el atraso en lotes consecutivos
+                        while await self.run_once() >= self.batch_size:
+                            pass
+                    finally:
+                        await self._release_lock(token)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Conversation archiving failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="conversation-archiver")
+        logger.info(f"Conversation archiver started (idle={self.idle_seconds}s, batch={self.batch_size})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,75 @@
+# src/db/timeouts.py
+"""
+Timeouts de base de datos.
+
+`get_session` fija en `session.info` un plazo a partir de `db_request_timeout_ms`
+y los métodos del repositorio decorados con `enforce_db_deadline` comparten ese
+presupuesto. Agotarlo, esperar más de `db_pool_timeout` por una conexión o superar
+el statement_timeout de Postgres se traduce en DatabaseTimeoutError (503).
+"""
+import asyncio
+import functools
+from typing import Any, Optional
+import logging
+
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+
+from src.core.exceptions import DatabaseTimeoutError
+from src.core.metrics import DB_TIMEOUTS
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_KEY = "db_deadline"
+
+# SQLSTATE de Postgres para "canceling statement due to statement timeout"
+_QUERY_CANCELED = "57014"
+
+def set_request_deadline(session: Any, timeout_ms: Optional[float]):
+    """Fija el plazo de BD de la petición que usa `session` (sin efecto si timeout_ms es None)."""
+    if timeout_ms:
+        session.info[DEADLINE_KEY] = asyncio.get_running_loop().time() + timeout_ms / 1000
+
+def remaining_budget(session: Any) -> Optional[float]:
+    """Segundos que le quedan a la sesión, o None si no tiene plazo."""
+    deadline = (getattr(session, "info", None) or {}).get(DEADLINE_KEY)
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+def _is_statement_timeout(error: DBAPIError) -> bool:
+    orig = error.orig
+    return _QUERY_CANCELED in (getattr(orig, "pgcode", None), getattr(orig, "sqlstate", None))
+
+def _timeout(reason: str, message: str) -> DatabaseTimeoutError:
+    DB_TIMEOUTS.labels(reason=reason).inc()
+    logger.warning(f"Database timeout ({reason}): {message}")
+    return DatabaseTimeoutError(message, details={"reason": reason})
+
+def enforce_db_deadline(func):
+    """
+    Decorador para métodos de repositorio (con atributo `session`) que aplica el
+    plazo de la petición y convierte los timeouts de BD en DatabaseTimeoutError.
+    Tras un timeout la sesión queda inutilizable; get_session la cierra al terminar.
+    """
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        budget = remaining_budget(self.session)
+        try:
+            if budget is None:
+                return await func(self, *args, **kwargs)
+            if budget <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(func(self, *args, **kwargs), budget)
+        except asyncio.TimeoutError:
+            left = remaining_budget(self.session)
+            if left is not None and left <= 0:
+                raise _timeout("request", "Database time budget for this request exhausted")
+            # command_timeout de asyncpg
+            raise _timeout("statement", "Database statement timed out")
+        except PoolTimeoutError:
+            raise _timeout("pool", "No database connection available")
+        except DBAPIError as e:
+            if _is_statement_timeout(e):
+                raise _timeout("statement", "Database statement timed out")
+            raise
+    return wrapper
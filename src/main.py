@@ -1,11 +1,30 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from contextlib import asynccontextmanager
-from src.api.v1 import conversations, providers
-from src.db.session import init_db, close_db
-from src.cache.redis import init_redis, close_redis
-from src.core.config import get_settings
+from src.api.v1 import conversations, providers, simulations, admin
+from src.db import session as db_session
+from src.db.session import init_db, close_db, warm_up_pool
+from src.db.tiered_repository import ConversationArchiver
+from src.db.partitions import PartitionMaintainer, is_postgres
+from src.services.retention_service import RetentionWorker
+from src.services.conversation_service import drain_pending_writes
+from src.services.import_service import cancel_import_jobs
+from src.providers.health import get_health_monitor
+from src.cache.redis import init_redis, close_redis, warm_up_redis
+from src.cache.versions import VersionStore
+from src.cache.conversations import ConversationCache, ConversationCacheSubscriber
+from src.cache.settings_reload import SettingsReloadSubscriber
+from src.core.config import SettingsWatcher, get_settings, get_settings_manager
+from src.core.metrics import metrics_middleware, metrics_response, start_metrics_server
+from src.core.tracing import tracing_middleware, configure_tracing
+from src.core.profiling import request_profiling_hook
+from src.core.memory import memory_middleware
+from src.core.startup import StartupTimer, warm_up_llm_adapter
 from src.core.exceptions import (
     APIError,
     api_exception_handler,
@@ -25,18 +44,111 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     settings = get_settings()
+    timer = StartupTimer()
+    timer.record("import", _import_seconds)
+    
+    # Exponer métricas de Prometheus en el puerto configurado
+    start_metrics_server(settings.prometheus_port)
+    configure_tracing(settings.trace_export_path, settings.app_name)
     
     # Inicializar base de datos
-    await init_db(settings.postgres_url)
+    async with timer.phase("init_db"):
+        await init_db(settings.postgres_url, create_tables=settings.db_create_tables_on_startup)
     logger.info("✅ Base de datos inicializada correctamente")
     
     # Inicializar Redis
-    app.state.redis = await init_redis()
+    async with timer.phase("init_redis"):
+        app.state.redis = await init_redis()
     logger.info("✅ Conexión a Redis establecida correctamente")
     
+    # Servidor de inferencia local compartido por los workers del nodo
+    local_inference = None
+    if settings.llm_provider == "local" and settings.local_inference_mode == "server" and settings.local_inference_autostart:
+        from src.providers.local_inference import LocalInferenceProcess
+        local_inference = LocalInferenceProcess(settings)
+        async with timer.phase("local_inference"):
+            await local_inference.ensure_running()
+    
+    # Pre-calentar pools y adapter antes de reportar listo
+    async def timed(name, coro):
+        async with timer.phase(name):
+            await coro
+    
+    warmups = []
+    if settings.warmup_db_connections:
+        warmups.append(timed("warm_db_pool", warm_up_pool(settings.warmup_db_connections)))
+    if settings.warmup_redis_connections:
+        warmups.append(timed("warm_redis_pool", warm_up_redis(app.state.redis, settings.warmup_redis_connections)))
+    if settings.warmup_llm_adapter:
+        warmups.append(timed("warm_llm_adapter", warm_up_llm_adapter(settings)))
+    await asyncio.gather(*warmups)
+    
+    app.state.startup_timings = timer.phases
+    logger.info(timer.report())
+    
+    # Migrador de conversaciones inactivas de Redis a Postgres
+    archiver = None
+    if settings.conversation_store == "tiered":
+        archiver = ConversationArchiver.from_settings(app.state.redis, db_session.AsyncSessionLocal, settings)
+        archiver.start()
+    
+    # Caché en memoria de conversaciones recientes, invalidada por pub/sub de Redis
+    cache_subscriber = None
+    if settings.conversation_cache_max_entries:
+        app.state.conversation_cache = ConversationCache.from_settings(settings)
+        cache_subscriber = ConversationCacheSubscriber(app.state.redis, app.state.conversation_cache)
+        cache_subscriber.start()
+    
+    # Versiones de los ETags: las tareas que modifican conversaciones las invalidan
+    versions = VersionStore(app.state.redis, settings.conversation_version_ttl_days * 86400)
+    
+    # Particiones mensuales futuras y archivado de las frías
+    partition_maintainer = None
+    if is_postgres(db_session.engine):
+        partition_maintainer = PartitionMaintainer.from_settings(db_session.engine, settings, versions=versions)
+        partition_maintainer.start()
+    
+    # Salud de proveedores: sondeos en segundo plano, las rutas leen la caché
+    health_monitor = get_health_monitor()
+    health_monitor.start()
+    
+    # Retención: borrado o anonimización por lotes de conversaciones inactivas
+    retention_worker = None
+    if settings.retention_days:
+        retention_worker = RetentionWorker.from_settings(
+            db_session.AsyncSessionLocal, settings, versions=versions, redis=app.state.redis
+        )
+        retention_worker.start()
+    
+    # Recarga en caliente de la configuración al cambiar el .env
+    settings_watcher = None
+    if settings.settings_reload_interval_seconds:
+        settings_watcher = SettingsWatcher.from_settings(get_settings_manager(), settings)
+        settings_watcher.start()
+    
+    # Recargas pedidas por /admin/settings/reload, difundidas a todos los workers
+    app.state.settings_reload = SettingsReloadSubscriber.from_settings(app.state.redis, get_settings_manager(), settings)
+    app.state.settings_reload.start()
+    
     yield
     
     # Shutdown
+    await app.state.settings_reload.stop()
+    if settings_watcher:
+        await settings_watcher.stop()
+    if archiver:
+        await archiver.stop()
+    if cache_subscriber:
+        await cache_subscriber.stop()
+    if partition_maintainer:
+        await partition_maintainer.stop()
+    if retention_worker:
+        await retention_worker.stop()
+    await health_monitor.stop()
+    await cancel_import_jobs()
+    await drain_pending_writes()
+    if local_inference:
+        await local_inference.stop()
     await close_db()
     if hasattr(app.state, 'redis'):
         await close_redis(app.state.redis)
@@ -45,7 +157,8 @@ app = FastAPI(
     title="DocoChat API",
     description="API para el módulo de chat de DocoKids",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    dependencies=[Depends(request_profiling_hook)]
 )
 
 # Configurar CORS
@@ -57,6 +170,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas HTTP por ruta, trazas por petición (Server-Timing) y memoria de peticiones lentas
+app.middleware("http")(metrics_middleware)
+app.middleware("http")(tracing_middleware)
+app.middleware("http")(memory_middleware)
+
 # Registrar manejadores de errores
 app.add_exception_handler(APIError, api_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -65,7 +183,15 @@ app.add_exception_handler(Exception, general_exception_handler)
 # Incluir routers
 app.include_router(conversations.router)
 app.include_router(providers.router)
+app.include_router(simulations.router)
+app.include_router(admin.router)
+
+_import_seconds = time.perf_counter() - _import_started
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
@@ -1,22 +1,37 @@
 # src/models/schemas.py
-from typing import List, Literal
-from uuid import UUID, uuid4
-from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum
+from typing import Dict, List, Literal
+from uuid import NAMESPACE_URL, UUID, uuid4, uuid5
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, Index, Integer, Float
 from sqlalchemy.dialects.postgresql import UUID as PGUUID
 from sqlalchemy.orm import relationship, declarative_base
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, computed_field, field_validator, model_validator
 
 Base = declarative_base()
 
 class Message(Base):
     __tablename__ = "messages"
+    # En Postgres la tabla se particiona por mes (ver src/db/partitions.py); la clave
+    # primaria debe incluir la columna de partición
+    __table_args__ = (
+        Index("ix_messages_conversation_timestamp", "conversation_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
     id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid4)
     role = Column(Enum("user", "assistant", name="message_role"), nullable=False)
     content = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     conversation_id = Column(PGUUID(as_uuid=True), ForeignKey("conversations.id"))
+    # Proveedor y modelo que generaron la respuesta (solo mensajes del asistente)
+    provider = Column(String, nullable=True)
+    model = Column(String, nullable=True)
+    # Consumo y latencia de la respuesta (solo mensajes del asistente)
+    phase = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    queue_ms = Column(Float, nullable=True)  # Espera en la cola de admisión
+    provider_latency_ms = Column(Float, nullable=True)
 
     conversation = relationship("Conversation", back_populates="messages")
 
@@ -24,6 +39,10 @@ class Conversation(Base):
     __tablename__ = "conversations"
 
     id = Column(PGUUID(as_uuid=True), primary_key=True, default=uuid4)
+    # Cota inferior de los timestamps de sus mensajes: permite podar particiones
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Fecha en que la política de retención anonimizó sus mensajes
+    anonymized_at = Column(DateTime, nullable=True)
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
 
 # Pydantic models for API
@@ -46,3 +65,76 @@ class ConversationListItem(BaseModel):
     message_count: int
     last_message_timestamp: datetime | None = None
     model_config = ConfigDict(from_attributes=True)
+
+# Consumo acumulado de respuestas del asistente
+class UsageStats(BaseModel):
+    messages: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    provider_latency_ms: float = 0.0
+    queue_ms: float = 0.0
+
+    @computed_field
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @computed_field
+    @property
+    def avg_provider_latency_ms(self) -> float:
+        return self.provider_latency_ms / self.messages if self.messages else 0.0
+
+class ConversationUsage(BaseModel):
+    conversation_id: UUID
+    totals: UsageStats
+    phases: Dict[str, UsageStats] = {}
+
+class ProviderUsage(BaseModel):
+    provider: str
+    model: str
+    totals: UsageStats
+    phases: Dict[str, UsageStats] = {}
+
+# Importación masiva: una línea NDJSON por mensaje (mismo formato que la exportación)
+class ImportedMessage(MessageCreate):
+    conversation_id: UUID
+    message_id: UUID | None = None
+    timestamp: datetime
+    provider: str | None = None
+    model: str | None = None
+
+    @field_validator("timestamp")
+    @classmethod
+    def to_naive_utc(cls, v: datetime) -> datetime:
+        # La columna es TIMESTAMP sin zona horaria, en UTC
+        if v.tzinfo is not None:
+            v = v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    @model_validator(mode="after")
+    def default_message_id(self):
+        # ID determinista para que reimportar una línea no duplique el mensaje
+        if self.message_id is None:
+            key = f"{self.conversation_id}:{self.timestamp.isoformat()}:{self.role}:{self.content}"
+            self.message_id = uuid5(NAMESPACE_URL, key)
+        return self
+
+# Modelos para simulaciones batch (evaluación offline)
+class SimulationScript(BaseModel):
+    id: str | None = None
+    provider: str | None = None
+    turns: List[str] = Field(..., min_length=1)
+
+class SimulationTurn(BaseModel):
+    user: str
+    assistant: str
+    latency_ms: float
+
+class SimulationResult(BaseModel):
+    script_id: str | None = None
+    conversation_id: UUID | None = None
+    provider: str
+    status: Literal["ok", "error"] = "ok"
+    error: str | None = None
+    turns: List[SimulationTurn] = []
+    duration_ms: float = 0.0
@@ -1,88 +1,214 @@
 # src/providers/adapters/base_adapter.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass
+import re
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Union
 from src.models.schemas import Message
+from src.providers.interface import ChunkCallback, LLMClient
 from src.core.prompts import MedicalPrompts, ConversationPhase
+from src.core.metrics import (
+    stage_timer,
+    observe_generation_stages,
+    SAFETY_SHORT_CIRCUITS,
+    FALLBACK_RESPONSES,
+    FORCED_QUESTION_REWRITES
+)
+from src.core.tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
 
-class BaseLLMAdapter(ABC):
+@dataclass
+class ProviderResult:
+    """Respuesta del proveedor con el consumo de tokens que informa (None si no lo informa)."""
+    text: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+class BaseLLMAdapter(LLMClient, ABC):
     """
     Base adapter que proporciona funcionalidad común para todos los LLM providers.
     Implementa el patrón Template Method para estandarizar el flujo de generación.
     """
+    # Los adapters con streaming definen `stream_provider(formatted_messages) -> AsyncIterator[str]`
+    stream_provider: Optional[Callable[[Any], AsyncIterator[str]]] = None
     
     def __init__(self, settings):
         self.settings = settings
         self.logger = logging.getLogger(self.__class__.__name__)
     
-    async def generate(self, context: List[Message]) -> Message:
+    async def generate(self, context: List[Message], context_info: Optional[Dict[str, Any]] = None) -> Message:
         """
         Template method que define el flujo estándar de generación de respuestas.
+        Cada etapa se mide y se exporta como métrica etiquetada por proveedor, modelo y fase.
+        `context_info` es el análisis del contexto ya calculado (ver update_context_info()).
+        """
+        return await self._generate(context, context_info=context_info)
+    
+    async def generate_streaming(
+        self,
+        context: List[Message],
+        on_chunk: ChunkCallback,
+        context_info: Optional[Dict[str, Any]] = None
+    ) -> Message:
         """
+        generate() entregando a `on_chunk` el texto del proveedor a medida que llega
+        (con `stream_provider`; si el adapter no lo tiene, completo al recibirlo).
+        El post-procesado puede reescribir la respuesta: el mensaje devuelto es el
+        definitivo. `context_info` evita re-analizar el historial si quien llama
+        lo mantiene al día con update_context_info().
+        """
+        return await self._generate(context, on_chunk, context_info)
+    
+    async def _generate(
+        self,
+        context: List[Message],
+        on_chunk: Optional[ChunkCallback] = None,
+        context_info: Optional[Dict[str, Any]] = None
+    ) -> Message:
+        timings: Dict[str, float] = {}
+        phase: Optional[ConversationPhase] = None
         try:
             # 1. Safety check
-            safety_response = self._check_safety(context)
+            with stage_timer(timings, "safety_check"):
+                safety_response = self._check_safety(context)
             if safety_response:
+                SAFETY_SHORT_CIRCUITS.labels(provider=self.provider_name).inc()
                 return safety_response
             
             # 2. Analyze context
-            context_info = self._analyze_context(context)
+            if context_info is None:
+                with stage_timer(timings, "context_analysis"):
+                    context_info = self._analyze_context(context)
             
             # 3. Determine conversation phase
-            phase = self._determine_phase(context)
+            with stage_timer(timings, "phase_detection"):
+                phase = self._determine_phase(context)
             self.logger.info(f"Conversation phase: {phase.value}")
             
             # 4. Generate system prompt
-            system_prompt = self._generate_system_prompt(context, phase, context_info)
+            with stage_timer(timings, "prompt_generation"):
+                system_prompt = self._generate_system_prompt(context, phase, context_info)
             
             # 5. Format messages for provider
-            formatted_messages = self._format_messages_for_provider(context, system_prompt)
+            with stage_timer(timings, "formatting"):
+                formatted_messages = self._format_messages_for_provider(context, system_prompt)
             
             # 6. Call provider-specific generation
-            raw_response = await self._call_provider(formatted_messages)
+            with stage_timer(timings, "provider_call"), span("provider.call", provider=self.provider_name, model=self.model_name):
+                if on_chunk is not None and self.stream_provider is not None:
+                    chunks = []
+                    async for chunk in self.stream_provider(formatted_messages):
+                        chunks.append(chunk)
+                        await on_chunk(chunk)
+                    result = self._stream_result(formatted_messages, "".join(chunks))
+                else:
+                    result = await self._call_provider(formatted_messages)
+                    if on_chunk is not None:
+                        await on_chunk(result.text if isinstance(result, ProviderResult) else result)
+            if not isinstance(result, ProviderResult):
+                result = ProviderResult(result)
             
             # 7. Validate and post-process response
-            final_response = self._validate_and_post_process(raw_response, phase, context_info)
+            with stage_timer(timings, "post_processing"):
+                final_response = self._validate_and_post_process(result.text, phase, context_info)
             
             return Message(
                 role="assistant",
-                content=final_response
+                content=final_response,
+                provider=self.provider_name,
+                model=self.model_name,
+                phase=phase.value,
+                prompt_tokens=result.prompt_tokens,
+                completion_tokens=result.completion_tokens,
+                provider_latency_ms=timings["provider_call"] * 1000
             )
             
         except Exception as e:
             self.logger.error(f"Error in generate method: {str(e)}")
-            return self._get_fallback_response()
+            FALLBACK_RESPONSES.labels(provider=self.provider_name, model=self.model_name).inc()
+            fallback = self._get_fallback_response()
+            fallback.phase = phase.value if phase else None
+            if "provider_call" in timings:
+                fallback.provider_latency_ms = timings["provider_call"] * 1000
+            return fallback
+        finally:
+            observe_generation_stages(
+                self.provider_name,
+                self.model_name,
+                phase.value if phase else "none",
+                timings
+            )
+    
+    async def probe(self) -> None:
+        """
+        Comprobación barata de disponibilidad para el monitor de salud (sin
+        generar texto ni consumir tokens). Lanza una excepción si el proveedor
+        no responde. Por defecto basta con que el adapter se haya inicializado.
+        """
+        return None
+    
+    @property
+    def provider_name(self) -> str:
+        """Nombre del proveedor configurado (etiqueta de métricas)."""
+        return getattr(self.settings, "llm_provider", "unknown")
+    
+    @property
+    def model_name(self) -> str:
+        """Nombre del modelo en uso (etiqueta de métricas)."""
+        # Algunos adapters guardan en self.model el objeto del SDK en lugar del nombre
+        model = getattr(self, "model", None)
+        if isinstance(model, str):
+            return model
+        return getattr(self.settings, "llm_model", None) or "unknown"
     
     def _check_safety(self, context: List[Message]) -> Optional[Message]:
         """Verifica si hay síntomas de emergencia en el último mensaje del usuario."""
         if context and context[-1].role == "user":
-            safety_alert = MedicalPrompts.get_safety_check(context[-1].content)
-            if safety_alert:
+            safety_response = MedicalPrompts.get_safety_response(context[-1].content)
+            if safety_response:
                 return Message(
                     role="assistant",
-                    content=f"🚨 {safety_alert}\n\nPor favor, busca atención médica inmediata. Esta información no reemplaza la consulta médica profesional."
+                    content=safety_response,
+                    provider=self.provider_name,
+                    model=self.model_name,
+                    phase="safety"
                 )
         return None
     
+    def _stream_result(self, formatted_messages: Any, text: str) -> ProviderResult:
+        """Resultado de una generación en streaming; los adapters pueden añadir el consumo de tokens."""
+        return ProviderResult(text)
+    
     def _analyze_context(self, context: List[Message]) -> Dict[str, Any]:
         """Analiza el contexto de la conversación para extraer información clave."""
-        context_info = {
-            'has_age': False,
-            'has_symptom': False,
-            'symptom': None,
-            'age': None,
-            'message_count': len(context),
-            'user_messages': [msg for msg in context if msg.role == "user"]
-        }
-        
-        # Análisis básico del contexto
-        for msg in context_info['user_messages']:
+        context_info = self.update_context_info(None, None)
+        for msg in context:
+            self.update_context_info(context_info, msg)
+        return context_info
+    
+    def update_context_info(self, context_info: Optional[Dict[str, Any]], msg: Optional[Message]) -> Dict[str, Any]:
+        """
+        Incorpora un mensaje al análisis (lo crea si `context_info` es None), sin
+        recorrer el historial: el resultado es el mismo que _analyze_context().
+        """
+        if context_info is None:
+            context_info = {
+                'has_age': False,
+                'has_symptom': False,
+                'symptom': None,
+                'age': None,
+                'message_count': 0,
+                'user_messages': []
+            }
+        if msg is None:
+            return context_info
+        context_info['message_count'] += 1
+        if msg.role == "user":
+            context_info['user_messages'].append(msg)
             content = msg.content.lower()
             
             # Detectar edad (patrones básicos)
-            import re
             age_patterns = [
                 r'(\d+)\s*(años?|meses?|mes|año)',
                 r'edad\s*(?:del\s*nino|es)\s*(\d+)',
@@ -151,8 +277,11 @@ class BaseLLMAdapter(ABC):
         pass
     
     @abstractmethod
-    async def _call_provider(self, formatted_messages: Any) -> str:
-        """Llama al proveedor específico. Debe ser implementado por cada adapter."""
+    async def _call_provider(self, formatted_messages: Any) -> Union[str, ProviderResult]:
+        """
+        Llama al proveedor específico. Debe ser implementado por cada adapter.
+        Devuelve ProviderResult si el proveedor informa el consumo de tokens.
+        """
         pass
     
     def _validate_and_post_process(self, raw_response: str, phase: ConversationPhase, context_info: Dict[str, Any]) -> str:
@@ -161,7 +290,10 @@ class BaseLLMAdapter(ABC):
         
         # Validar y corregir la respuesta para asegurar que tenga la pregunta correcta
         if phase in [ConversationPhase.INITIAL, ConversationPhase.DISCOVERY]:
-            response_text = self._force_specific_question(response_text, phase, context_info)
+            forced_text = self._force_specific_question(response_text, phase, context_info)
+            if forced_text != response_text:
+                FORCED_QUESTION_REWRITES.labels(provider=self.provider_name, phase=phase.value).inc()
+            response_text = forced_text
         
         # Asegurar que la respuesta sea apropiada para el contexto médico
         if not response_text:
@@ -240,5 +372,7 @@ class BaseLLMAdapter(ABC):
         """Proporciona una respuesta de fallback en caso de error."""
         return Message(
             role="assistant",
-            content="Disculpa, estoy teniendo dificultades técnicas. Por favor, consulta directamente con un pediatra para obtener la mejor atención para tu hijo."
+            content="Disculpa, estoy teniendo dificultades técnicas. Por favor, consulta directamente con un pediatra para obtener la mejor atención para tu hijo.",
+            provider=self.provider_name,
+            model=self.model_name
         ) 
\ No newline at end of file
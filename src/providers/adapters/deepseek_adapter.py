@@ -1,8 +1,9 @@
 # src/providers/adapters/deepseek_adapter.py
+import asyncio
 import requests
 from typing import List, Any, Dict
 from src.models.schemas import Message
-from src.providers.adapters.base_adapter import BaseLLMAdapter
+from src.providers.adapters.base_adapter import BaseLLMAdapter, ProviderResult
 from src.core.config import get_settings, Settings
 import logging
 import json
@@ -31,6 +32,7 @@ class DeepSeekAdapter(BaseLLMAdapter):
         try:
             self.api_key = self.settings.deepseek_api_key
             self.base_url = "https://api.deepseek.com/v1/chat/completions"
+            self.models_url = "https://api.deepseek.com/v1/models"
             self.model = self.settings.llm_model or "deepseek-chat"
             self.logger.info(f"DeepSeek client initialized successfully with model: {self.model}")
         except Exception as e:
@@ -62,7 +64,17 @@ class DeepSeekAdapter(BaseLLMAdapter):
         
         return messages
     
-    async def _call_provider(self, formatted_messages: List[Dict[str, str]]) -> str:
+    async def probe(self) -> None:
+        """Lista los modelos disponibles (no consume tokens)."""
+        response = await asyncio.to_thread(
+            requests.get,
+            self.models_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=10
+        )
+        response.raise_for_status()
+    
+    async def _call_provider(self, formatted_messages: List[Dict[str, str]]) -> ProviderResult:
         """
         Llama al modelo de DeepSeek para generar la respuesta.
         
@@ -70,7 +82,7 @@ class DeepSeekAdapter(BaseLLMAdapter):
             formatted_messages: Mensajes formateados para DeepSeek
             
         Returns:
-            Texto de la respuesta generada
+            Texto de la respuesta generada y tokens consumidos
         """
         try:
             # Configurar parámetros de generación
@@ -104,7 +116,12 @@ class DeepSeekAdapter(BaseLLMAdapter):
             
             self.logger.info(f"DeepSeek response generated: {response_text[:100]}...")
             
-            return response_text
+            usage = response_data.get("usage") or {}
+            return ProviderResult(
+                response_text,
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens")
+            )
             
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Error calling DeepSeek provider (HTTP error): {str(e)}")
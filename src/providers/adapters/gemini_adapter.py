@@ -1,8 +1,9 @@
 # src/providers/adapters/gemini_adapter.py
+import asyncio
 import google.generativeai as genai
 from typing import List, Any, Dict
 from src.models.schemas import Message
-from src.providers.adapters.base_adapter import BaseLLMAdapter
+from src.providers.adapters.base_adapter import BaseLLMAdapter, ProviderResult
 from src.core.config import get_settings, Settings
 import logging
 
@@ -64,7 +65,11 @@ class GeminiAdapter(BaseLLMAdapter):
         
         return messages
     
-    async def _call_provider(self, formatted_messages: List[Dict[str, Any]]) -> str:
+    async def probe(self) -> None:
+        """Cuenta los tokens de un texto corto (gratuito, no genera)."""
+        await asyncio.to_thread(self.model.count_tokens, "ping")
+    
+    async def _call_provider(self, formatted_messages: List[Dict[str, Any]]) -> ProviderResult:
         """
         Llama al modelo de Gemini para generar la respuesta.
         
@@ -72,7 +77,7 @@ class GeminiAdapter(BaseLLMAdapter):
             formatted_messages: Mensajes formateados para Gemini
             
         Returns:
-            Texto de la respuesta generada
+            Texto de la respuesta generada y tokens consumidos
         """
         try:
             # Generar la respuesta usando el modelo
@@ -83,7 +88,12 @@ class GeminiAdapter(BaseLLMAdapter):
             
             self.logger.info(f"Gemini response generated: {response_text[:100]}...")
             
-            return response_text
+            usage = getattr(response, "usage_metadata", None)
+            return ProviderResult(
+                response_text,
+                prompt_tokens=getattr(usage, "prompt_token_count", None),
+                completion_tokens=getattr(usage, "candidates_token_count", None)
+            )
             
         except Exception as e:
             self.logger.error(f"Error calling Gemini provider: {str(e)}")
@@ -1,11 +1,9 @@
 # src/providers/adapters/local_adapter.py
 from typing import List, Any, Dict, Optional
 from src.models.schemas import Message
-from src.providers.adapters.base_adapter import BaseLLMAdapter
+from src.providers.adapters.base_adapter import BaseLLMAdapter, ProviderResult
 from src.core.config import get_settings, Settings
 import logging
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
@@ -15,38 +13,37 @@ class LocalAdapter(BaseLLMAdapter):
     """
     Adapter para modelos locales usando transformers.
     Soporta modelos como OLMo, Llama, etc. que se ejecutan localmente.
+
+    Con `local_inference_mode=server` no carga el modelo: envía el prompt al
+    servidor de inferencia compartido del nodo (src/providers/local_inference.py)
+    y el worker no importa torch.
     """
     
     def __init__(self, settings: Settings | None = None):
         super().__init__(settings or get_settings())
-        self._initialize_local_model()
-        self._executor = ThreadPoolExecutor(max_workers=1)  # Para ejecutar en thread separado
+        self.model = None
+        self.client = None
+        self._executor = None
+        if self.settings.local_inference_mode == "server":
+            from src.providers.local_inference import LocalInferenceClient, LocalInferenceProcess
+            # Con autostart, si el servidor cae se vuelve a arrancar al fallar la conexión
+            starter = LocalInferenceProcess(self.settings).ensure_running if self.settings.local_inference_autostart else None
+            self.client = LocalInferenceClient(
+                self.settings.local_inference_url,
+                timeout=self.settings.local_inference_timeout_seconds,
+                starter=starter
+            )
+        else:
+            self._initialize_local_model()
+            self._executor = ThreadPoolExecutor(max_workers=1)  # Para ejecutar en thread separado
     
     def _initialize_local_model(self):
         """Inicializa el modelo local."""
         self.logger.info(f"Initializing LocalAdapter with settings: {self.settings}")
         
         try:
-            # Configurar dispositivo
-            self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-            self.logger.info(f"Using device: {self.device}")
-            
-            # Modelo por defecto si no se especifica
-            model_name = self.settings.llm_model or "allenai/OLMo-2-1124-13B-Instruct"
-            
-            self.logger.info(f"Loading model: {model_name}")
-            
-            # Cargar tokenizer y modelo
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                torch_dtype=torch.float16 if self.device.type == "cuda" else torch.float32,
-                device_map=None  # Usamos to(device) en lugar de device_map
-            ).to(self.device)
-            
-            self.model.eval()
-            self.logger.info("Local model loaded successfully")
-            
+            from src.providers.local_model import LocalModel
+            self.model = LocalModel.from_settings(self.settings)
         except Exception as e:
             self.logger.error(f"Error initializing local model: {str(e)}")
             raise
@@ -77,7 +74,16 @@ class LocalAdapter(BaseLLMAdapter):
         
         return prompt
     
-    async def _call_provider(self, formatted_prompt: str) -> str:
+    async def probe(self) -> None:
+        """En memoria basta con tokenizar un texto corto; en modo server, consultar /health del servidor."""
+        if self.client is not None:
+            await self.client.health()
+            return
+        if self.model is None:
+            raise RuntimeError("Local model not loaded")
+        self.model.check()
+    
+    async def _call_provider(self, formatted_prompt: str) -> ProviderResult:
         """
         Llama al modelo local para generar la respuesta.
         
@@ -85,26 +91,31 @@ class LocalAdapter(BaseLLMAdapter):
             formatted_prompt: Prompt formateado
             
         Returns:
-            Texto de la respuesta generada
+            Texto de la respuesta generada y tokens consumidos
         """
         try:
-            # Ejecutar en thread separado para no bloquear el event loop
-            loop = asyncio.get_event_loop()
-            response_text = await loop.run_in_executor(
-                self._executor,
-                self._generate_text,
-                formatted_prompt
-            )
+            if self.client is not None:
+                result = await self.client.generate(
+                    formatted_prompt, max_new_tokens=300, temperature=self.settings.llm_temperature, top_p=0.9
+                )
+            else:
+                # Ejecutar en thread separado para no bloquear el event loop
+                loop = asyncio.get_event_loop()
+                result = await loop.run_in_executor(
+                    self._executor,
+                    self._generate_text,
+                    formatted_prompt
+                )
             
-            self.logger.info(f"Local model response generated: {response_text[:100]}...")
+            self.logger.info(f"Local model response generated: {result.text[:100]}...")
             
-            return response_text
+            return result
             
         except Exception as e:
             self.logger.error(f"Error calling local model: {str(e)}")
             raise
     
-    def _generate_text(self, prompt: str) -> str:
+    def _generate_text(self, prompt: str) -> ProviderResult:
         """
         Genera texto usando el modelo local (ejecutado en thread separado).
         
@@ -112,43 +123,13 @@ class LocalAdapter(BaseLLMAdapter):
             prompt: Prompt completo
             
         Returns:
-            Texto generado
+            Texto generado y tokens del prompt y de la respuesta
         """
-        try:
-            # Tokenizar el prompt
-            inputs = self.tokenizer(
-                prompt,
-                return_tensors="pt",
-                truncation=True,
-                max_length=2048
-            ).to(self.device)
-            
-            # Generar respuesta
-            with torch.no_grad():
-                outputs = self.model.generate(
-                    **inputs,
-                    max_new_tokens=300,
-                    do_sample=True,
-                    temperature=self.settings.llm_temperature,
-                    top_p=0.9,
-                    eos_token_id=self.tokenizer.eos_token_id,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                    early_stopping=True
-                )
-            
-            # Decodificar la respuesta
-            generated_text = self.tokenizer.decode(
-                outputs[0][inputs['input_ids'].shape[1]:],
-                skip_special_tokens=True
-            )
-            
-            return generated_text.strip()
-            
-        except Exception as e:
-            self.logger.error(f"Error in text generation: {str(e)}")
-            raise
+        from src.providers.local_model import GenerationParams
+        params = GenerationParams(max_new_tokens=300, temperature=self.settings.llm_temperature, top_p=0.9)
+        return self.model.generate_batch([prompt], params)[0]
     
     def __del__(self):
         """Cleanup del executor al destruir el objeto."""
-        if hasattr(self, '_executor'):
-            self._executor.shutdown(wait=False) 
\ No newline at end of file
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
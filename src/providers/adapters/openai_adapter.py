@@ -1,8 +1,9 @@
 # src/providers/adapters/openai_adapter.py
+import asyncio
 import openai
 from typing import List, Any, Dict
 from src.models.schemas import Message
-from src.providers.adapters.base_adapter import BaseLLMAdapter
+from src.providers.adapters.base_adapter import BaseLLMAdapter, ProviderResult
 from src.core.config import get_settings, Settings
 import logging
 
@@ -60,7 +61,11 @@ class OpenAIAdapter(BaseLLMAdapter):
         
         return messages
     
-    async def _call_provider(self, formatted_messages: List[Dict[str, str]]) -> str:
+    async def probe(self) -> None:
+        """Lista los modelos disponibles (no consume tokens)."""
+        await asyncio.to_thread(openai.Model.list)
+    
+    async def _call_provider(self, formatted_messages: List[Dict[str, str]]) -> ProviderResult:
         """
         Llama al modelo de OpenAI para generar la respuesta.
         
@@ -68,7 +73,7 @@ class OpenAIAdapter(BaseLLMAdapter):
             formatted_messages: Mensajes formateados para OpenAI
             
         Returns:
-            Texto de la respuesta generada
+            Texto de la respuesta generada y tokens consumidos
         """
         try:
             # Configurar parámetros de generación
@@ -87,7 +92,12 @@ class OpenAIAdapter(BaseLLMAdapter):
             
             self.logger.info(f"OpenAI response generated: {response_text[:100]}...")
             
-            return response_text
+            usage = getattr(response, "usage", None)
+            return ProviderResult(
+                response_text,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", None)
+            )
             
         except Exception as e:
             self.logger.error(f"Error calling OpenAI provider: {str(e)}")
@@ -0,0 +1,140 @@
+# src/providers/adapters/synthetic_adapter.py
+import asyncio
+import hashlib
+import math
+import random
+import re
+from typing import List, Any, Dict, AsyncIterator
+from src.models.schemas import Message
+from src.providers.adapters.base_adapter import BaseLLMAdapter, ProviderResult
+from src.core.config import get_settings, Settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+class _TemplateValues(dict):
+    """Deja intactos los campos desconocidos de la plantilla."""
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+class SyntheticAdapter(BaseLLMAdapter):
+    """
+    Adapter sintético para pruebas de capacidad.
+    Genera respuestas deterministas o por plantilla con latencia, velocidad de
+    tokens, fragmentación y errores configurables, sin llamar a ningún proveedor real.
+    """
+
+    RESPONSES = [
+        "Entiendo tu preocupación. ¿Cuál es la temperatura del niño?",
+        "Gracias por contarme. ¿Cómo se comporta el niño con la fiebre?",
+        "Es importante vigilarlo de cerca. ¿Ha tomado algún medicamento para la fiebre?",
+        "Comprendo. ¿La fiebre ha subido o bajado desde que comenzó?",
+        "Gracias por la información. ¿Está comiendo y durmiendo normalmente?",
+        "Lo mejor es mantenerlo hidratado y consultar con su pediatra si los síntomas persisten. ¿Hay algo más que deba saber sobre la situación?",
+    ]
+
+    _TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+    def __init__(self, settings: Settings | None = None):
+        super().__init__(settings or get_settings())
+        self._initialize_synthetic()
+
+    def _initialize_synthetic(self):
+        """Inicializa el generador aleatorio del proveedor sintético."""
+        self.model = "synthetic"
+        self._rng = random.Random(self.settings.synthetic_seed)
+        self.logger.info(
+            f"Synthetic provider initialized: mode={self.settings.synthetic_response_mode}, "
+            f"latency={self.settings.synthetic_latency_distribution}/{self.settings.synthetic_latency_ms}ms"
+        )
+
+    def _format_messages_for_provider(self, context: List[Message], system_prompt: str) -> List[Dict[str, str]]:
+        """
+        Formatea los mensajes en el mismo formato chat que OpenAI.
+
+        Args:
+            context: Lista de mensajes de la conversación
+            system_prompt: Prompt del sistema
+
+        Returns:
+            Lista de mensajes formateados
+        """
+        messages = [{"role": "system", "content": system_prompt}]
+        for msg in context:
+            messages.append({"role": msg.role, "content": msg.content})
+        return messages
+
+    async def _call_provider(self, formatted_messages: List[Dict[str, str]]) -> ProviderResult:
+        """
+        Genera la respuesta sintética completa consumiendo el stream de fragmentos.
+
+        Args:
+            formatted_messages: Mensajes formateados
+
+        Returns:
+            Texto de la respuesta generada y tokens (los mismos que usa el stream)
+        """
+        chunks = [chunk async for chunk in self.stream_provider(formatted_messages)]
+        return self._stream_result(formatted_messages, "".join(chunks))
+
+    def _stream_result(self, formatted_messages: List[Dict[str, str]], text: str) -> ProviderResult:
+        """Tokens de entrada y de salida con el mismo criterio que el stream."""
+        return ProviderResult(
+            text,
+            prompt_tokens=sum(len(self._TOKEN_PATTERN.findall(m["content"])) for m in formatted_messages),
+            completion_tokens=len(self._TOKEN_PATTERN.findall(text))
+        )
+
+    async def stream_provider(self, formatted_messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Produce la respuesta en fragmentos de `synthetic_stream_chunk_tokens` tokens,
+        respetando la latencia inicial y la velocidad de tokens configuradas.
+        """
+        await self._maybe_inject_error()
+
+        response_text = self._render_response(formatted_messages)
+        latency_ms = self._sample_latency_ms()
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+        tokens = self._TOKEN_PATTERN.findall(response_text)
+        chunk_size = max(1, self.settings.synthetic_stream_chunk_tokens)
+        tokens_per_second = self.settings.synthetic_tokens_per_second
+        for i in range(0, len(tokens), chunk_size):
+            chunk = tokens[i:i + chunk_size]
+            if tokens_per_second:
+                await asyncio.sleep(len(chunk) / tokens_per_second)
+            yield "".join(chunk)
+
+    def _render_response(self, formatted_messages: List[Dict[str, str]]) -> str:
+        """Construye la respuesta: determinista a partir del último mensaje o por plantilla."""
+        user_messages = [m["content"] for m in formatted_messages if m["role"] == "user"]
+        last_message = user_messages[-1] if user_messages else ""
+
+        if self.settings.synthetic_response_mode == "template":
+            return self.settings.synthetic_response_template.format_map(_TemplateValues(
+                last_message=last_message,
+                message_count=len(formatted_messages) - 1,
+                user_message_count=len(user_messages)
+            ))
+
+        digest = hashlib.sha256(f"{len(user_messages)}:{last_message}".encode("utf-8")).digest()
+        return self.RESPONSES[int.from_bytes(digest[:4], "big") % len(self.RESPONSES)]
+
+    def _sample_latency_ms(self) -> float:
+        """Muestrea la latencia hasta el primer token según la distribución configurada."""
+        base = self.settings.synthetic_latency_ms
+        distribution = self.settings.synthetic_latency_distribution
+        if distribution == "lognormal" and base > 0:
+            return self._rng.lognormvariate(math.log(base), self.settings.synthetic_latency_sigma)
+        if distribution == "bursty" and self._rng.random() < self.settings.synthetic_burst_probability:
+            return self.settings.synthetic_burst_latency_ms
+        return base
+
+    async def _maybe_inject_error(self):
+        """Simula errores y timeouts del proveedor con las probabilidades configuradas."""
+        if self._rng.random() < self.settings.synthetic_error_rate:
+            raise RuntimeError("Synthetic provider error (injected)")
+        if self._rng.random() < self.settings.synthetic_timeout_rate:
+            await asyncio.sleep(self.settings.synthetic_timeout_ms / 1000)
+            raise TimeoutError("Synthetic provider timeout (injected)")
@@ -1,5 +1,6 @@
 # src/providers/factory.py
-from src.core.config import Settings
+from typing import Optional, Set, Tuple
+from src.core.config import Settings, get_settings, get_settings_manager
 from src.providers.interface import LLMClient
 import logging
 
@@ -10,8 +11,15 @@ class LLMFactory:
     Factory mejorado para crear clientes LLM con soporte para múltiples proveedores.
     Implementa registro dinámico de adapters y validación de configuración.
     """
+    MAX_CACHED_ADAPTERS = 16
+    # Campos con los que se construye el adapter; el resto se lee en cada llamada
+    CONSTRUCTION_FIELDS = {"llm_provider", "llm_model", "gemini_api_key", "openai_api_key", "deepseek_api_key", "synthetic_seed"}
+
     def __init__(self):
         self._adapters = {}
+        self._instances = {}
+        # Adapter del snapshot vigente, para no serializar la configuración en cada petición
+        self._current: Optional[Tuple[Settings, LLMClient]] = None
         self._register_default_adapters()
 
     def _register_default_adapters(self):
@@ -19,6 +27,7 @@ class LLMFactory:
         self.register_adapter("openai", self._import_openai)
         self.register_adapter("deepseek", self._import_deepseek)
         self.register_adapter("local", self._import_local)
+        self.register_adapter("synthetic", self._import_synthetic)
 
     def register_adapter(self, provider_name, import_func):
         self._adapters[provider_name] = import_func
@@ -46,6 +55,50 @@ class LLMFactory:
             logger.error(f"Error creating adapter for provider {provider_name}: {str(e)}")
             raise ValueError(f"Error initializing {provider_name} adapter: {str(e)}")
 
+    def get_or_create_adapter(self, provider_name: str, settings: Settings) -> LLMClient:
+        """
+        Devuelve el adapter cacheado para esta configuración, creándolo si no existe.
+        Los adapters no guardan estado entre llamadas, así que se reutilizan entre
+        peticiones en lugar de reconstruir el cliente del SDK (o recargar el modelo local).
+        """
+        key = (provider_name, settings.model_dump_json())
+        adapter = self._instances.get(key)
+        if adapter is None:
+            adapter = self.create_adapter(provider_name, settings)
+            if len(self._instances) >= self.MAX_CACHED_ADAPTERS:
+                self._instances.pop(next(iter(self._instances)))
+            self._instances[key] = adapter
+        return adapter
+
+    def current_adapter(self, settings: Settings) -> LLMClient:
+        """Adapter del snapshot vigente: comparación por identidad y, si cambió, búsqueda en la caché."""
+        current = self._current
+        if current is not None and current[0] is settings:
+            return current[1]
+        adapter = self.get_or_create_adapter(settings.llm_provider, settings)
+        self._current = (settings, adapter)
+        return adapter
+
+    def on_settings_changed(self, old: Settings, new: Settings, changed: Set[str]):
+        """
+        Si solo cambian parámetros de generación (temperatura, max_tokens...),
+        el adapter vigente pasa a usar el nuevo snapshot sin reconstruirse (ni
+        recargar el modelo local). Si cambia el proveedor, el modelo o una API
+        key, se descartan los adapters cacheados y el siguiente se crea con la
+        configuración nueva.
+        """
+        current = self._current
+        if current is not None and not changed & self.CONSTRUCTION_FIELDS:
+            adapter = current[1]
+            adapter.settings = new
+            self._current = (new, adapter)
+            return
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._instances.clear()
+        self._current = None
+
     def _import_gemini(self):
         from src.providers.adapters.gemini_adapter import GeminiAdapter
         return GeminiAdapter
@@ -62,15 +115,23 @@ class LLMFactory:
         from src.providers.adapters.local_adapter import LocalAdapter
         return LocalAdapter
 
+    def _import_synthetic(self):
+        from src.providers.adapters.synthetic_adapter import SyntheticAdapter
+        return SyntheticAdapter
+
 # Instancia global del factory
 _llm_factory = LLMFactory()
+get_settings_manager().subscribe(_llm_factory.on_settings_changed)
 
 def get_llm_client(settings: Settings | None = None) -> LLMClient:
     if not settings:
-        settings = Settings()
+        return _llm_factory.current_adapter(get_settings())
     provider_name = settings.llm_provider
-    logger.info(f"Creating LLM client for provider: {provider_name}")
-    return _llm_factory.create_adapter(provider_name, settings)
+    return _llm_factory.get_or_create_adapter(provider_name, settings)
+
+def get_current_llm_client() -> LLMClient:
+    """Dependencia de FastAPI: adapter de la configuración vigente."""
+    return _llm_factory.current_adapter(get_settings())
 
 def register_provider(provider_name: str, import_func):
     _llm_factory.register_adapter(provider_name, import_func)
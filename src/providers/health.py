@@ -0,0 +1,163 @@
+# src/providers/health.py
+"""
+Monitor de salud de los proveedores LLM.
+
+Una tarea en segundo plano sondea periódicamente cada proveedor configurado con
+una comprobación barata (`BaseLLMAdapter.probe`: listar modelos, contar tokens
+o, en local, comprobar el modelo en memoria) y guarda el resultado junto con
+estadísticas de latencia. `GET /providers` y `GET /providers/health` responden
+desde esa caché, sin llamar a los proveedores en cada petición.
+
+El proveedor `local` solo se sondea si es el activo o si se sirve desde el
+servidor de inferencia compartido: en el proceso, crear su adapter carga el
+modelo completo en memoria.
+"""
+import asyncio
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional
+import logging
+
+from src.core.config import Settings, get_settings
+from src.providers.factory import get_available_providers, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ProviderStatus:
+    name: str
+    configured: bool = False
+    # unknown (sin sondear todavía), healthy, unhealthy, not_configured o not_probed
+    status: str = "unknown"
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    last_checked: Optional[datetime] = None
+    last_error: Optional[str] = None
+    consecutive_failures: int = 0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=20))
+
+    def latency_stats(self) -> Optional[Dict[str, float]]:
+        if not self.latencies_ms:
+            return None
+        samples = sorted(self.latencies_ms)
+        return {
+            "last": self.latencies_ms[-1],
+            "avg": statistics.fmean(samples),
+            "p50": samples[len(samples) // 2],
+            "max": samples[-1],
+        }
+
+class ProviderHealthMonitor:
+    """
+    Args:
+        settings_provider: Devuelve la configuración actual (se relee en cada ciclo)
+        interval: Segundos entre ciclos de sondeo
+        timeout: Tiempo máximo de cada sondeo
+        window: Sondeos recientes usados para las estadísticas de latencia
+        unhealthy_after: Fallos consecutivos para marcar un proveedor como caído
+    """
+    def __init__(
+        self,
+        settings_provider: Callable[[], Settings] = get_settings,
+        interval: float = 15.0,
+        timeout: float = 5.0,
+        window: int = 20,
+        unhealthy_after: int = 2
+    ):
+        self.settings_provider = settings_provider
+        self.interval = interval
+        self.timeout = timeout
+        self.window = window
+        self.unhealthy_after = unhealthy_after
+        self.statuses: Dict[str, ProviderStatus] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ProviderHealthMonitor":
+        return cls(
+            interval=settings.provider_health_interval_seconds,
+            timeout=settings.provider_health_timeout_seconds,
+            window=settings.provider_health_window,
+            unhealthy_after=settings.provider_health_unhealthy_after
+        )
+
+    def status(self, name: str) -> ProviderStatus:
+        if name not in self.statuses:
+            self.statuses[name] = ProviderStatus(name, latencies_ms=deque(maxlen=self.window))
+        return self.statuses[name]
+
+    def snapshot(self) -> List[ProviderStatus]:
+        return [self.status(name) for name in get_available_providers()]
+
+    async def run_once(self) -> List[ProviderStatus]:
+        settings = self.settings_provider()
+        await asyncio.gather(*(self._check(name, settings) for name in get_available_providers()))
+        return self.snapshot()
+
+    async def _check(self, name: str, settings: Settings):
+        status = self.status(name)
+        provider_settings = settings.model_copy(update={"llm_provider": name})
+        try:
+            provider_settings.validate_provider_config()
+        except ValueError as e:
+            status.configured, status.status, status.last_error = False, "not_configured", str(e)
+            return
+        status.configured = True
+        status.temperature = provider_settings.llm_temperature
+        if name == "local" and settings.llm_provider != "local" and settings.local_inference_mode != "server":
+            status.status = "not_probed"
+            return
+
+        start = time.perf_counter()
+        try:
+            adapter = await asyncio.to_thread(get_llm_client, provider_settings)
+            status.model = getattr(adapter, "model_name", provider_settings.llm_model)
+            await asyncio.wait_for(adapter.probe(), self.timeout)
+        except Exception as e:
+            status.consecutive_failures += 1
+            status.last_error = str(e) or type(e).__name__
+            if status.consecutive_failures >= self.unhealthy_after or status.status == "unknown":
+                status.status = "unhealthy"
+            logger.warning(f"Provider {name} probe failed: {status.last_error}")
+        else:
+            status.latencies_ms.append((time.perf_counter() - start) * 1000)
+            status.consecutive_failures = 0
+            status.last_error = None
+            status.status = "healthy"
+        finally:
+            status.last_checked = datetime.utcnow()
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Provider health check failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="provider-health-monitor")
+        logger.info(f"Provider health monitor started (interval={self.interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+_monitor: Optional[ProviderHealthMonitor] = None
+
+def get_health_monitor() -> ProviderHealthMonitor:
+    """Monitor del proceso; las rutas leen su caché."""
+    global _monitor
+    if _monitor is None:
+        _monitor = ProviderHealthMonitor.from_settings(get_settings())
+    return _monitor
@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Awaitable, Callable, List
 from src.models.schemas import Message
 
+# Recibe cada fragmento de texto a medida que el proveedor lo produce
+ChunkCallback = Callable[[str], Awaitable[None]]
+
 class LLMClient(ABC):
     @abstractmethod
     async def generate(self, context: List[Message]) -> Message:
@@ -15,3 +18,12 @@ class LLMClient(ABC):
             Message: La respuesta generada por el modelo
         """
         pass
+
+    async def generate_streaming(self, context: List[Message], on_chunk: ChunkCallback, **kwargs) -> Message:
+        """
+        Como generate(), entregando el texto a `on_chunk` a medida que se produce.
+        Por defecto se entrega completo al final; el mensaje devuelto es el definitivo.
+        """
+        message = await self.generate(context)
+        await on_chunk(message.content)
+        return message
@@ -0,0 +1,326 @@
+# src/providers/local_inference.py
+"""
+Servidor de inferencia local compartido por los workers de un nodo.
+
+Con `LOCAL_INFERENCE_MODE=server`, un único proceso carga el modelo y atiende
+a todos los workers de uvicorn por un socket Unix (o HTTP local). Así hay una
+sola copia del modelo por nodo. LocalAdapter pasa a ser un cliente que envía
+el prompt y recibe el texto. Las peticiones se encolan en el servidor y se
+generan en lotes de hasta `local_inference_max_batch` prompts. Un lote agrupa
+las peticiones que llegan dentro de `local_inference_batch_wait_ms` y tienen
+los mismos parámetros de muestreo.
+
+El servidor se arranca de dos formas:
+- como sidecar: `python -m src.providers.local_inference`
+- desde la app, si `local_inference_autostart` está activo y nadie responde en
+  `local_inference_url` (ver `LocalInferenceProcess`)
+
+Un lock de fichero junto al socket garantiza que solo un proceso sirve el
+modelo aunque varios workers intenten arrancarlo a la vez. El servidor arrancado
+desde la app queda desligado del worker (sesión propia) y sigue vivo cuando ese
+worker se recicla o se apaga, porque los demás workers del nodo lo usan. Si aun
+así deja de responder, el cliente lo vuelve a arrancar al fallar la conexión.
+
+API interna:
+- POST /generate: `{"prompt", "max_new_tokens", "temperature", "top_p"}`
+  devuelve `{"text", "prompt_tokens", "completion_tokens"}`, o 503
+  si la cola está llena
+- GET /health: `{"model", "queue_depth"}`
+"""
+import asyncio
+import fcntl
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from src.core.config import Settings, get_settings
+from src.core.exceptions import OverloadedError
+from src.providers.adapters.base_adapter import ProviderResult
+
+logger = logging.getLogger(__name__)
+
+UNIX_PREFIX = "unix://"
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    max_new_tokens: int = 300
+    temperature: float = 0.7
+    top_p: float = 0.9
+
+class QueueFullError(Exception):
+    pass
+
+@dataclass
+class _Pending:
+    prompt: str
+    params: object
+    future: asyncio.Future
+
+class InferenceBatcher:
+    """
+    Cola del servidor: agrupa las peticiones en lotes y los genera de uno en
+    uno en un hilo aparte.
+
+    Args:
+        generate_batch: Genera un lote de prompts con los mismos parámetros (bloqueante)
+        max_batch: Prompts por lote como máximo
+        batch_wait: Segundos que espera el primer prompt a que lleguen más
+        queue_size: Peticiones en cola como máximo
+    """
+    def __init__(
+        self,
+        generate_batch: Callable[[List[str], object], List[ProviderResult]],
+        max_batch: int = 4,
+        batch_wait: float = 0.01,
+        queue_size: int = 64
+    ):
+        self.generate_batch = generate_batch
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-inference")
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    async def submit(self, prompt: str, params) -> ProviderResult:
+        """Encola un prompt y espera su respuesta. Con la cola llena lanza QueueFullError."""
+        pending = _Pending(prompt, params, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            raise QueueFullError()
+        return await pending.future
+
+    async def _next_batch(self) -> List[_Pending]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            groups: Dict[object, List[_Pending]] = {}
+            for pending in await self._next_batch():
+                # El cliente pudo abandonar la petición mientras esperaba
+                if not pending.future.done():
+                    groups.setdefault(pending.params, []).append(pending)
+            for params, items in groups.items():
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, self.generate_batch, [p.prompt for p in items], params
+                    )
+                except Exception as e:
+                    logger.error(f"Local batch generation failed: {str(e)}", exc_info=True)
+                    for pending in items:
+                        if not pending.future.done():
+                            pending.future.set_exception(e)
+                    continue
+                for pending, result in zip(items, results):
+                    if not pending.future.done():
+                        pending.future.set_result(result)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="local-inference-batcher")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+def create_server_app(batcher: InferenceBatcher, model_name: str, params_type: Callable[..., object]) -> FastAPI:
+    """App del servidor; `params_type` construye los parámetros de muestreo de cada lote."""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        batcher.start()
+        yield
+        await batcher.stop()
+
+    app = FastAPI(title="DocoChat local inference", lifespan=lifespan)
+
+    @app.post("/generate")
+    async def generate(request: GenerateRequest):
+        params = params_type(
+            max_new_tokens=request.max_new_tokens, temperature=request.temperature, top_p=request.top_p
+        )
+        try:
+            result = await batcher.submit(request.prompt, params)
+        except QueueFullError:
+            raise HTTPException(status_code=503, detail="Local inference queue is full")
+        return {"text": result.text, "prompt_tokens": result.prompt_tokens, "completion_tokens": result.completion_tokens}
+
+    @app.get("/health")
+    async def health():
+        return {"model": model_name, "queue_depth": batcher.queue_depth}
+
+    return app
+
+class LocalInferenceClient:
+    """
+    Cliente de los workers: HTTP sobre el socket Unix o la URL local del servidor.
+
+    Args:
+        url: `unix://<ruta>` o URL HTTP del servidor
+        timeout: Segundos máximos por petición
+        transport: Transporte httpx (tests)
+        starter: Arranca el servidor si no responde; si se indica, una conexión
+            fallida lo llama y reintenta la petición una vez
+    """
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 120.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        starter: Optional[Callable[[], Awaitable[None]]] = None
+    ):
+        self.url = url
+        self.starter = starter
+        if url.startswith(UNIX_PREFIX):
+            transport = transport or httpx.AsyncHTTPTransport(uds=url[len(UNIX_PREFIX):])
+            self._client = httpx.AsyncClient(base_url="http://local-inference", transport=transport, timeout=timeout)
+        else:
+            self._client = httpx.AsyncClient(base_url=url, transport=transport, timeout=timeout)
+
+    async def generate(self, prompt: str, max_new_tokens: int, temperature: float, top_p: float) -> ProviderResult:
+        payload = {"prompt": prompt, "max_new_tokens": max_new_tokens, "temperature": temperature, "top_p": top_p}
+        try:
+            response = await self._client.post("/generate", json=payload)
+        except httpx.ConnectError:
+            if self.starter is None:
+                raise
+            logger.warning(f"Local inference server unreachable at {self.url}, restarting it")
+            try:
+                await self.starter()
+            except Exception as e:
+                logger.error(f"Local inference server restart failed: {str(e)}")
+                raise OverloadedError(retry_after=5, message="Local inference server is restarting")
+            response = await self._client.post("/generate", json=payload)
+        if response.status_code == 503:
+            raise OverloadedError(retry_after=1, message="Local inference server is busy")
+        response.raise_for_status()
+        data = response.json()
+        return ProviderResult(data["text"], prompt_tokens=data["prompt_tokens"], completion_tokens=data["completion_tokens"])
+
+    async def health(self) -> dict:
+        response = await self._client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    async def is_up(self) -> bool:
+        try:
+            await self.health()
+            return True
+        except httpx.HTTPError:
+            return False
+
+    async def aclose(self):
+        await self._client.aclose()
+
+def _lock_path(settings: Settings) -> str:
+    if settings.local_inference_url.startswith(UNIX_PREFIX):
+        return settings.local_inference_url[len(UNIX_PREFIX):] + ".lock"
+    digest = hashlib.sha1(settings.local_inference_url.encode()).hexdigest()[:12]
+    return os.path.join("/tmp", f"docochat-local-inference-{digest}.lock")
+
+class LocalInferenceProcess:
+    """
+    Arranque del servidor desde la app. Si no responde nadie en la URL, lanza
+    `python -m src.providers.local_inference`. Si otro worker lo lanzó a la vez,
+    el proceso que pierde el lock termina sin error. En los dos casos se espera
+    a que el servidor responda. El servidor se lanza en una sesión propia y no
+    se detiene al apagar la app: lo comparten todos los workers del nodo.
+    """
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.client = LocalInferenceClient(settings.local_inference_url, timeout=5.0)
+        self._process: Optional[subprocess.Popen] = None
+        # Un solo arranque a la vez por worker aunque fallen varias peticiones
+        self._starting = asyncio.Lock()
+
+    async def ensure_running(self):
+        async with self._starting:
+            await self._ensure_running()
+
+    async def _ensure_running(self):
+        if await self.client.is_up():
+            return
+        logger.info(f"Starting local inference server at {self.settings.local_inference_url}")
+        # Sesión propia: las señales al grupo del worker (reciclado, Ctrl+C) no lo alcanzan
+        self._process = subprocess.Popen([sys.executable, "-m", "src.providers.local_inference"], start_new_session=True)
+        deadline = time.monotonic() + self.settings.local_inference_start_timeout_seconds
+        while time.monotonic() < deadline:
+            if await self.client.is_up():
+                return
+            if self._process is not None and self._process.poll() is not None:
+                # Sin lock: otro worker lo está arrancando
+                if self._process.returncode != 0:
+                    raise RuntimeError(f"Local inference server exited with code {self._process.returncode}")
+                self._process = None
+            await asyncio.sleep(0.5)
+        raise TimeoutError("Local inference server did not become ready in time")
+
+    async def stop(self):
+        """Cierra el cliente; el servidor sigue atendiendo a los demás workers."""
+        await self.client.aclose()
+        self._process = None
+
+def main():
+    import uvicorn
+    from src.providers.local_model import GenerationParams, LocalModel
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    settings = get_settings()
+    lock = open(_lock_path(settings), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logger.info("Local inference server already running on this node")
+        return
+
+    model = LocalModel.from_settings(settings)
+    batcher = InferenceBatcher(
+        model.generate_batch,
+        max_batch=settings.local_inference_max_batch,
+        batch_wait=settings.local_inference_batch_wait_ms / 1000,
+        queue_size=settings.local_inference_queue_size
+    )
+    app = create_server_app(batcher, model.model_name, GenerationParams)
+    url = settings.local_inference_url
+    if url.startswith(UNIX_PREFIX):
+        path = url[len(UNIX_PREFIX):]
+        # Con el lock tomado, un socket existente es de un servidor que ya no está
+        if os.path.exists(path):
+            os.unlink(path)
+        uvicorn.run(app, uds=path, log_level="info")
+    else:
+        parsed = httpx.URL(url)
+        uvicorn.run(app, host=parsed.host, port=parsed.port or 80, log_level="info")
+
+if __name__ == "__main__":
+    main()
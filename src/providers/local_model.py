@@ -0,0 +1,169 @@
+# src/providers/local_model.py
+"""
+Modelo local de transformers: carga y generación por lotes.
+
+Lo usan LocalAdapter en modo `in_process` y el servidor de inferencia local
+(src/providers/local_inference.py), que es el único proceso del nodo con el
+modelo en memoria en modo `server`.
+
+Los pesos se cargan desde safetensors con `low_cpu_mem_usage`: se leen del
+fichero mapeado en memoria y se colocan directamente en el dispositivo, sin
+inicializar antes un modelo aleatorio ni pasar por una copia completa en la
+memoria del proceso. Si además el fichero ya está en el tipo de dato de
+ejecución (`local_model_path`, preparado con
+`python -m src.providers.local_model --output <dir>`), no hay conversión. Las
+páginas de los pesos vienen entonces de la caché de páginas del sistema y las
+comparten todos los procesos del nodo que cargan el mismo directorio. Si el
+tipo guardado no sirve para el dispositivo (float32 en GPU, float16 en CPU),
+se convierte al cargar en lugar de duplicar la memoria de la GPU.
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+import logging
+
+import torch
+from transformers import AutoConfig, AutoModelForCausalLM, AutoTokenizer
+
+from src.core.config import Settings
+from src.providers.adapters.base_adapter import ProviderResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_MODEL = "allenai/OLMo-2-1124-13B-Instruct"
+
+def _default_dtype(device: torch.device) -> torch.dtype:
+    return torch.float16 if device.type == "cuda" else torch.float32
+
+def _converted_dtype(source: str, device: torch.device):
+    """
+    Tipo de dato para cargar un directorio convertido: el guardado ("auto") si
+    sirve para el dispositivo; si no, el del dispositivo.
+    """
+    saved = getattr(AutoConfig.from_pretrained(source), "torch_dtype", None)
+    if isinstance(saved, str):
+        saved = getattr(torch, saved, None)
+    supported = (torch.float16, torch.bfloat16) if device.type == "cuda" else (torch.float32, torch.bfloat16)
+    if saved is None or saved in supported:
+        return "auto"
+    expected = _default_dtype(device)
+    logger.warning(f"Converted local model is stored as {saved}, loading it as {expected} on {device}")
+    return expected
+
+@dataclass(frozen=True)
+class GenerationParams:
+    max_new_tokens: int = 300
+    temperature: float = 0.7
+    top_p: float = 0.9
+
+class LocalModel:
+    """
+    Args:
+        model_name: Modelo de Hugging Face (o ruta local)
+        max_input_tokens: Tokens del prompt como máximo (se trunca por la izquierda)
+        model_path: Directorio con los pesos ya convertidos (ver convert_model); tiene prioridad sobre model_name
+    """
+    def __init__(self, model_name: str = DEFAULT_LOCAL_MODEL, max_input_tokens: int = 2048, model_path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_input_tokens = max_input_tokens
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        converted = model_path is not None and os.path.isdir(model_path)
+        if model_path is not None and not converted:
+            logger.warning(f"Converted local model not found at {model_path}, loading {model_name}")
+        source = model_path if converted else model_name
+        logger.info(f"Loading local model {source} on {self.device}")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(source)
+        # Relleno y truncado por la izquierda: en un lote, todas las respuestas empiezan al final del prompt
+        self.tokenizer.padding_side = "left"
+        self.tokenizer.truncation_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(
+            source,
+            # Convertidos: el tipo de dato guardado en el directorio, sin conversión al cargar
+            torch_dtype=_converted_dtype(source, self.device) if converted else _default_dtype(self.device),
+            # En el directorio convertido siempre hay safetensors; en el Hub, si el modelo los publica
+            use_safetensors=True if converted else None,
+            low_cpu_mem_usage=True,
+            device_map={"": str(self.device)}
+        )
+        self.model.eval()
+        logger.info("Local model loaded successfully")
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LocalModel":
+        return cls(settings.llm_model or DEFAULT_LOCAL_MODEL, model_path=settings.local_model_path)
+
+    def check(self):
+        """Comprobación barata para los sondeos de salud: tokenizar un texto corto."""
+        self.tokenizer("ping")
+
+    def generate_batch(self, prompts: List[str], params: GenerationParams) -> List[ProviderResult]:
+        """
+        Genera una respuesta por prompt en una sola pasada del modelo. Bloquea:
+        se ejecuta en un hilo aparte.
+        """
+        inputs = self.tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_input_tokens
+        ).to(self.device)
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=params.max_new_tokens,
+                do_sample=True,
+                temperature=params.temperature,
+                top_p=params.top_p,
+                eos_token_id=self.tokenizer.eos_token_id,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+
+        prompt_length = inputs["input_ids"].shape[1]
+        results = []
+        for row, attention in zip(outputs, inputs["attention_mask"]):
+            generated_ids = row[prompt_length:]
+            # Sin contar el relleno tras el fin de la respuesta
+            completion_tokens = int((generated_ids != self.tokenizer.pad_token_id).sum())
+            results.append(ProviderResult(
+                self.tokenizer.decode(generated_ids, skip_special_tokens=True).strip(),
+                prompt_tokens=int(attention.sum()),
+                completion_tokens=completion_tokens
+            ))
+        return results
+
+def convert_model(model_name: str, output_dir: str, dtype: Optional[str] = None):
+    """
+    Guarda el modelo en `output_dir` como safetensors en el tipo de dato de
+    ejecución (por defecto, el del dispositivo de esta máquina), junto con el
+    tokenizer. Es el directorio que se indica en `local_model_path`.
+    """
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    torch_dtype = getattr(torch, dtype) if dtype else _default_dtype(device)
+    logger.info(f"Converting {model_name} to {output_dir} ({torch_dtype})")
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch_dtype, low_cpu_mem_usage=True)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    logger.info("Local model converted successfully")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepara los pesos del modelo local para cargarlos mapeados en memoria")
+    parser.add_argument("--model", default=os.getenv("LLM_MODEL") or DEFAULT_LOCAL_MODEL)
+    parser.add_argument("--output", required=True, help="Directorio de salida (LOCAL_MODEL_PATH)")
+    parser.add_argument(
+        "--dtype",
+        choices=["float16", "bfloat16", "float32"],
+        default=os.getenv("LOCAL_MODEL_DTYPE") or None,
+        help="Por defecto LOCAL_MODEL_DTYPE o, sin ella, el del dispositivo disponible"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    convert_model(args.model, args.output, args.dtype)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,75 @@
 # src/repositories/conversation_repository.py
+from datetime import datetime, timedelta
 from typing import Optional, List
-from uuid import UUID
+from uuid import UUID, uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 from src.models.schemas import Conversation, Message
+from src.db.repository import MessageRow, SummaryRow
+from src.core.metrics import track_repository
+from src.core.tracing import traced
+from src.db.timeouts import enforce_db_deadline
+
+# Margen ante desfases de reloj entre el alta de la conversación y sus mensajes
+PARTITION_LOOKBACK = timedelta(days=1)
 
 class ConversationRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
+    @track_repository("get")
+    @traced("db.get")
+    @enforce_db_deadline
     async def get(self, conversation_id: UUID) -> Optional[Conversation]:
         """Obtiene una conversación por su ID"""
-        query = select(Conversation).where(Conversation.id == conversation_id).options(
-            selectinload(Conversation.messages)
+        result = await self.session.execute(select(Conversation).where(Conversation.id == conversation_id))
+        conversation = result.scalar_one_or_none()
+        if conversation is None:
+            return None
+
+        # Acotar por created_at para que Postgres solo lea las particiones de la conversación
+        query = select(Message).where(Message.conversation_id == conversation_id).order_by(Message.timestamp)
+        if conversation.created_at is not None:
+            query = query.where(Message.timestamp >= conversation.created_at - PARTITION_LOOKBACK)
+        messages = await self.session.execute(query)
+        set_committed_value(conversation, "messages", list(messages.scalars()))
+        return conversation
+
+    @track_repository("exists")
+    @traced("db.exists")
+    @enforce_db_deadline
+    async def exists(self, conversation_id: UUID) -> bool:
+        """Si la conversación existe, sin leer sus mensajes"""
+        result = await self.session.execute(select(Conversation.id).where(Conversation.id == conversation_id))
+        return result.scalar_one_or_none() is not None
+
+    @track_repository("history_rows")
+    @traced("db.history_rows")
+    @enforce_db_deadline
+    async def history_rows(self, conversation_id: UUID) -> Optional[List[MessageRow]]:
+        """Historial proyectado en filas (id, role, content, timestamp), sin hidratar objetos del ORM"""
+        created = (await self.session.execute(
+            select(Conversation.created_at).where(Conversation.id == conversation_id)
+        )).one_or_none()
+        if created is None:
+            return None
+
+        messages = Message.__table__
+        query = (
+            select(messages.c.id, messages.c.role, messages.c.content, messages.c.timestamp)
+            .where(messages.c.conversation_id == conversation_id)
+            .order_by(messages.c.timestamp)
         )
-        result = await self.session.execute(query)
-        return result.scalar_one_or_none()
+        if created.created_at is not None:
+            query = query.where(messages.c.timestamp >= created.created_at - PARTITION_LOOKBACK)
+        return [tuple(row) for row in (await self.session.execute(query)).all()]
 
+    @track_repository("create")
+    @traced("db.create")
+    @enforce_db_deadline
     async def create(self, conversation: Conversation) -> Conversation:
         """Crea una nueva conversación"""
         self.session.add(conversation)
@@ -26,19 +77,46 @@ class ConversationRepository:
         await self.session.refresh(conversation)
         return conversation
 
+    @track_repository("add_message")
+    @traced("db.add_message")
+    @enforce_db_deadline
     async def add_message(self, conversation_id: UUID, message: Message) -> Message:
-        """Agrega un mensaje a una conversación existente"""
-        conversation = await self.get(conversation_id)
-        if not conversation:
+        """
+        Agrega un mensaje a una conversación existente. Solo comprueba que la
+        conversación exista: no carga el historial ni relee el mensaje guardado.
+        """
+        found = await self.session.execute(select(Conversation.id).where(Conversation.id == conversation_id))
+        if found.scalar_one_or_none() is None:
             raise KeyError(f"Conversación {conversation_id} no encontrada")
-        
-        conversation.messages.append(message)
+
+        # Valores por defecto fijados aquí para no releer la fila tras el commit
+        if message.id is None:
+            message.id = uuid4()
+        if message.timestamp is None:
+            message.timestamp = datetime.utcnow()
+        message.conversation_id = conversation_id
+        self.session.add(message)
         await self.session.commit()
-        await self.session.refresh(message)
         return message
 
+    @track_repository("list_all")
+    @traced("db.list_all")
+    @enforce_db_deadline
     async def list_all(self) -> List[Conversation]:
         """Lista todas las conversaciones"""
         query = select(Conversation).options(selectinload(Conversation.messages))
         result = await self.session.execute(query)
-        return result.scalars().all() 
\ No newline at end of file
+        return result.scalars().all()
+
+    @track_repository("list_summaries")
+    @traced("db.list_summaries")
+    @enforce_db_deadline
+    async def list_summaries(self) -> List[SummaryRow]:
+        """Número de mensajes y fecha del último por conversación, en una consulta agrupada"""
+        conversations, messages = Conversation.__table__, Message.__table__
+        query = (
+            select(conversations.c.id, func.count(messages.c.id), func.max(messages.c.timestamp))
+            .select_from(conversations.outerjoin(messages, messages.c.conversation_id == conversations.c.id))
+            .group_by(conversations.c.id)
+        )
+        return [tuple(row) for row in (await self.session.execute(query)).all()]
@@ -0,0 +1,43 @@
+# src/repositories/memory_repository.py
+from typing import Optional, List, Dict
+from uuid import UUID, uuid4
+from datetime import datetime
+
+from src.models.schemas import Conversation, Message
+
+class InMemoryConversationRepository:
+    """
+    Repositorio en memoria con la misma interfaz que ConversationRepository.
+    Se usa cuando no se quiere persistir (por ejemplo, simulaciones offline).
+    """
+    def __init__(self):
+        self.store: Dict[UUID, Conversation] = {}
+
+    async def get(self, conversation_id: UUID) -> Optional[Conversation]:
+        """Obtiene una conversación por su ID"""
+        return self.store.get(conversation_id)
+
+    async def create(self, conversation: Conversation) -> Conversation:
+        """Crea una nueva conversación"""
+        if conversation.id is None:
+            conversation.id = uuid4()
+        self.store[conversation.id] = conversation
+        return conversation
+
+    async def add_message(self, conversation_id: UUID, message: Message) -> Message:
+        """Agrega un mensaje a una conversación existente"""
+        conversation = await self.get(conversation_id)
+        if not conversation:
+            raise KeyError(f"Conversación {conversation_id} no encontrada")
+
+        if message.id is None:
+            message.id = uuid4()
+        if message.timestamp is None:
+            message.timestamp = datetime.utcnow()
+        if message not in conversation.messages:
+            conversation.messages.append(message)
+        return message
+
+    async def list_all(self) -> List[Conversation]:
+        """Lista todas las conversaciones"""
+        return list(self.store.values())
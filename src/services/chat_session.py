@@ -0,0 +1,389 @@
+# src/services/chat_session.py
+"""
+Canal de chat por WebSocket (`/conversations/{id}/ws`).
+
+Mientras la conexión está abierta, la sesión conserva en memoria los mensajes
+de la conversación, el análisis clínico (edad, síntoma...) y el adapter: cada
+turno no recarga el historial ni lo vuelve a analizar. La respuesta llega en
+fragmentos a medida que el proveedor la produce y los mensajes se guardan en
+segundo plano, en orden, con un escritor por conexión.
+
+Protocolo (JSON, un evento por frame):
+- Cliente: `{"type": "message", "content": "..."}`, `{"type": "ping"}` y `{"type": "pong"}`
+- Servidor: `ready` (al conectar), `message` (mensajes completos: historial
+  pendiente, eco del usuario y respuesta definitiva), `delta` (fragmentos de
+  la respuesta en curso), `ping`, `pong` y `error`
+
+Al reconectar con `?after=<id del último mensaje recibido>` solo se reenvían los
+mensajes posteriores. Antes de cada turno se compara la versión de la
+conversación (VersionStore) con la esperada: si otra petición escribió en ella,
+se recarga el historial sin perder los mensajes propios pendientes de guardar. Los eventos salen por una cola acotada por conexión: si
+el cliente no la vacía en `ws_send_timeout_seconds`, se cierra la conexión.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+import logging
+
+import orjson
+from fastapi import WebSocket
+from pydantic import ValidationError as PydanticValidationError
+
+from src.core.admission import admit_request, check_rate_limit
+from src.core.config import Settings, get_settings
+from src.core.exceptions import APIError
+from src.core.metrics import BACKGROUND_WRITE_FAILURES, SAFETY_SHORT_CIRCUITS, WEBSOCKET_CLOSES, WEBSOCKET_CONNECTIONS
+from src.core.prompts import MedicalPrompts
+from src.models.schemas import Message, MessageCreate
+from src.services.conversation_service import ConversationService, track_pending_write
+
+logger = logging.getLogger(__name__)
+
+# Códigos de cierre propios (rango 4000-4999 de la RFC 6455)
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_NOT_FOUND = 4404
+CLOSE_HEARTBEAT_TIMEOUT = 4408
+CLOSE_SLOW_CONSUMER = 4429
+
+# Turnos y escrituras en curso por conversación en este worker: una reconexión
+# los espera antes de cargar el historial
+_inflight: Dict[UUID, Set[asyncio.Task]] = {}
+
+def _track(conversation_id: UUID, task: asyncio.Task):
+    tasks = _inflight.setdefault(conversation_id, set())
+    tasks.add(task)
+
+    def _done(finished: asyncio.Task):
+        tasks.discard(finished)
+        if not tasks and _inflight.get(conversation_id) is tasks:
+            del _inflight[conversation_id]
+
+    task.add_done_callback(_done)
+
+def _message_event(message: Message) -> dict:
+    return {
+        "type": "message",
+        "message": {
+            "id": message.id,
+            "role": message.role,
+            "content": message.content,
+            "timestamp": message.timestamp
+        }
+    }
+
+def _error_event(code: str, message: str, details: Any = None, retry_after: Optional[str] = None) -> dict:
+    return {"type": "error", "code": code, "message": message, "details": details, "retry_after": retry_after}
+
+class ChatSession:
+    """
+    Una conexión WebSocket sobre una conversación.
+
+    Args:
+        websocket: Conexión sin aceptar todavía
+        conversation_id: Conversación del canal
+        service: Servicio con `llm` y `repo_scope` (sin repositorio de petición)
+        settings: Configuración vigente al conectar
+    """
+    def __init__(
+        self,
+        websocket: WebSocket,
+        conversation_id: UUID,
+        service: ConversationService,
+        settings: Optional[Settings] = None
+    ):
+        self.websocket = websocket
+        self.conversation_id = conversation_id
+        self.service = service
+        self.llm = service.llm
+        self.settings = settings or get_settings()
+        self.messages: List[Message] = []
+        # Mensajes propios aún no guardados, por id
+        self._unsaved: Dict[UUID, Message] = {}
+        # (época, versión) esperada si solo esta sesión escribió desde la carga
+        self._version: Optional[Tuple[int, int]] = None
+        self.context_info: Optional[Dict[str, Any]] = None
+        self.last_seen = time.monotonic()
+        self.close_reason: Optional[str] = None
+        self._close_code: Optional[int] = None
+        self._closed = asyncio.Event()
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=self.settings.ws_send_queue_size)
+        self._writes: asyncio.Queue = asyncio.Queue()
+        self._turn: Optional[asyncio.Task] = None
+
+    async def run(self, after: Optional[UUID] = None):
+        """Atiende la conexión hasta que se cierra; el turno en curso se completa y se guarda igualmente."""
+        pending = _inflight.get(self.conversation_id)
+        if pending:
+            await asyncio.wait(set(pending), timeout=self.settings.ws_resume_wait_seconds)
+        try:
+            found = await self._load()
+        except Exception as e:
+            logger.error(f"Failed to load conversation {self.conversation_id} for WebSocket: {str(e)}", exc_info=True)
+            await self._reject(CLOSE_INTERNAL_ERROR, "Conversation could not be loaded")
+            return
+        if not found:
+            await self._reject(CLOSE_NOT_FOUND, "Conversation not found")
+            return
+
+        await self.websocket.accept()
+        WEBSOCKET_CONNECTIONS.inc()
+        writer = asyncio.create_task(self._write_loop())
+        _track(self.conversation_id, writer)
+        track_pending_write(writer)
+        tasks = [asyncio.create_task(self._send_loop())]
+        try:
+            await self._replay(after)
+            tasks += [
+                asyncio.create_task(self._receive_loop()),
+                asyncio.create_task(self._heartbeat_loop()),
+                asyncio.create_task(self._closed.wait())
+            ]
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self._close("client")
+            WEBSOCKET_CONNECTIONS.dec()
+            WEBSOCKET_CLOSES.labels(reason=self.close_reason).inc()
+            # El escritor termina cuando termine el turno en curso
+            if self._turn and not self._turn.done():
+                self._turn.add_done_callback(lambda _: self._writes.put_nowait(None))
+            else:
+                self._writes.put_nowait(None)
+            for task in tasks:
+                task.cancel()
+            # asyncio.wait y no gather: gather no conserva la cancelación de quien
+            # ejecuta la ruta (los cancel scopes de anyio no la reconocerían)
+            await asyncio.wait(tasks)
+            for task in tasks:
+                if not task.cancelled():
+                    task.exception()
+            if self._close_code is not None:
+                try:
+                    await self.websocket.close(code=self._close_code, reason=self.close_reason)
+                except Exception:
+                    pass
+
+    async def _reject(self, code: int, reason: str):
+        """Acepta y cierra en seguida: un cierre durante el handshake llega al cliente como un 403 sin código."""
+        try:
+            await self.websocket.accept()
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _read_version(self) -> Optional[Tuple[int, int]]:
+        if self.service.versions is None:
+            return None
+        try:
+            return await self.service.versions.conversation_version(self.conversation_id)
+        except Exception as e:
+            logger.warning(f"Version check skipped for conversation {self.conversation_id}: {str(e)}")
+            return None
+
+    async def _load(self) -> bool:
+        # La versión se lee antes que los datos: en caso de carrera se recarga de más, nunca de menos
+        version = await self._read_version()
+        unsaved = list(self._unsaved.values())
+        async with self.service.repo_scope() as repo:
+            conversation = await repo.get(self.conversation_id)
+            if conversation is None:
+                return False
+            # Copias desligadas de la sesión de base de datos
+            messages = [
+                Message(id=m.id, role=m.role, content=m.content, timestamp=m.timestamp)
+                for m in conversation.messages
+            ]
+        stored = {m.id for m in messages}
+        self.messages = messages + [m for m in unsaved if m.id not in stored]
+        self._version = version
+        update = getattr(self.llm, "update_context_info", None)
+        if update is not None:
+            self.context_info = update(None, None)
+            for message in self.messages:
+                update(self.context_info, message)
+        return True
+
+    async def _refresh(self) -> bool:
+        """
+        Recarga el historial si la conversación cambió fuera de esta sesión y
+        envía los mensajes nuevos. False si la conversación ya no existe.
+        """
+        if self._version is None:
+            return True
+        current = await self._read_version()
+        if current is None or current == self._version:
+            return True
+        logger.info(f"Conversation {self.conversation_id} changed outside the WebSocket session, reloading")
+        known = {m.id for m in self.messages}
+        if not await self._load():
+            return False
+        # El cliente recibe los mensajes escritos por otras peticiones
+        for message in self.messages:
+            if message.id not in known:
+                await self.send(_message_event(message))
+        return True
+
+    async def _replay(self, after: Optional[UUID]):
+        messages, resync = self.messages, False
+        if after is not None:
+            ids = [m.id for m in self.messages]
+            if after in ids:
+                messages = self.messages[ids.index(after) + 1:]
+            else:
+                resync = True
+        await self.send({
+            "type": "ready",
+            "conversation_id": self.conversation_id,
+            "last_message_id": self.messages[-1].id if self.messages else None,
+            "resync": resync
+        })
+        for message in messages:
+            await self.send(_message_event(message))
+
+    def _close(self, reason: str, code: Optional[int] = None):
+        if self.close_reason is None:
+            self.close_reason, self._close_code = reason, code
+        self._closed.set()
+
+    async def send(self, event: dict):
+        """Encola un evento; si la cola sigue llena tras `ws_send_timeout_seconds`, cierra la conexión."""
+        if self._closed.is_set():
+            return
+        try:
+            await asyncio.wait_for(self._outbox.put(event), self.settings.ws_send_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Closing slow WebSocket consumer for conversation {self.conversation_id}")
+            self._close("slow_consumer", CLOSE_SLOW_CONSUMER)
+
+    async def _send_loop(self):
+        try:
+            while True:
+                event = await self._outbox.get()
+                await self.websocket.send_text(orjson.dumps(event).decode())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._close("client")
+
+    async def _receive_loop(self):
+        while True:
+            frame = await self.websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                self._close("client")
+                return
+            self.last_seen = time.monotonic()
+            try:
+                data = orjson.loads(frame.get("text") or frame.get("bytes") or b"")
+            except orjson.JSONDecodeError:
+                data = None
+            kind = data.get("type") if isinstance(data, dict) else None
+            if kind == "message":
+                await self._on_message(data)
+            elif kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind != "pong":
+                await self.send(_error_event("INVALID_EVENT", "Unknown or malformed event"))
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.settings.ws_heartbeat_interval_seconds)
+            if time.monotonic() - self.last_seen > self.settings.ws_heartbeat_timeout_seconds:
+                self._close("heartbeat_timeout", CLOSE_HEARTBEAT_TIMEOUT)
+                return
+            await self.send({"type": "ping"})
+
+    async def _on_message(self, data: dict):
+        if self._turn and not self._turn.done():
+            await self.send(_error_event("TURN_IN_PROGRESS", "Wait for the current reply before sending another message"))
+            return
+        try:
+            msg_in = MessageCreate(content=data.get("content"))
+        except PydanticValidationError as e:
+            await self.send(_error_event("VALIDATION_ERROR", "Invalid message", e.errors(include_url=False, include_context=False)))
+            return
+        self._turn = asyncio.create_task(self._run_turn(msg_in.content))
+        _track(self.conversation_id, self._turn)
+
+    def _append(self, message: Message) -> Message:
+        """Añade un mensaje a la sesión (con id y marca de tiempo creciente) y lo encola para guardarlo."""
+        if message.id is None:
+            message.id = uuid4()
+        now = datetime.utcnow()
+        if self.messages and now <= self.messages[-1].timestamp:
+            now = self.messages[-1].timestamp + timedelta(microseconds=1)
+        message.timestamp = now
+        self.messages.append(message)
+        self._unsaved[message.id] = message
+        if self.context_info is not None:
+            self.llm.update_context_info(self.context_info, message)
+        self._writes.put_nowait(message)
+        return message
+
+    async def _run_turn(self, content: str):
+        try:
+            await check_rate_limit(self.websocket, self.settings)
+            if not await self._refresh():
+                self._close("not_found", CLOSE_NOT_FOUND)
+                return
+            safety_response = MedicalPrompts.get_safety_response(content)
+            if safety_response:
+                # Emergencias: respuesta inmediata, sin cola de admisión
+                await self.send(_message_event(self._append(Message(role="user", content=content))))
+                provider = getattr(self.llm, "provider_name", self.settings.llm_provider)
+                SAFETY_SHORT_CIRCUITS.labels(provider=provider).inc()
+                reply = Message(
+                    role="assistant",
+                    content=safety_response,
+                    provider=provider,
+                    model=getattr(self.llm, "model_name", self.settings.llm_model),
+                    phase="safety"
+                )
+            else:
+                async with admit_request(self.websocket, rate_limit=False) as queue_seconds:
+                    await self.send(_message_event(self._append(Message(role="user", content=content))))
+                    reply_id = uuid4()
+
+                    async def on_chunk(text: str):
+                        await self.send({"type": "delta", "message_id": reply_id, "content": text})
+
+                    context = [Message(role=m.role, content=m.content, timestamp=m.timestamp) for m in self.messages]
+                    reply = await self.llm.generate_streaming(context, on_chunk, context_info=self.context_info)
+                    reply.id = reply_id
+                    reply.queue_ms = queue_seconds * 1000
+            await self.send(_message_event(self._append(reply)))
+        except APIError as e:
+            await self.send(_error_event(e.code, e.message, e.details, (e.headers or {}).get("Retry-After")))
+        except Exception as e:
+            logger.error(f"WebSocket turn failed for conversation {self.conversation_id}: {str(e)}", exc_info=True)
+            await self.send(_error_event("INTERNAL_ERROR", "The reply could not be generated"))
+
+    async def _write_loop(self):
+        """Guarda los mensajes en orden; los que se acumulan mientras tanto van en el mismo lote."""
+        done = False
+        while not done:
+            batch = []
+            message = await self._writes.get()
+            while message is not None:
+                batch.append(message)
+                if self._writes.empty():
+                    break
+                message = self._writes.get_nowait()
+            done = message is None
+            if not batch:
+                continue
+            try:
+                async with self.service.repo_scope() as repo:
+                    await self.service.persist_messages(repo, self.conversation_id, *batch)
+                # persist_messages sube la versión una vez por mensaje
+                if self._version is not None:
+                    self._version = (self._version[0], self._version[1] + len(batch))
+            except Exception as e:
+                BACKGROUND_WRITE_FAILURES.labels(source="websocket").inc(len(batch))
+                logger.error(
+                    f"Failed to persist {len(batch)} WebSocket messages for conversation {self.conversation_id}: {str(e)}",
+                    exc_info=True
+                )
+            finally:
+                for message in batch:
+                    self._unsaved.pop(message.id, None)
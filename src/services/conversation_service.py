@@ -1,20 +1,63 @@
-from uuid import UUID
+import asyncio
+from datetime import datetime, timedelta
+from uuid import UUID, uuid4
 from src.models.schemas import Conversation, Message, MessageCreate, MessageResponse, ConversationListItem
-from src.db.repository import ConversationRepository
+from src.db.repository import ConversationRepository, MessageRow, SummaryRow
 from src.providers.interface import LLMClient
 from src.core.config import get_settings, Settings
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from src.providers.factory import get_llm_client
-from typing import List
+from src.core.metrics import BACKGROUND_WRITE_FAILURES, SAFETY_SHORT_CIRCUITS
+from src.core.prompts import MedicalPrompts
+from src.core.tracing import traced
+from src.services.usage_service import UsageTracker
+from src.cache.versions import VersionStore
+from typing import AsyncContextManager, Callable, List, Set
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Escrituras en segundo plano pendientes (se esperan al apagar la app)
+_pending_writes: Set[asyncio.Task] = set()
+
+async def drain_pending_writes(timeout: float = 10.0):
+    """Espera a que terminen las escrituras en segundo plano."""
+    if _pending_writes:
+        await asyncio.wait(set(_pending_writes), timeout=timeout)
+
+def pending_write_count() -> int:
+    return len(_pending_writes)
+
+def track_pending_write(task: asyncio.Task) -> asyncio.Task:
+    """Registra una escritura en segundo plano para esperarla al apagar la app."""
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
+    return task
+
 class ConversationService:
-    def __init__(self, repo: ConversationRepository, llm: LLMClient | None = None):
+    """
+    Args:
+        repo: Repositorio de la petición
+        llm: Cliente LLM
+        repo_scope: Fábrica de repositorios con sesión propia, para persistir en
+            segundo plano. Sin ella, la vía rápida de emergencias persiste en línea.
+        usage: Agregados de consumo por conversación y proveedor (None = no se registran)
+        versions: Versiones para los ETags del historial y el listado (None = sin ETags)
+    """
+    def __init__(
+        self,
+        repo: ConversationRepository,
+        llm: LLMClient | None = None,
+        repo_scope: Callable[[], AsyncContextManager[ConversationRepository]] | None = None,
+        usage: UsageTracker | None = None,
+        versions: VersionStore | None = None
+    ):
         self.repo = repo
         self.llm = llm
+        self.repo_scope = repo_scope
+        self.usage = usage
+        self.versions = versions
         self.settings = get_settings()
 
     async def create_conversation(self, settings: Settings | None = None) -> Conversation:
@@ -23,9 +66,78 @@ class ConversationService:
             # Reinicializar el cliente LLM con la nueva configuración
             self.llm = get_llm_client(settings)
         conv = Conversation()
-        return await self.repo.create(conv)
+        conv = await self.repo.create(conv)
+        if self.versions:
+            await self.versions.safe_touch(conv.id, origin=getattr(self.repo, "origin", None))
+        return conv
+
+    @traced("service.safety_fast_path")
+    async def safety_fast_path(self, conv_id: UUID, msg_in: MessageCreate) -> MessageResponse | None:
+        """
+        Si el mensaje describe una emergencia, devuelve la respuesta de inmediato,
+        sin cargar el historial: la comprobación solo necesita el último mensaje
+        y que la conversación exista (KeyError si no). Ambos mensajes se guardan
+        en segundo plano; con `admission_max_background_writes` escrituras ya
+        pendientes, se guardan antes de responder.
+        """
+        if msg_in.role != "user":
+            return None
+        safety_response = MedicalPrompts.get_safety_response(msg_in.content)
+        if not safety_response:
+            return None
+        if not await self.repo.exists(conv_id):
+            raise KeyError("Conversation not found")
+
+        provider = getattr(self.llm, "provider_name", self.settings.llm_provider)
+        model = getattr(self.llm, "model_name", self.settings.llm_model)
+        SAFETY_SHORT_CIRCUITS.labels(provider=provider).inc()
+        now = datetime.utcnow()
+        user_msg = Message(id=uuid4(), timestamp=now, **msg_in.model_dump())
+        # Un microsegundo después, para conservar el orden del historial
+        assistant_msg = Message(
+            id=uuid4(),
+            role="assistant",
+            content=safety_response,
+            timestamp=now + timedelta(microseconds=1),
+            provider=provider,
+            model=model,
+            phase="safety"
+        )
+        response = MessageResponse.model_validate(assistant_msg)
+
+        if self.repo_scope is None or pending_write_count() >= self.settings.admission_max_background_writes:
+            await self.persist_messages(self.repo, conv_id, user_msg, assistant_msg)
+        else:
+            track_pending_write(asyncio.create_task(self._persist_in_background(conv_id, user_msg, assistant_msg)))
+        return response
 
-    async def handle_message(self, conv_id: UUID, msg_in: MessageCreate) -> MessageResponse:
+    async def persist_messages(self, repo: ConversationRepository, conv_id: UUID, *messages: Message):
+        """Guarda los mensajes en orden, con su contabilidad y nueva versión."""
+        for message in messages:
+            await repo.add_message(conv_id, message)
+            await self._message_added(conv_id, message, repo)
+
+    async def _message_added(self, conv_id: UUID, message: Message, repo: ConversationRepository):
+        """
+        Contabilidad y nueva versión (ETag) tras guardar un mensaje. La nueva
+        versión invalida la caché en memoria de los demás workers; la de este ya
+        está al día si el repositorio es el cacheado.
+        """
+        if self.usage and message.role == "assistant":
+            await self.usage.safe_record(conv_id, message)
+        if self.versions:
+            await self.versions.safe_touch(conv_id, origin=getattr(repo, "origin", None))
+
+    async def _persist_in_background(self, conv_id: UUID, *messages: Message):
+        try:
+            async with self.repo_scope() as repo:
+                await self.persist_messages(repo, conv_id, *messages)
+        except Exception as e:
+            BACKGROUND_WRITE_FAILURES.labels(source="safety").inc(len(messages))
+            logger.error(f"Failed to persist emergency messages for conversation {conv_id}: {str(e)}", exc_info=True)
+
+    @traced("service.handle_message")
+    async def handle_message(self, conv_id: UUID, msg_in: MessageCreate, queue_seconds: float | None = None) -> MessageResponse:
         # Recuperar historial
         conv = await self.repo.get(conv_id)
         if not conv:
@@ -35,6 +147,7 @@ class ConversationService:
         user_msg = Message(**msg_in.model_dump())
         conv.messages.append(user_msg)
         await self.repo.add_message(conv_id, user_msg)
+        await self._message_added(conv_id, user_msg, self.repo)
 
         # Verificar si tenemos un cliente LLM
         if not self.llm:
@@ -52,11 +165,21 @@ class ConversationService:
 
         logger.info(f"Enviando contexto con {len(context_messages)} mensajes al LLM")
         
-        # Llamar al LLM con el contexto completo
-        assistant_msg = await self.llm.generate(context_messages)
+        # Llamar al LLM con el contexto completo; con la caché en memoria, el
+        # análisis del contexto solo incorpora los mensajes nuevos
+        cache = getattr(self.repo, "cache", None)
+        update = getattr(self.llm, "update_context_info", None)
+        context_info = cache.context_info(conv_id, update) if cache and update else None
+        if context_info is not None:
+            assistant_msg = await self.llm.generate(context_messages, context_info=context_info)
+        else:
+            assistant_msg = await self.llm.generate(context_messages)
         
-        # Guardar mensaje del asistente
+        # Guardar mensaje del asistente con su espera en la cola de admisión
+        if queue_seconds is not None:
+            assistant_msg.queue_ms = queue_seconds * 1000
         await self.repo.add_message(conv_id, assistant_msg)
+        await self._message_added(conv_id, assistant_msg, self.repo)
         
         logger.info(f"Respuesta del LLM generada: {assistant_msg.content[:100]}...")
         
@@ -68,17 +191,20 @@ class ConversationService:
             raise KeyError("Conversation not found")
         return conv
 
+    async def get_history_rows(self, conv_id: UUID) -> List[MessageRow]:
+        """Historial como filas (id, role, content, timestamp), para serializarlo sin modelos intermedios"""
+        rows = await self.repo.history_rows(conv_id)
+        if rows is None:
+            raise KeyError("Conversation not found")
+        return rows
+
+    async def list_summary_rows(self) -> List[SummaryRow]:
+        """Resumen de cada conversación como filas (id, message_count, last_message_timestamp)"""
+        return await self.repo.list_summaries()
+
     async def list_conversations(self) -> List[ConversationListItem]:
         """Obtiene una lista de todas las conversaciones con información resumida"""
-        conversations = await self.repo.list_all()
-        result = []
-        
-        for conv in conversations:
-            last_message = max(conv.messages, key=lambda x: x.timestamp) if conv.messages else None
-            result.append(ConversationListItem(
-                id=conv.id,
-                message_count=len(conv.messages),
-                last_message_timestamp=last_message.timestamp if last_message else None
-            ))
-        
-        return result
+        return [
+            ConversationListItem(id=conv_id, message_count=count, last_message_timestamp=last)
+            for conv_id, count, last in await self.list_summary_rows()
+        ]
@@ -0,0 +1,153 @@
+# src/services/export_service.py
+"""
+Exportación masiva de mensajes en streaming (NDJSON o Parquet).
+
+Las filas se leen con un cursor del lado del servidor (`yield_per`) en bloques
+de `chunk_size` y se serializan bloque a bloque, así que la memoria usada no
+depende del tamaño del volcado. En Parquet cada bloque es un row group.
+"""
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Literal, Optional
+from uuid import UUID
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.schemas import Message
+
+logger = logging.getLogger(__name__)
+
+ExportFormat = Literal["ndjson", "parquet"]
+
+EXPORT_COLUMNS = ["conversation_id", "message_id", "role", "content", "timestamp", "provider", "model"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def build_export_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    provider: Optional[str] = None
+):
+    """
+    Mensajes con `start <= timestamp < end`, ordenados por conversación y fecha.
+    Con `provider` se exportan completas (también los mensajes del usuario) las
+    conversaciones con alguna respuesta de ese proveedor en el rango.
+    """
+    messages = Message.__table__
+    time_filters = []
+    if start:
+        time_filters.append(messages.c.timestamp >= start)
+    if end:
+        time_filters.append(messages.c.timestamp < end)
+
+    query = select(
+        messages.c.conversation_id,
+        messages.c.id.label("message_id"),
+        messages.c.role,
+        messages.c.content,
+        messages.c.timestamp,
+        messages.c.provider,
+        messages.c.model
+    ).where(*time_filters)
+    if provider:
+        with_provider = select(messages.c.conversation_id).where(messages.c.provider == provider, *time_filters)
+        query = query.where(messages.c.conversation_id.in_(with_provider))
+    return query.order_by(messages.c.conversation_id, messages.c.timestamp)
+
+def _plain(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: str(v) if isinstance(v, UUID) else v for k, v in row.items()}
+
+async def iter_export_chunks(session: AsyncSession, query, chunk_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Bloques de filas (dicts) leídos con un cursor del lado del servidor."""
+    result = await session.stream(query.execution_options(yield_per=chunk_size))
+    async for rows in result.mappings().partitions(chunk_size):
+        yield [_plain(dict(row)) for row in rows]
+
+async def ndjson_stream(chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(row, ensure_ascii=False, default=lambda v: v.isoformat()) + "\n" for row in rows
+        ).encode("utf-8")
+
+class _StreamSink:
+    """Destino de escritura para ParquetWriter que entrega lo escrito por partes."""
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+async def parquet_stream(chunks: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Un row group por bloque; requiere pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("conversation_id", pa.string()),
+        ("message_id", pa.string()),
+        ("role", pa.string()),
+        ("content", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("provider", pa.string()),
+        ("model", pa.string()),
+    ])
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for rows in chunks:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema), row_group_size=len(rows))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+async def export_messages(
+    session_factory: Callable,
+    fmt: ExportFormat,
+    query,
+    chunk_size: int = 5000
+) -> AsyncIterator[bytes]:
+    """Volcado completo en `fmt`, en fragmentos de bytes listos para escribir o enviar."""
+    rows = 0
+    async with session_factory() as session:
+        async def counted():
+            nonlocal rows
+            async for chunk in iter_export_chunks(session, query, chunk_size):
+                rows += len(chunk)
+                yield chunk
+
+        stream = parquet_stream(counted()) if fmt == "parquet" else ndjson_stream(counted())
+        async for data in stream:
+            if data:
+                yield data
+    logger.info(f"Exported {rows} messages as {fmt}")
@@ -0,0 +1,379 @@
+# src/services/import_service.py
+"""
+Importación masiva de mensajes desde NDJSON.
+
+El archivo se procesa en bloques de `chunk_size` líneas, con `workers` bloques
+en paralelo (cada uno con su propia conexión). Cada bloque se valida con una
+sola llamada a pydantic y se escribe en una transacción:
+- Postgres (asyncpg): COPY a una tabla temporal e INSERT ... SELECT ... ON CONFLICT DO NOTHING
+- otros motores: INSERT multi-fila con ON CONFLICT DO NOTHING
+
+Como las escrituras son idempotentes, el checkpoint (bloques completados) solo
+se actualiza después del commit: si el proceso se interrumpe, al reanudar se
+saltan los bloques terminados y se repite a lo sumo el que estaba en curso.
+
+`ImportJob` ejecuta en segundo plano las importaciones recibidas por el
+endpoint de admin: el estado se guarda en `{import_id}.status.json`, junto al
+archivo recibido y su checkpoint.
+"""
+import asyncio
+import fcntl
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import logging
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.db.partitions import create_partition, is_partitioned, month_start
+from src.models.schemas import Conversation, ImportedMessage, Message
+
+logger = logging.getLogger(__name__)
+
+_BATCH = TypeAdapter(List[ImportedMessage])
+_ONE = TypeAdapter(ImportedMessage)
+
+MESSAGE_COLUMNS = ["id", "role", "content", "timestamp", "conversation_id", "provider", "model"]
+
+Chunk = List[Tuple[int, bytes]]  # (número de línea, contenido)
+
+@dataclass
+class ImportStats:
+    rows: int = 0
+    rejected: int = 0
+    chunks: int = 0
+    skipped_chunks: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    MAX_ERRORS = 100
+
+    def reject(self, line: int, error: str):
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+def validate_chunk(chunk: Chunk) -> Tuple[List[ImportedMessage], List[Tuple[int, str]]]:
+    """
+    Valida el bloque con una sola llamada a pydantic; si alguna línea falla,
+    revalida línea a línea para separar las válidas de las rechazadas.
+    """
+    try:
+        return _BATCH.validate_json(b"[" + b",".join(line for _, line in chunk) + b"]"), []
+    except ValidationError:
+        pass
+    valid, rejected = [], []
+    for line_no, line in chunk:
+        try:
+            valid.append(_ONE.validate_json(line))
+        except ValidationError as e:
+            rejected.append((line_no, e.errors(include_url=False)[0]["msg"]))
+    return valid, rejected
+
+class Checkpoint:
+    """Bloques completados de una importación, persistidos en un archivo JSON."""
+    def __init__(self, path: Optional[str], source: str, chunk_size: int):
+        self.path = path
+        self.identity = {"source": os.path.abspath(source), "size": os.path.getsize(source), "chunk_size": chunk_size}
+        self.done: Set[int] = set()
+        self.stats = ImportStats()
+        self._lock = asyncio.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("identity") != self.identity:
+                raise ValueError(f"Checkpoint {path} belongs to a different file or chunk size")
+            self.done = set(data["done"])
+            self.stats.rows, self.stats.rejected = data["rows"], data["rejected"]
+
+    async def complete(self, index: int, rows: int, rejected: List[Tuple[int, str]]):
+        async with self._lock:
+            self.done.add(index)
+            self.stats.rows += rows
+            self.stats.chunks += 1
+            for line_no, error in rejected:
+                self.stats.reject(line_no, error)
+            if self.path:
+                data = {
+                    "identity": self.identity,
+                    "done": sorted(self.done),
+                    "rows": self.stats.rows,
+                    "rejected": self.stats.rejected,
+                }
+                tmp = f"{self.path}.tmp"
+                await asyncio.to_thread(_write_json, tmp, data)
+                os.replace(tmp, self.path)
+
+def _write_json(path: str, data: Dict[str, Any]):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+def _message_rows(messages: List[ImportedMessage]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": m.message_id,
+            "role": m.role,
+            "content": m.content,
+            "timestamp": m.timestamp,
+            "conversation_id": m.conversation_id,
+            "provider": m.provider,
+            "model": m.model,
+        }
+        for m in messages
+    ]
+
+def _conversation_rows(messages: List[ImportedMessage]) -> List[Dict[str, Any]]:
+    # created_at = mensaje más antiguo: es la cota de poda de particiones
+    earliest: Dict[Any, datetime] = {}
+    for m in messages:
+        if m.conversation_id not in earliest or m.timestamp < earliest[m.conversation_id]:
+            earliest[m.conversation_id] = m.timestamp
+    # Orden estable para que bloques paralelos bloqueen filas en el mismo orden
+    return [{"id": cid, "created_at": ts} for cid, ts in sorted(earliest.items(), key=lambda kv: str(kv[0]))]
+
+class BulkImporter:
+    """
+    Args:
+        session_factory: Fábrica de AsyncSession
+        chunk_size: Líneas por bloque (y por transacción)
+        workers: Bloques procesados en paralelo
+        checkpoint_path: Archivo de checkpoint para reanudar (None = sin checkpoint)
+    """
+    def __init__(
+        self,
+        session_factory: Callable,
+        chunk_size: int = 5000,
+        workers: int = 4,
+        checkpoint_path: Optional[str] = None
+    ):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint_path = checkpoint_path
+        self._known_months: Set[date] = set()
+        self._partition_lock = asyncio.Lock()
+
+    async def import_file(self, path: str) -> ImportStats:
+        checkpoint = Checkpoint(self.checkpoint_path, path, self.chunk_size)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                index, chunk = item
+                messages, rejected = validate_chunk(chunk)
+                if messages:
+                    await self._write(messages)
+                await checkpoint.complete(index, len(messages), rejected)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        try:
+            for index, chunk in self._read_chunks(path):
+                if index in checkpoint.done:
+                    checkpoint.stats.skipped_chunks += 1
+                    continue
+                # La cola acotada limita la memoria si la base de datos va más lenta que la lectura
+                await self._put(queue, (index, chunk), tasks)
+            for _ in tasks:
+                await self._put(queue, None, tasks)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        logger.info(
+            f"Imported {checkpoint.stats.rows} messages from {path} "
+            f"({checkpoint.stats.rejected} rejected, {checkpoint.stats.skipped_chunks} chunks skipped)"
+        )
+        return checkpoint.stats
+
+    @staticmethod
+    async def _put(queue: asyncio.Queue, item, tasks: List[asyncio.Task]):
+        """Encola `item`; si un worker falla mientras se espera, propaga su error."""
+        put = asyncio.ensure_future(queue.put(item))
+        done, _ = await asyncio.wait([put, *tasks], return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            for task in done:
+                task.result()
+
+    def _read_chunks(self, path: str):
+        with open(path, "rb") as f:
+            index, chunk = 0, []
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                chunk.append((line_no, line))
+                if len(chunk) >= self.chunk_size:
+                    yield index, chunk
+                    index, chunk = index + 1, []
+            if chunk:
+                yield index, chunk
+
+    async def _write(self, messages: List[ImportedMessage]):
+        async with self.session_factory() as session:
+            conn = await session.connection()
+            dialect = conn.dialect.name
+            if dialect == "postgresql":
+                await self._ensure_partitions({month_start(m.timestamp.date()) for m in messages})
+            await self._upsert_conversations(session, dialect, _conversation_rows(messages))
+            if conn.dialect.driver == "asyncpg":
+                await self._copy_messages(session, messages)
+            else:
+                stmt = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+                if stmt:
+                    await session.execute(stmt(Message.__table__).on_conflict_do_nothing(), _message_rows(messages))
+                else:
+                    await session.execute(insert(Message.__table__), _message_rows(messages))
+            await session.commit()
+
+    async def _upsert_conversations(self, session, dialect: str, rows: List[Dict[str, Any]]):
+        table = Conversation.__table__
+        if dialect in ("postgresql", "sqlite"):
+            stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+            least = func.least if dialect == "postgresql" else func.min
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_={"created_at": least(table.c.created_at, stmt.excluded.created_at)}
+            )
+            await session.execute(stmt, rows)
+        else:
+            await session.execute(insert(table), rows)
+
+    async def _copy_messages(self, session, messages: List[ImportedMessage]):
+        """COPY binario a una tabla temporal y volcado idempotente a messages."""
+        await session.execute(text(
+            "CREATE TEMP TABLE import_messages (LIKE messages INCLUDING DEFAULTS) ON COMMIT DROP"
+        ))
+        raw = await (await session.connection()).get_raw_connection()
+        records = [tuple(row[c] for c in MESSAGE_COLUMNS) for row in _message_rows(messages)]
+        await raw.driver_connection.copy_records_to_table("import_messages", records=records, columns=MESSAGE_COLUMNS)
+        columns = ", ".join(MESSAGE_COLUMNS)
+        await session.execute(text(
+            f"INSERT INTO messages ({columns}) SELECT {columns} FROM import_messages ON CONFLICT DO NOTHING"
+        ))
+
+    async def _ensure_partitions(self, months: Set[date]):
+        """Crea las particiones de los meses importados (datos históricos) antes de insertar."""
+        missing = months - self._known_months
+        if not missing:
+            return
+        async with self._partition_lock:
+            missing = months - self._known_months
+            if not missing:
+                return
+            async with self.session_factory() as ddl_session:
+                conn = await ddl_session.connection()
+                if await is_partitioned(conn):
+                    for month in sorted(missing):
+                        await create_partition(conn, month)
+                await ddl_session.commit()
+            self._known_months |= missing
+
+class ImportBusyError(Exception):
+    """Ya hay una importación en curso con ese ID."""
+
+# Importaciones en segundo plano de este proceso
+_jobs: Set[asyncio.Task] = set()
+
+def read_import_status(work_dir: str, import_id: str) -> Optional[Dict[str, Any]]:
+    """Estado de una importación; mientras está en curso incluye las filas ya importadas."""
+    paths = ImportJob(work_dir, import_id)
+    if not os.path.exists(paths.status_path):
+        return None
+    with open(paths.status_path) as f:
+        status = json.load(f)
+    if status["status"] == "running" and os.path.exists(paths.checkpoint_path):
+        with open(paths.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        status.update(rows=checkpoint["rows"], rejected=checkpoint["rejected"], chunks_done=len(checkpoint["done"]))
+    return status
+
+class ImportJob:
+    """
+    Importación recibida por el endpoint: guarda el cuerpo en disco y lo importa
+    en segundo plano. Un lock de archivo por `import_id` impide que dos
+    peticiones (de este u otro worker del nodo) escriban o importen a la vez el
+    mismo archivo.
+    """
+    def __init__(self, work_dir: str, import_id: str):
+        self.import_id = import_id
+        base = os.path.join(work_dir, import_id)
+        self.data_path = f"{base}.ndjson"
+        self.checkpoint_path = f"{base}.checkpoint.json"
+        self.status_path = f"{base}.status.json"
+        self._lock_path = f"{base}.lock"
+        self._lock = None
+        self.started_at: Optional[str] = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        lock = open(self._lock_path, "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            raise ImportBusyError(f"Import {self.import_id} is already running")
+        self._lock = lock
+
+    def release(self):
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    async def receive(self, chunks: AsyncIterator[bytes]):
+        """Guarda el cuerpo recibido; las escrituras van a un hilo para no bloquear el event loop."""
+        f = await asyncio.to_thread(open, self.data_path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+
+    def _write_status(self, status: str, **fields):
+        _write_json(self.status_path, {"import_id": self.import_id, "status": status, **fields})
+
+    def start(self, importer: "BulkImporter", on_finish: Optional[Callable[[], Awaitable[None]]] = None) -> asyncio.Task:
+        """Lanza la importación; el lock se libera al terminar."""
+        self.started_at = datetime.utcnow().isoformat()
+        self._write_status("running", started_at=self.started_at)
+        task = asyncio.create_task(self._run(importer, on_finish), name=f"import-{self.import_id}")
+        _jobs.add(task)
+        task.add_done_callback(_jobs.discard)
+        return task
+
+    async def _run(self, importer: "BulkImporter", on_finish: Optional[Callable[[], Awaitable[None]]]):
+        started_at = self.started_at
+        try:
+            stats = await importer.import_file(self.data_path)
+        except asyncio.CancelledError:
+            # El checkpoint se conserva: reenviar el archivo con el mismo ID la reanuda
+            self._write_status("interrupted", started_at=started_at, finished_at=datetime.utcnow().isoformat())
+            raise
+        except Exception as e:
+            logger.error(f"Import {self.import_id} failed: {str(e)}", exc_info=True)
+            self._write_status("failed", started_at=started_at, finished_at=datetime.utcnow().isoformat(), error=str(e))
+        else:
+            for path in (self.data_path, self.checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._write_status(
+                "completed", started_at=started_at, finished_at=datetime.utcnow().isoformat(), **asdict(stats)
+            )
+        finally:
+            self.release()
+            # También tras un fallo: los bloques ya importados quedan confirmados
+            if on_finish is not None:
+                await on_finish()
+
+async def cancel_import_jobs():
+    """Interrumpe las importaciones en curso de este proceso (al apagar la app)."""
+    for task in list(_jobs):
+        task.cancel()
+    if _jobs:
+        await asyncio.wait(list(_jobs))
@@ -0,0 +1,252 @@
+# src/services/retention_service.py
+"""
+Política de retención de conversaciones.
+
+Una conversación es candidata si no tiene mensajes desde hace `retention_days`
+días. Las candidatas se procesan en lotes acotados con SQL por conjuntos
+(DELETE / UPDATE ... WHERE conversation_id IN (...)), sin cargar objetos ORM,
+y entre lote y lote el job duerme lo necesario para no ocupar la base de datos
+más de `max_load` del tiempo.
+
+Con varios workers, un lock en Redis (como el del archivador de conversaciones)
+hace que cada ciclo lo ejecute un solo worker: de otro modo procesarían las
+mismas filas a la vez y la carga permitida se multiplicaría por el número de
+workers.
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Literal, Optional
+from uuid import UUID, uuid4
+import logging
+
+from sqlalchemy import delete, exists, func, select, update
+
+from src.cache.versions import VersionStore
+from src.core.config import Settings
+from src.core.metrics import RETENTION_CONVERSATIONS, RETENTION_MESSAGES, RETENTION_PENDING
+from src.models.schemas import Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+RetentionMode = Literal["delete", "anonymize"]
+
+ANONYMIZED_CONTENT = "[contenido eliminado por la política de retención]"
+
+RETENTION_LOCK_KEY = "retention:lock"
+# Vida del lock; se renueva tras cada lote mientras el ciclo avanza
+RETENTION_LOCK_TTL_SECONDS = 300
+
+@dataclass
+class RetentionResult:
+    mode: str
+    dry_run: bool
+    cutoff: datetime
+    conversations: int = 0
+    messages: int = 0
+    batches: int = 0
+
+class RetentionWorker:
+    """
+    Args:
+        session_factory: Fábrica de AsyncSession
+        retention_days: Días sin actividad tras los que se aplica la política
+        mode: "delete" borra conversación y mensajes; "anonymize" reemplaza el contenido
+        batch_size: Conversaciones por lote (una transacción por lote)
+        max_load: Fracción máxima del tiempo ocupada por el job (0.2 = duerme 4x lo que tarda cada lote)
+        interval: Segundos entre ciclos
+        dry_run: Solo contar lo que se borraría o anonimizaría
+        versions: Versiones de los ETags; cada lote cambia las de sus conversaciones
+        redis: Cliente Redis para el lock entre workers (None = sin lock)
+    """
+    def __init__(
+        self,
+        session_factory: Callable,
+        retention_days: int,
+        mode: RetentionMode = "delete",
+        batch_size: int = 1000,
+        max_load: float = 0.2,
+        interval: float = 3600.0,
+        dry_run: bool = False,
+        versions: Optional[VersionStore] = None,
+        redis=None
+    ):
+        self.session_factory = session_factory
+        self.retention_days = retention_days
+        self.mode = mode
+        self.batch_size = batch_size
+        self.max_load = max_load
+        self.interval = interval
+        self.dry_run = dry_run
+        self.versions = versions
+        self.redis = redis
+        self._lock_token: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(
+        cls,
+        session_factory: Callable,
+        settings: Settings,
+        versions: Optional[VersionStore] = None,
+        redis=None
+    ) -> "RetentionWorker":
+        return cls(
+            session_factory,
+            retention_days=settings.retention_days,
+            mode=settings.retention_mode,
+            batch_size=settings.retention_batch_size,
+            max_load=settings.retention_max_load,
+            interval=settings.retention_interval_seconds,
+            dry_run=settings.retention_dry_run,
+            versions=versions,
+            redis=redis
+        )
+
+    def _candidates(self, cutoff: datetime):
+        """Conversaciones sin mensajes desde `cutoff` (la condición sobre timestamp poda particiones)."""
+        recent = exists().where(Message.conversation_id == Conversation.id, Message.timestamp >= cutoff)
+        query = select(Conversation.id).where(
+            (Conversation.created_at < cutoff) | Conversation.created_at.is_(None),
+            ~recent
+        )
+        if self.mode == "anonymize":
+            query = query.where(Conversation.anonymized_at.is_(None))
+        return query
+
+    async def pending(self, cutoff: datetime):
+        """(conversaciones, mensajes) candidatos; es lo que informa el dry-run."""
+        candidates = self._candidates(cutoff).subquery()
+        async with self.session_factory() as session:
+            conversations = (await session.execute(select(func.count()).select_from(candidates))).scalar_one()
+            messages = (await session.execute(
+                select(func.count()).select_from(Message).where(Message.conversation_id.in_(select(candidates.c.id)))
+            )).scalar_one()
+        return conversations, messages
+
+    async def run_once(self, now: Optional[datetime] = None, dry_run: Optional[bool] = None) -> RetentionResult:
+        now = now or datetime.utcnow()
+        dry_run = self.dry_run if dry_run is None else dry_run
+        cutoff = now - timedelta(days=self.retention_days)
+        result = RetentionResult(mode=self.mode, dry_run=dry_run, cutoff=cutoff)
+
+        pending_conversations, pending_messages = await self.pending(cutoff)
+        RETENTION_PENDING.set(pending_conversations)
+        if dry_run:
+            result.conversations, result.messages = pending_conversations, pending_messages
+            logger.info(
+                f"Retention dry run ({self.mode}, cutoff {cutoff.isoformat()}): "
+                f"{pending_conversations} conversations, {pending_messages} messages"
+            )
+            return result
+
+        while True:
+            start = time.perf_counter()
+            async with self.session_factory() as session:
+                ids = list((await session.execute(self._candidates(cutoff).limit(self.batch_size))).scalars())
+                if not ids:
+                    break
+                messages = await self._apply(session, ids, now)
+                await session.commit()
+            if self.versions:
+                await self.versions.safe_touch(*ids)
+            result.conversations += len(ids)
+            result.messages += messages
+            result.batches += 1
+            RETENTION_CONVERSATIONS.labels(action=self.mode).inc(len(ids))
+            RETENTION_MESSAGES.labels(action=self.mode).inc(messages)
+            RETENTION_PENDING.set(max(pending_conversations - result.conversations, 0))
+            if len(ids) < self.batch_size:
+                break
+            # Limitar la carga: por cada segundo de trabajo, dormir (1 - max_load) / max_load segundos
+            elapsed = time.perf_counter() - start
+            await self._extend_lock()
+            await asyncio.sleep(elapsed * (1 - self.max_load) / self.max_load)
+            await self._extend_lock()
+
+        logger.info(
+            f"Retention ({self.mode}): {result.conversations} conversations, "
+            f"{result.messages} messages in {result.batches} batches"
+        )
+        return result
+
+    async def _apply(self, session, ids: List[UUID], now: datetime) -> int:
+        """Aplica la política a un lote. Devuelve los mensajes afectados."""
+        if self.mode == "anonymize":
+            messages = await session.execute(
+                update(Message).where(Message.conversation_id.in_(ids)).values(content=ANONYMIZED_CONTENT)
+                .execution_options(synchronize_session=False)
+            )
+            await session.execute(
+                update(Conversation).where(Conversation.id.in_(ids)).values(anonymized_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            return messages.rowcount
+        messages = await session.execute(
+            delete(Message).where(Message.conversation_id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await session.execute(
+            delete(Conversation).where(Conversation.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        return messages.rowcount
+
+    async def _acquire_lock(self) -> bool:
+        if self.redis is None:
+            return True
+        token = uuid4().hex
+        if await self.redis.set(RETENTION_LOCK_KEY, token, nx=True, ex=RETENTION_LOCK_TTL_SECONDS):
+            self._lock_token = token
+            return True
+        return False
+
+    async def _extend_lock(self):
+        if self.redis is None or self._lock_token is None:
+            return
+        value = await self.redis.get(RETENTION_LOCK_KEY)
+        if value not in (self._lock_token, self._lock_token.encode()):
+            raise RuntimeError("Retention lock lost to another worker")
+        await self.redis.expire(RETENTION_LOCK_KEY, RETENTION_LOCK_TTL_SECONDS)
+
+    async def _release_lock(self):
+        token, self._lock_token = self._lock_token, None
+        if self.redis is None or token is None:
+            return
+        value = await self.redis.get(RETENTION_LOCK_KEY)
+        if value in (token, token.encode()):
+            await self.redis.delete(RETENTION_LOCK_KEY)
+
+    async def run_exclusive(self, now: Optional[datetime] = None, dry_run: Optional[bool] = None) -> Optional[RetentionResult]:
+        """run_once() con el lock entre workers; None si otro worker está ejecutando un ciclo."""
+        if not await self._acquire_lock():
+            return None
+        try:
+            return await self.run_once(now, dry_run)
+        finally:
+            await self._release_lock()
+
+    async def run(self):
+        while True:
+            try:
+                if await self.run_exclusive() is None:
+                    logger.debug("Retention cycle skipped: another worker holds the lock")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Retention job failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self.run(), name="retention-worker")
+        logger.info(
+            f"Retention worker started (mode={self.mode}, days={self.retention_days}, dry_run={self.dry_run})"
+        )
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
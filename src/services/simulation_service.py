@@ -0,0 +1,120 @@
+# src/services/simulation_service.py
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional
+
+from pydantic import ValidationError
+
+from src.core.config import Settings, get_settings
+from src.models.schemas import MessageCreate, SimulationResult, SimulationScript, SimulationTurn
+from src.providers.factory import get_llm_client
+from src.providers.interface import LLMClient
+from src.repositories.conversation_repository import ConversationRepository
+from src.repositories.memory_repository import InMemoryConversationRepository
+from src.services.conversation_service import ConversationService
+import logging
+
+logger = logging.getLogger(__name__)
+
+def parse_simulation_scripts(lines: Iterable[str]) -> List[SimulationScript]:
+    """
+    Parsea guiones de simulación en formato NDJSON (un objeto JSON por línea).
+
+    Raises:
+        ValueError: Si alguna línea no es JSON válido o no cumple el esquema
+    """
+    scripts = []
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            scripts.append(SimulationScript.model_validate(json.loads(line)))
+        except (json.JSONDecodeError, ValidationError) as e:
+            raise ValueError(f"Línea {line_number} inválida: {str(e)}")
+    return scripts
+
+class ConversationSimulator:
+    """
+    Ejecuta guiones de conversación contra ConversationService con concurrencia
+    acotada por proveedor. Los resultados se entregan a medida que cada
+    conversación termina.
+    """
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        concurrency: int = 4,
+        persist: bool = False,
+        session_factory: Optional[Callable] = None,
+        llm_factory: Callable[[Settings], LLMClient] = get_llm_client
+    ):
+        if concurrency < 1:
+            raise ValueError("La concurrencia debe ser al menos 1")
+        if persist and session_factory is None:
+            raise ValueError("Se requiere una sesión de base de datos para persistir simulaciones")
+        self.settings = settings or get_settings()
+        self.concurrency = concurrency
+        self.persist = persist
+        self.session_factory = session_factory
+        self.llm_factory = llm_factory
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._clients: Dict[str, LLMClient] = {}
+
+    def _get_llm(self, provider: str) -> LLMClient:
+        # Un adapter por proveedor, compartido entre todas las conversaciones
+        if provider not in self._clients:
+            settings = self.settings
+            if provider != settings.llm_provider:
+                settings = settings.model_copy(update={"llm_provider": provider})
+            self._clients[provider] = self.llm_factory(settings)
+        return self._clients[provider]
+
+    @asynccontextmanager
+    async def _repository(self):
+        if not self.persist:
+            yield InMemoryConversationRepository()
+            return
+        async with self.session_factory() as session:
+            yield ConversationRepository(session)
+
+    async def run_script(self, script: SimulationScript) -> SimulationResult:
+        """Ejecuta un guion completo y devuelve su resultado (nunca lanza excepciones)."""
+        provider = script.provider or self.settings.llm_provider
+        semaphore = self._semaphores.setdefault(provider, asyncio.Semaphore(self.concurrency))
+
+        async with semaphore:
+            start = time.perf_counter()
+            result = SimulationResult(script_id=script.id, provider=provider)
+            try:
+                llm = self._get_llm(provider)
+                async with self._repository() as repo:
+                    service = ConversationService(repo, llm)
+                    conv = await service.create_conversation()
+                    result.conversation_id = conv.id
+                    for content in script.turns:
+                        turn_start = time.perf_counter()
+                        reply = await service.handle_message(conv.id, MessageCreate(role="user", content=content))
+                        result.turns.append(SimulationTurn(
+                            user=content,
+                            assistant=reply.content,
+                            latency_ms=(time.perf_counter() - turn_start) * 1000
+                        ))
+            except Exception as e:
+                logger.error(f"Simulation {script.id or '-'} failed on provider {provider}: {str(e)}")
+                result.status = "error"
+                result.error = str(e)
+            result.duration_ms = (time.perf_counter() - start) * 1000
+            return result
+
+    async def run(self, scripts: Iterable[SimulationScript]) -> AsyncIterator[SimulationResult]:
+        """Ejecuta todos los guiones y produce los resultados en orden de finalización."""
+        tasks = [asyncio.create_task(self.run_script(script)) for script in scripts]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Si el consumidor abandona (p. ej. el cliente HTTP se desconecta) cancelar lo pendiente
+            for task in tasks:
+                task.cancel()
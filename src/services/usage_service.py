@@ -0,0 +1,217 @@
+# src/services/usage_service.py
+"""
+Consumo de tokens y latencia por conversación y por proveedor/modelo.
+
+Cada respuesta del asistente guarda su detalle en `messages` (fase, tokens,
+espera en cola y latencia del proveedor). Además, los agregados se actualizan
+de forma incremental en Redis con cada respuesta (HINCRBY en un solo pipeline),
+así que consultarlos no recorre mensajes:
+- `usage:conv:{id}`: hash de la conversación (expira tras `ttl` sin actividad)
+- `usage:model:{provider}:{model}`: hash por proveedor y modelo
+- `usage:models`: set con los pares proveedor/modelo registrados
+
+Los campos de cada hash son `{fase}:{métrica}`; la fase `all` guarda el total.
+Si el agregado de una conversación ya expiró, se recalcula desde `messages` y
+se vuelve a guardar: al registrar una respuesta (antes de sumarla, para no
+dejar un hash con solo esa respuesta) y al consultarlo.
+"""
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+import logging
+
+import redis.asyncio as redis
+from fastapi import Request
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.core.config import get_settings
+from src.db import session as db_session
+from src.models.schemas import Conversation, ConversationUsage, Message, ProviderUsage, UsageStats
+
+logger = logging.getLogger(__name__)
+
+MODELS_KEY = "usage:models"
+TOTAL = "all"
+_METRICS = ("messages", "prompt_tokens", "completion_tokens", "provider_latency_ms", "queue_ms")
+
+def _conversation_key(conversation_id) -> str:
+    return f"usage:conv:{conversation_id}"
+
+def _model_key(provider: str, model: str) -> str:
+    return f"usage:model:{provider}:{model}"
+
+def _str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def _increments(message: Message) -> Dict[str, float]:
+    return {
+        "messages": 1,
+        "prompt_tokens": message.prompt_tokens or 0,
+        "completion_tokens": message.completion_tokens or 0,
+        "provider_latency_ms": message.provider_latency_ms or 0.0,
+        "queue_ms": message.queue_ms or 0.0,
+    }
+
+def _parse(fields: Dict) -> Tuple[UsageStats, Dict[str, UsageStats]]:
+    """Hash `{fase}:{métrica}` -> (total, por fase)."""
+    by_phase: Dict[str, Dict[str, float]] = {}
+    for field, value in fields.items():
+        phase, metric = _str(field).rsplit(":", 1)
+        by_phase.setdefault(phase, {})[metric] = float(_str(value))
+    stats = {phase: UsageStats(**values) for phase, values in by_phase.items()}
+    return stats.pop(TOTAL, UsageStats()), stats
+
+def _fields(usage: ConversationUsage) -> Dict[str, float]:
+    """Inverso de _parse: agregado -> hash `{fase}:{métrica}`."""
+    fields = {}
+    for phase, stats in [(TOTAL, usage.totals), *usage.phases.items()]:
+        for metric in _METRICS:
+            fields[f"{phase}:{metric}"] = getattr(stats, metric)
+    return fields
+
+class UsageTracker:
+    """
+    Args:
+        redis_client: Cliente Redis
+        conversation_ttl: Segundos sin actividad tras los que expira el agregado de una conversación
+        session_factory: Sesiones de base de datos para recalcular un agregado expirado (None = no se recalcula)
+    """
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        conversation_ttl: int = 30 * 86400,
+        session_factory: Optional[Callable[[], AsyncSession]] = None
+    ):
+        self.redis = redis_client
+        self.conversation_ttl = conversation_ttl
+        self.session_factory = session_factory
+
+    async def store(self, usage: ConversationUsage) -> bool:
+        """Guarda un agregado recalculado si el hash sigue sin existir; False si otro lo creó antes."""
+        key = _conversation_key(usage.conversation_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.exists(key):
+                    await pipe.unwatch()
+                    return False
+                pipe.multi()
+                pipe.hset(key, mapping=_fields(usage))
+                pipe.expire(key, self.conversation_ttl)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def _rebuild(self, conversation_id: UUID) -> bool:
+        """
+        Recalcula desde `messages` el agregado expirado de la conversación. La
+        respuesta que se está registrando ya está guardada y queda incluida.
+        """
+        if self.session_factory is None or await self.redis.exists(_conversation_key(conversation_id)):
+            return False
+        async with self.session_factory() as session:
+            usage = await conversation_usage_from_messages(session, conversation_id)
+        # Conversaciones que aún no están en Postgres (tier caliente): se suma sin más
+        if usage is None or not usage.totals.messages:
+            return False
+        return await self.store(usage)
+
+    async def record(self, conversation_id: UUID, message: Message):
+        """Suma la respuesta a los agregados de su conversación y de su proveedor/modelo."""
+        provider = message.provider or "unknown"
+        model = message.model or "unknown"
+        phases = (TOTAL, message.phase or "none")
+        conversation_key = _conversation_key(conversation_id)
+        keys = [_model_key(provider, model)]
+        if not await self._rebuild(conversation_id):
+            keys.append(conversation_key)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                for phase in phases:
+                    for metric, value in _increments(message).items():
+                        if isinstance(value, int):
+                            pipe.hincrby(key, f"{phase}:{metric}", value)
+                        else:
+                            pipe.hincrbyfloat(key, f"{phase}:{metric}", value)
+            pipe.expire(conversation_key, self.conversation_ttl)
+            pipe.sadd(MODELS_KEY, json.dumps([provider, model]))
+            await pipe.execute()
+
+    async def conversation_usage(self, conversation_id: UUID) -> Optional[ConversationUsage]:
+        fields = await self.redis.hgetall(_conversation_key(conversation_id))
+        if not fields:
+            return None
+        totals, phases = _parse(fields)
+        return ConversationUsage(conversation_id=conversation_id, totals=totals, phases=phases)
+
+    async def provider_usage(self) -> List[ProviderUsage]:
+        pairs = sorted(json.loads(_str(member)) for member in await self.redis.smembers(MODELS_KEY))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for provider, model in pairs:
+                pipe.hgetall(_model_key(provider, model))
+            rows = await pipe.execute()
+        result = []
+        for (provider, model), fields in zip(pairs, rows):
+            totals, phases = _parse(fields)
+            result.append(ProviderUsage(provider=provider, model=model, totals=totals, phases=phases))
+        return result
+
+    async def safe_record(self, conversation_id: UUID, message: Message):
+        """record() sin propagar errores de Redis: la contabilidad no debe tumbar la respuesta."""
+        try:
+            await self.record(conversation_id, message)
+        except (RedisError, SQLAlchemyError) as e:
+            logger.warning(f"Usage not recorded for conversation {conversation_id}: {str(e)}")
+
+def get_usage_tracker(request: Request) -> Optional[UsageTracker]:
+    redis_client = getattr(request.app.state, "redis", None)
+    if redis_client is None:
+        return None
+    return UsageTracker(
+        redis_client,
+        get_settings().usage_conversation_ttl_days * 86400,
+        session_factory=db_session.AsyncSessionLocal
+    )
+
+async def conversation_usage_from_messages(session: AsyncSession, conversation_id: UUID) -> Optional[ConversationUsage]:
+    """Recalcula el agregado desde `messages` (una consulta agrupada por fase); None si la conversación no existe."""
+    messages = Message.__table__
+    rows = (await session.execute(
+        select(
+            messages.c.phase,
+            func.count(),
+            func.coalesce(func.sum(messages.c.prompt_tokens), 0),
+            func.coalesce(func.sum(messages.c.completion_tokens), 0),
+            func.coalesce(func.sum(messages.c.provider_latency_ms), 0.0),
+            func.coalesce(func.sum(messages.c.queue_ms), 0.0),
+        )
+        .where(messages.c.conversation_id == conversation_id, messages.c.role == "assistant")
+        .group_by(messages.c.phase)
+    )).all()
+    if not rows:
+        exists = (await session.execute(
+            select(Conversation.id).where(Conversation.id == conversation_id)
+        )).scalar_one_or_none()
+        if exists is None:
+            return None
+
+    totals = UsageStats()
+    phases: Dict[str, UsageStats] = {}
+    for phase, count, prompt_tokens, completion_tokens, latency, queue in rows:
+        stats = UsageStats(
+            messages=count,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            provider_latency_ms=latency,
+            queue_ms=queue
+        )
+        phases[phase or "none"] = stats
+        totals = UsageStats(**{
+            name: getattr(totals, name) + getattr(stats, name)
+            for name in ("messages", "prompt_tokens", "completion_tokens", "provider_latency_ms", "queue_ms")
+        })
+    return ConversationUsage(conversation_id=conversation_id, totals=totals, phases=phases)
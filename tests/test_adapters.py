@@ -1 +1,45 @@
+import time
+import pytest
+from src.core.config import Settings
+from src.models.schemas import Message
+from src.providers.factory import get_available_providers, get_llm_client
+from src.providers.adapters.synthetic_adapter import SyntheticAdapter
 
+def synthetic_settings(**overrides):
+    return Settings(llm_provider="synthetic", synthetic_seed=1, _env_file=None, **overrides)
+
+def test_synthetic_provider_is_registered():
+    assert "synthetic" in get_available_providers()
+    assert isinstance(get_llm_client(synthetic_settings()), SyntheticAdapter)
+
+@pytest.mark.asyncio
+async def test_synthetic_responses_are_deterministic():
+    context = [Message(role="user", content="Mi hija tiene 3 años y fiebre")]
+    first = await SyntheticAdapter(synthetic_settings()).generate(context)
+    second = await SyntheticAdapter(synthetic_settings()).generate(context)
+    assert first.role == "assistant"
+    assert first.content == second.content
+
+@pytest.mark.asyncio
+async def test_synthetic_streaming_respects_chunking_and_token_rate():
+    adapter = SyntheticAdapter(synthetic_settings(
+        synthetic_response_mode="template",
+        synthetic_response_template="uno dos tres cuatro cinco",
+        synthetic_stream_chunk_tokens=2,
+        synthetic_tokens_per_second=200
+    ))
+    start = time.perf_counter()
+    chunks = [c async for c in adapter.stream_provider([{"role": "user", "content": "hola"}])]
+    assert chunks == ["uno dos ", "tres cuatro ", "cinco"]
+    assert time.perf_counter() - start >= 5 / 200
+
+@pytest.mark.asyncio
+async def test_synthetic_error_injection_returns_fallback():
+    adapter = SyntheticAdapter(synthetic_settings(synthetic_error_rate=1.0))
+    response = await adapter.generate([Message(role="user", content="Tiene 2 años")])
+    assert "dificultades técnicas" in response.content
+
+def test_llm_client_is_cached_per_configuration():
+    first = get_llm_client(synthetic_settings())
+    assert get_llm_client(synthetic_settings()) is first
+    assert get_llm_client(synthetic_settings(synthetic_latency_ms=5)) is not first
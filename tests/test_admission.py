@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+from src.core.admission import AdmissionController, ConcurrencyBudget, RedisTokenBucket
+from src.core.exceptions import APIError, OverloadedError, api_exception_handler
+
+@pytest.mark.asyncio
+async def test_budget_queues_then_sheds_when_full():
+    budget = ConcurrencyBudget("test", max_in_flight=1, max_queue=1, queue_timeout=1.0)
+    await budget.acquire()
+    queued = asyncio.create_task(budget.acquire())
+    await asyncio.sleep(0)
+    assert budget.queued == 1
+
+    with pytest.raises(OverloadedError) as exc_info:
+        await budget.acquire()
+    assert exc_info.value.status_code == 503
+    assert int(exc_info.value.headers["Retry-After"]) >= 1
+
+    # Al liberar, el turno pasa al encolado sin superar el límite
+    budget.release(0.5)
+    await queued
+    assert (budget.in_flight, budget.queued) == (1, 0)
+    budget.release(0.5)
+    assert budget.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_budget_rejects_after_queue_timeout():
+    budget = ConcurrencyBudget("test", max_in_flight=1, max_queue=10, queue_timeout=0.01)
+    await budget.acquire()
+    with pytest.raises(OverloadedError) as exc_info:
+        await budget.acquire()
+    assert exc_info.value.details["reason"] == "queue_timeout"
+    assert budget.queued == 0
+    budget.release()
+    assert budget.in_flight == 0
+
+@pytest.mark.asyncio
+async def test_provider_budget_limits_only_configured_providers():
+    controller = AdmissionController(max_in_flight=10, max_queue=0, queue_timeout=1.0, provider_limits={"local": 1})
+    async with controller.admit("local"):
+        with pytest.raises(OverloadedError):
+            async with controller.admit("local"):
+                pass
+        async with controller.admit("gemini"):
+            assert controller.worker.in_flight == 2
+    assert controller.worker.in_flight == 0
+    assert controller.providers["local"].in_flight == 0
+
+@pytest.mark.asyncio
+async def test_redis_token_bucket_is_shared_by_key():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis()
+    bucket = RedisTokenBucket(redis, rate=1.0, burst=2)
+    other_worker = RedisTokenBucket(redis, rate=1.0, burst=2)
+
+    assert await bucket.consume("client:a") == 0
+    assert await other_worker.consume("client:a") == 0
+    assert 0 < await bucket.consume("client:a") <= 1.0
+    assert await bucket.consume("client:b") == 0
+
+def test_overload_response_has_retry_after():
+    app = FastAPI()
+    app.add_exception_handler(APIError, api_exception_handler)
+
+    async def shed():
+        raise OverloadedError(3)
+
+    @app.post("/work", dependencies=[Depends(shed)])
+    async def work():
+        return {}
+
+    response = TestClient(app).post("/work")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert response.json()["error"]["code"] == "SERVICE_OVERLOADED"
@@ -0,0 +1,179 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+import orjson
+import pytest
+from src.core.config import Settings
+from src.models.schemas import Conversation, Message
+from src.providers.adapters.synthetic_adapter import SyntheticAdapter
+from src.cache.versions import VersionStore
+from src.services.chat_session import CLOSE_HEARTBEAT_TIMEOUT, CLOSE_INTERNAL_ERROR, CLOSE_SLOW_CONSUMER, ChatSession
+from src.services.conversation_service import ConversationService, drain_pending_writes
+
+class FakeWebSocket:
+    def __init__(self, block_sends=False):
+        self.app = SimpleNamespace(state=SimpleNamespace())
+        self.headers = {}
+        self.client = None
+        self.incoming = asyncio.Queue()
+        self.events = asyncio.Queue()
+        self.block_sends = block_sends
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send_text(self, text):
+        if self.block_sends:
+            await asyncio.Event().wait()
+        await self.events.put(orjson.loads(text))
+
+    def push(self, event):
+        self.incoming.put_nowait({"type": "websocket.receive", "text": orjson.dumps(event).decode()})
+
+    def disconnect(self):
+        self.incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+
+    async def next(self, kind=None):
+        while True:
+            event = await asyncio.wait_for(self.events.get(), 5)
+            if kind is None or event["type"] == kind:
+                return event
+
+class InMemoryRepository:
+    def __init__(self, conversation):
+        self.conversation = conversation
+        self.loads = 0
+
+    async def get(self, conv_id):
+        self.loads += 1
+        return self.conversation if conv_id == self.conversation.id else None
+
+    async def add_message(self, conv_id, message):
+        self.conversation.messages.append(message)
+        return message
+
+def _session(websocket, repo, versions=None, **overrides):
+    settings = Settings(llm_provider="synthetic", synthetic_seed=1, synthetic_latency_ms=0, _env_file=None, **overrides)
+
+    @asynccontextmanager
+    async def repo_scope():
+        yield repo
+
+    service = ConversationService(None, SyntheticAdapter(settings), repo_scope=repo_scope, versions=versions)
+    return ChatSession(websocket, repo.conversation.id, service, settings)
+
+@pytest.mark.asyncio
+async def test_turn_streams_persists_and_resumes_from_cursor():
+    first = Message(id=uuid4(), role="user", content="Mi hijo de 3 años tiene fiebre", timestamp=datetime.utcnow() - timedelta(minutes=1))
+    repo = InMemoryRepository(Conversation(id=uuid4(), messages=[first]))
+    websocket = FakeWebSocket()
+    session = _session(websocket, repo)
+    running = asyncio.create_task(session.run())
+
+    ready = await websocket.next()
+    assert ready == {"type": "ready", "conversation_id": str(repo.conversation.id), "last_message_id": str(first.id), "resync": False}
+    assert (await websocket.next())["message"]["id"] == str(first.id)
+    assert session.context_info["age"] is not None
+
+    websocket.push({"type": "message", "content": "Desde ayer, 38 grados"})
+    echo = (await websocket.next("message"))["message"]
+    assert echo["role"] == "user"
+    delta = await websocket.next()
+    assert delta["type"] == "delta"
+    reply = (await websocket.next("message"))["message"]
+    assert reply["role"] == "assistant" and reply["id"] == delta["message_id"]
+
+    websocket.push({"type": "ping"})
+    assert (await websocket.next("pong")) == {"type": "pong"}
+    websocket.disconnect()
+    await running
+    await drain_pending_writes()
+    assert [str(m.id) for m in repo.conversation.messages] == [str(first.id), echo["id"], reply["id"]]
+
+    # Reconexión: solo lo posterior al cursor
+    websocket = FakeWebSocket()
+    running = asyncio.create_task(_session(websocket, repo).run(after=repo.conversation.messages[1].id))
+    assert (await websocket.next())["last_message_id"] == reply["id"]
+    assert (await websocket.next())["message"]["id"] == reply["id"]
+    websocket.disconnect()
+    await running
+
+@pytest.mark.asyncio
+async def test_silent_client_is_closed_after_heartbeat_timeout():
+    repo = InMemoryRepository(Conversation(id=uuid4(), messages=[]))
+    websocket = FakeWebSocket()
+    session = _session(websocket, repo, ws_heartbeat_interval_seconds=0.01, ws_heartbeat_timeout_seconds=0.03)
+    await asyncio.wait_for(session.run(), 5)
+    assert (websocket.close_code, session.close_reason) == (CLOSE_HEARTBEAT_TIMEOUT, "heartbeat_timeout")
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_disconnected():
+    repo = InMemoryRepository(Conversation(id=uuid4(), messages=[
+        Message(id=uuid4(), role="user", content=f"mensaje {i}", timestamp=datetime.utcnow()) for i in range(5)
+    ]))
+    websocket = FakeWebSocket(block_sends=True)
+    session = _session(websocket, repo, ws_send_queue_size=1, ws_send_timeout_seconds=0.01)
+    await asyncio.wait_for(session.run(), 5)
+    assert (websocket.close_code, session.close_reason) == (CLOSE_SLOW_CONSUMER, "slow_consumer")
+
+@pytest.mark.asyncio
+async def test_load_failure_closes_with_internal_error():
+    class BrokenRepository(InMemoryRepository):
+        async def get(self, conv_id):
+            raise RuntimeError("database unavailable")
+
+    websocket = FakeWebSocket()
+    await asyncio.wait_for(_session(websocket, BrokenRepository(Conversation(id=uuid4(), messages=[]))).run(), 5)
+    assert websocket.close_code == CLOSE_INTERNAL_ERROR
+
+@pytest.mark.asyncio
+async def test_history_is_reloaded_after_writes_from_other_requests():
+    fakeredis = pytest.importorskip("fakeredis")
+    versions = VersionStore(fakeredis.FakeAsyncRedis())
+    repo = InMemoryRepository(Conversation(id=uuid4(), messages=[]))
+    websocket = FakeWebSocket()
+    session = _session(websocket, repo, versions=versions)
+    running = asyncio.create_task(session.run())
+    await websocket.next("ready")
+
+    # Los turnos propios no provocan recargas
+    for content in ("Hola", "Tengo tos"):
+        websocket.push({"type": "message", "content": content})
+        await websocket.next("message")
+        await websocket.next("message")
+        while session._unsaved:
+            await asyncio.sleep(0.01)
+    # Ni un lote de varios mensajes (aquí, dos encolados a la vez)
+    session._append(Message(role="user", content="Uno"))
+    session._append(Message(role="assistant", content="Dos"))
+    while session._unsaved:
+        await asyncio.sleep(0.01)
+    websocket.push({"type": "message", "content": "Tres"})
+    await websocket.next("message")
+    await websocket.next("message")
+    while session._unsaved:
+        await asyncio.sleep(0.01)
+    assert repo.loads == 1
+
+    # Un mensaje guardado por HTTP llega al cliente y al contexto del turno siguiente
+    external = Message(id=uuid4(), role="user", content="Mensaje por HTTP", timestamp=datetime.utcnow())
+    repo.conversation.messages.append(external)
+    await versions.touch([repo.conversation.id])
+    websocket.push({"type": "message", "content": "Sigo con tos"})
+    assert (await websocket.next("message"))["message"]["id"] == str(external.id)
+    assert (await websocket.next("message"))["message"]["content"] == "Sigo con tos"
+    assert repo.loads == 2
+    assert external.id in [m.id for m in session.messages]
+
+    websocket.disconnect()
+    await running
+    await drain_pending_writes()
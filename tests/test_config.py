@@ -1,6 +1,9 @@
+import asyncio
 import pytest
 import os
-from src.core.config import Settings, get_settings
+import pydantic
+from src.core.config import Settings, SettingsManager, SettingsSnapshot, SettingsWatcher, get_settings
+from src.providers.factory import LLMFactory
 
 def test_default_settings():
     # Test configuración por defecto
@@ -26,4 +29,101 @@ def test_get_settings_caching():
     # Test que get_settings usa caché
     settings1 = get_settings()
     settings2 = get_settings()
-    assert settings1 is settings2  # Debe ser la misma instancia 
\ No newline at end of file
+    assert settings1 is settings2  # Debe ser la misma instancia
+
+def _manager(env_file):
+    return SettingsManager(loader=lambda: SettingsSnapshot(_env_file=str(env_file)))
+
+def test_snapshot_is_immutable(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("llm_provider=synthetic\n")
+    with pytest.raises(pydantic.ValidationError):
+        _manager(env_file).current.llm_temperature = 0.1
+
+def test_reload_swaps_snapshot_and_notifies(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=0.7\n")
+    manager = _manager(env_file)
+    notified = []
+    manager.subscribe(lambda old, new, changed: notified.append((old.llm_temperature, new.llm_temperature, changed)))
+    first = manager.current
+
+    assert manager.reload() == set()
+    assert manager.current is first and manager.version == 1
+
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=0.2\n")
+    assert manager.reload() == {"llm_temperature"}
+    assert manager.current.llm_temperature == 0.2
+    assert manager.version == 2
+    assert notified == [(0.7, 0.2, {"llm_temperature"})]
+
+    # Una configuración inválida no sustituye a la vigente
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=5\n")
+    with pytest.raises(ValueError):
+        manager.reload()
+    assert manager.current.llm_temperature == 0.2
+
+def test_factory_keeps_adapter_for_generation_changes(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=0.7\n")
+    manager = _manager(env_file)
+    factory = LLMFactory()
+    manager.subscribe(factory.on_settings_changed)
+    adapter = factory.current_adapter(manager.current)
+    assert factory.current_adapter(manager.current) is adapter
+
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=0.2\n")
+    manager.reload()
+    assert factory.current_adapter(manager.current) is adapter
+    assert adapter.settings.llm_temperature == 0.2
+
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=0.2\nsynthetic_seed=7\n")
+    manager.reload()
+    assert factory.current_adapter(manager.current) is not adapter
+
+def test_watcher_reloads_when_env_file_changes(tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text("llm_provider=synthetic\n")
+    manager = _manager(env_file)
+    watcher = SettingsWatcher(manager, path=str(env_file))
+    assert watcher.run_once() == set()
+
+    env_file.write_text("llm_provider=synthetic\nllm_max_tokens=256\n")
+    os.utime(env_file, (env_file.stat().st_atime, env_file.stat().st_mtime + 1))
+    assert watcher.run_once() == {"llm_max_tokens"}
+    assert manager.current.llm_max_tokens == 256
+
+@pytest.mark.asyncio
+async def test_reload_is_broadcast_to_every_worker(tmp_path):
+    fakeredis = pytest.importorskip("fakeredis")
+    from src.cache.settings_reload import SettingsReloadSubscriber
+
+    env_file = tmp_path / ".env"
+    env_file.write_text("llm_provider=synthetic\nllm_temperature=0.7\n")
+    redis = fakeredis.FakeAsyncRedis()
+    managers = [_manager(env_file), _manager(env_file)]
+    subscribers = [SettingsReloadSubscriber(redis, manager, ack_timeout=2.0) for manager in managers]
+    for subscriber in subscribers:
+        subscriber.start()
+    try:
+        while not all(subscriber.active for subscriber in subscribers):
+            await asyncio.sleep(0.01)
+
+        env_file.write_text("llm_provider=synthetic\nllm_temperature=0.2\n")
+        result = await subscribers[0].broadcast()
+        assert result.workers == 2 and result.missing == 0
+        assert len(result.applied) == 2
+        assert [manager.current.llm_temperature for manager in managers] == [0.2, 0.2]
+
+        # Una configuración inválida se rechaza en todos los workers
+        env_file.write_text("llm_provider=synthetic\nllm_temperature=5\n")
+        result = await subscribers[1].broadcast()
+        assert len(result.failed) == 2
+        assert [manager.current.llm_temperature for manager in managers] == [0.2, 0.2]
+    finally:
+        for subscriber in subscribers:
+            await subscriber.stop()
+
+def test_local_model_path_accepts_the_docker_variable_name(monkeypatch):
+    monkeypatch.setenv("LOCAL_MODEL_PATH", "/models/olmo")
+    assert Settings(_env_file=None).local_model_path == "/models/olmo"
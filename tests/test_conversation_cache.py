@@ -0,0 +1,153 @@
+import asyncio
+from uuid import uuid4
+import pytest
+from src.cache.conversations import (
+    WORKER_ID, CachedConversationRepository, ConversationCache, ConversationCacheSubscriber
+)
+from src.cache.versions import VersionStore
+from src.core.config import Settings
+from src.db.redis_repository import RedisConversationRepository
+from src.models.schemas import Conversation, Message, MessageCreate
+from src.providers.adapters.synthetic_adapter import SyntheticAdapter
+from src.services.conversation_service import ConversationService
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class CountingRepository(RedisConversationRepository):
+    gets = 0
+
+    async def get(self, conversation_id):
+        self.gets += 1
+        return await super().get(conversation_id)
+
+def _put(cache, conv):
+    cache.put(conv.id, conv.created_at, conv.messages)
+
+def _conversation(messages=2, content="x"):
+    return Conversation(id=uuid4(), messages=[Message(id=uuid4(), role="user", content=content) for _ in range(messages)])
+
+def test_lru_evicts_by_entries_memory_and_ttl():
+    now = [0.0]
+    cache = ConversationCache(max_entries=2, max_bytes=20_000, ttl=10, clock=lambda: now[0])
+    cache.active = True
+    first, second, third = _conversation(), _conversation(), _conversation()
+    for conv in (first, second):
+        _put(cache, conv)
+    assert cache.get(first.id) is not None
+    _put(cache, third)
+    assert cache.get(second.id) is None  # la menos reciente
+    assert cache.get(first.id) is not None
+
+    _put(cache, _conversation(1, "x" * 17_000))
+    assert len(cache) == 1 and cache.bytes <= cache.max_bytes
+    huge = _conversation(1, "x" * 30_000)
+    _put(cache, huge)
+    assert cache.get(huge.id) is None
+
+    _put(cache, first)
+    now[0] = 11
+    assert cache.get(first.id) is None
+
+@pytest.mark.asyncio
+async def test_turns_are_served_from_memory():
+    redis = fakeredis.FakeAsyncRedis()
+    cache = ConversationCache()
+    cache.active = True
+    inner = CountingRepository(redis)
+    llm = SyntheticAdapter(Settings(llm_provider="synthetic", synthetic_seed=1, _env_file=None))
+    service = ConversationService(CachedConversationRepository(inner, cache), llm)
+
+    conv = await service.create_conversation()
+    await service.handle_message(conv.id, MessageCreate(content="Mi hijo de 3 años tiene fiebre"))
+    await service.handle_message(conv.id, MessageCreate(content="Desde ayer"))
+    assert inner.gets == 0
+
+    stored = [(m.id, m.content) for m in (await inner.get(conv.id)).messages]
+    cached = await service.repo.get(conv.id)
+    assert [(m.id, m.content) for m in cached.messages] == stored
+    assert await service.repo.history_rows(conv.id) == await inner.history_rows(conv.id)
+    assert cache.context_info(conv.id, llm.update_context_info) == llm._analyze_context(cached.messages)
+    await redis.aclose()
+
+@pytest.mark.asyncio
+async def test_version_bumps_invalidate_other_workers():
+    redis = fakeredis.FakeAsyncRedis()
+    cache = ConversationCache()
+    subscriber = ConversationCacheSubscriber(redis, cache)
+    subscriber.start()
+    versions = VersionStore(redis)
+
+    async def settle():
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+
+    try:
+        while not cache.active:
+            await asyncio.sleep(0.01)
+        kept, changed = _conversation(), _conversation()
+        _put(cache, kept)
+        _put(cache, changed)
+
+        await versions.touch([kept.id], origin=WORKER_ID)
+        await versions.touch([changed.id], origin="otro-worker")
+        await settle()
+        assert cache.get(kept.id) is not None
+        assert cache.get(changed.id) is None
+
+        await versions.invalidate_all()
+        await settle()
+        assert len(cache) == 0
+    finally:
+        await subscriber.stop()
+        await redis.aclose()
+
+@pytest.mark.asyncio
+async def test_invalidation_during_load_is_not_overwritten():
+    redis = fakeredis.FakeAsyncRedis()
+    cache = ConversationCache()
+    cache.active = True
+
+    class RacingRepository(RedisConversationRepository):
+        async def get(self, conversation_id):
+            conversation = await super().get(conversation_id)
+            # Otro worker escribe mientras se carga
+            cache.invalidate([conversation_id])
+            return conversation
+
+    repo = CachedConversationRepository(RacingRepository(redis), cache)
+    conv = await RedisConversationRepository(redis).create(Conversation(id=uuid4()))
+    assert await repo.get(conv.id) is not None
+    assert cache.get(conv.id) is None
+
+    cache.clear()
+    repo = CachedConversationRepository(RedisConversationRepository(redis), cache)
+    assert await repo.get(conv.id) is not None
+    assert cache.get(conv.id) is not None
+    await redis.aclose()
+
+@pytest.mark.asyncio
+async def test_own_write_during_load_is_not_overwritten():
+    redis = fakeredis.FakeAsyncRedis()
+    cache = ConversationCache()
+    cache.active = True
+    conv = await RedisConversationRepository(redis).create(Conversation(id=uuid4()))
+    loaded, resume = asyncio.Event(), asyncio.Event()
+
+    class SlowRepository(RedisConversationRepository):
+        async def get(self, conversation_id):
+            conversation = await super().get(conversation_id)
+            loaded.set()
+            await resume.wait()
+            return conversation
+
+    reader = asyncio.create_task(CachedConversationRepository(SlowRepository(redis), cache).get(conv.id))
+    await loaded.wait()
+    # Escritura en el mismo worker, sin entrada en caché, mientras la otra carga sigue en curso
+    writer = CachedConversationRepository(RedisConversationRepository(redis), cache)
+    await writer.add_message(conv.id, Message(role="user", content="Hola"))
+    resume.set()
+    await reader
+
+    cached = await writer.get(conv.id)
+    assert [m.content for m in cached.messages] == ["Hola"]
+    await redis.aclose()
@@ -0,0 +1,49 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.models.schemas import Base, Conversation, Message
+from src.services.export_service import build_export_query, export_messages
+
+START = datetime(2024, 3, 1)
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'export.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as session:
+        for i, provider in enumerate(["gemini", "openai", "gemini"]):
+            ts = START + timedelta(days=i * 40)
+            session.add(Conversation(created_at=ts, messages=[
+                Message(role="user", content=f"hola {i}", timestamp=ts),
+                Message(role="assistant", content=f"respuesta {i}", timestamp=ts + timedelta(seconds=1), provider=provider),
+            ]))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+async def collect(factory, fmt, query, chunk_size=2):
+    return b"".join([data async for data in export_messages(factory, fmt, query, chunk_size)])
+
+@pytest.mark.asyncio
+async def test_ndjson_export_filters_by_provider_and_date(session_factory):
+    query = build_export_query(start=START, end=START + timedelta(days=60), provider="gemini")
+    rows = [json.loads(line) for line in (await collect(session_factory, "ndjson", query)).splitlines()]
+    assert [r["content"] for r in rows] == ["hola 0", "respuesta 0"]
+    assert rows[1]["provider"] == "gemini"
+
+    rows = (await collect(session_factory, "ndjson", build_export_query())).splitlines()
+    assert len(rows) == 6
+
+@pytest.mark.asyncio
+async def test_parquet_export_writes_row_groups(session_factory):
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+    data = await collect(session_factory, "parquet", build_export_query())
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_rows == 6
+    assert parquet.metadata.num_row_groups == 3
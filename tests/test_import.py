@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.models.schemas import Base, Conversation, Message
+from src.services.import_service import BulkImporter, Checkpoint, ImportBusyError, ImportJob, read_import_status
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'import.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+def write_ndjson(path, conversations=3, turns=2):
+    start = datetime(2023, 1, 1)
+    lines = []
+    for c in range(conversations):
+        conv_id = str(uuid4())
+        # Mensajes en orden inverso: created_at debe quedar en el más antiguo
+        for t in reversed(range(turns)):
+            lines.append(json.dumps({
+                "conversation_id": conv_id,
+                "role": "user" if t % 2 == 0 else "assistant",
+                "content": f"mensaje {c}-{t}",
+                "timestamp": (start + timedelta(days=c, minutes=t)).isoformat() + "Z",
+            }))
+    lines.insert(3, '{"conversation_id": "no-es-un-uuid", "content": "x"}')
+    path.write_text("\n".join(lines) + "\n")
+
+async def count(factory, model):
+    async with factory() as session:
+        return (await session.execute(select(func.count()).select_from(model))).scalar_one()
+
+@pytest.mark.asyncio
+async def test_import_validates_in_batches_and_resumes(session_factory, tmp_path):
+    source = tmp_path / "legacy.ndjson"
+    write_ndjson(source)
+    checkpoint = str(tmp_path / "legacy.ckpt")
+
+    stats = await BulkImporter(session_factory, chunk_size=2, workers=2, checkpoint_path=checkpoint).import_file(str(source))
+    assert (stats.rows, stats.rejected, stats.chunks) == (6, 1, 4)
+    assert stats.errors[0]["line"] == 4
+    assert await count(session_factory, Message) == 6
+    assert await count(session_factory, Conversation) == 3
+
+    resumed = await BulkImporter(session_factory, chunk_size=2, workers=2, checkpoint_path=checkpoint).import_file(str(source))
+    assert resumed.skipped_chunks == 4 and resumed.chunks == 0
+
+    # Sin checkpoint, reimportar tampoco duplica filas
+    await BulkImporter(session_factory, chunk_size=3, workers=3).import_file(str(source))
+    assert await count(session_factory, Message) == 6
+
+    async with session_factory() as session:
+        for conv in (await session.execute(select(Conversation))).scalars():
+            earliest = (await session.execute(
+                select(func.min(Message.timestamp)).where(Message.conversation_id == conv.id)
+            )).scalar_one()
+            assert conv.created_at == earliest
+
+def test_checkpoint_rejects_a_different_file(tmp_path):
+    source = tmp_path / "a.ndjson"
+    write_ndjson(source)
+    checkpoint = tmp_path / "a.ckpt"
+    checkpoint.write_text(json.dumps({"identity": {"source": "otro"}, "done": [], "rows": 0, "rejected": 0}))
+    with pytest.raises(ValueError):
+        Checkpoint(str(checkpoint), str(source), 2)
+
+@pytest.mark.asyncio
+async def test_import_job_runs_in_background(session_factory, tmp_path):
+    source = tmp_path / "legacy.ndjson"
+    write_ndjson(source)
+    work_dir = str(tmp_path / "imports")
+
+    async def upload():
+        yield source.read_bytes()[:50]
+        yield source.read_bytes()[50:]
+
+    job = ImportJob(work_dir, "legacy")
+    job.acquire()
+    with pytest.raises(ImportBusyError):
+        ImportJob(work_dir, "legacy").acquire()
+    await job.receive(upload())
+    finished = []
+
+    async def on_finish():
+        finished.append(True)
+
+    task = job.start(BulkImporter(session_factory, chunk_size=2, checkpoint_path=job.checkpoint_path), on_finish)
+    assert read_import_status(work_dir, "legacy")["status"] == "running"
+    await task
+
+    status = read_import_status(work_dir, "legacy")
+    assert (status["status"], status["rows"], status["rejected"]) == ("completed", 6, 1)
+    assert finished == [True]
+    # Terminada, el ID queda libre para otra importación
+    ImportJob(work_dir, "legacy").acquire()
@@ -0,0 +1,103 @@
+import asyncio
+from dataclasses import dataclass
+import httpx
+import pytest
+from src.core.exceptions import OverloadedError
+from src.providers.adapters.base_adapter import ProviderResult
+from src.providers.local_inference import (
+    InferenceBatcher, LocalInferenceClient, QueueFullError, create_server_app
+)
+
+@dataclass(frozen=True)
+class Params:
+    max_new_tokens: int = 300
+    temperature: float = 0.7
+    top_p: float = 0.9
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def generate_batch(self, prompts, params):
+        self.batches.append((list(prompts), params))
+        return [ProviderResult(f"{p}!", prompt_tokens=len(p), completion_tokens=1) for p in prompts]
+
+@pytest.mark.asyncio
+async def test_batches_group_prompts_by_sampling_params():
+    model = FakeModel()
+    batcher = InferenceBatcher(model.generate_batch, max_batch=4, batch_wait=0.05)
+    batcher.start()
+    try:
+        cold, warm = Params(temperature=0.2), Params()
+        results = await asyncio.gather(
+            batcher.submit("a", warm), batcher.submit("b", cold), batcher.submit("c", warm),
+            batcher.submit("d", warm), batcher.submit("e", warm)
+        )
+    finally:
+        await batcher.stop()
+
+    assert [r.text for r in results] == ["a!", "b!", "c!", "d!", "e!"]
+    assert model.batches == [(["a", "c", "d"], warm), (["b"], cold), (["e"], warm)]
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected():
+    batcher = InferenceBatcher(FakeModel().generate_batch, queue_size=1)
+    waiting = asyncio.create_task(batcher.submit("a", Params()))
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFullError):
+        await batcher.submit("b", Params())
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+@pytest.mark.asyncio
+async def test_client_talks_to_server_app():
+    model = FakeModel()
+    batcher = InferenceBatcher(model.generate_batch, queue_size=1)
+    app = create_server_app(batcher, "fake-model", Params)
+    client = LocalInferenceClient("unix:///tmp/unused.sock", transport=httpx.ASGITransport(app=app))
+    try:
+        # Sin el batcher en marcha la petición queda en cola y la siguiente no cabe
+        pending = asyncio.create_task(client.generate("hola", max_new_tokens=10, temperature=0.5, top_p=0.9))
+        while batcher.queue_depth == 0:
+            await asyncio.sleep(0.01)
+        with pytest.raises(OverloadedError):
+            await client.generate("adiós", max_new_tokens=10, temperature=0.5, top_p=0.9)
+        assert await client.health() == {"model": "fake-model", "queue_depth": 1}
+
+        batcher.start()
+        result = await pending
+        assert (result.text, result.prompt_tokens, result.completion_tokens) == ("hola!", 4, 1)
+        assert model.batches == [(["hola"], Params(max_new_tokens=10, temperature=0.5))]
+    finally:
+        await batcher.stop()
+        await client.aclose()
+
+@pytest.mark.asyncio
+async def test_client_restarts_unreachable_server_and_retries():
+    app = create_server_app(InferenceBatcher(FakeModel().generate_batch), "fake-model", Params)
+    server = httpx.ASGITransport(app=app)
+    state = {"up": False, "starts": 0}
+
+    class FlakyTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if not state["up"]:
+                raise httpx.ConnectError("socket not found", request=request)
+            return await server.handle_async_request(request)
+
+    async def starter():
+        state["starts"] += 1
+        state["up"] = True
+
+    client = LocalInferenceClient("unix:///tmp/unused.sock", transport=FlakyTransport(), starter=starter)
+    async with app.router.lifespan_context(app):
+        result = await client.generate("hola", max_new_tokens=10, temperature=0.5, top_p=0.9)
+    await client.aclose()
+    assert result.text == "hola!" and state["starts"] == 1
+
+    # Sin starter el error de conexión se propaga
+    state["up"] = False
+    client = LocalInferenceClient("unix:///tmp/unused.sock", transport=FlakyTransport())
+    with pytest.raises(httpx.ConnectError):
+        await client.generate("hola", max_new_tokens=10, temperature=0.5, top_p=0.9)
+    await client.aclose()
@@ -0,0 +1,36 @@
+import pytest
+from src.core import memory
+from src.core.config import get_settings_manager
+from src.models.schemas import Conversation
+
+@pytest.fixture
+def tracing():
+    memory.start_tracing()
+    yield
+    memory.stop_tracing()
+
+def test_snapshot_diff_groups_by_module(tracing):
+    base = memory.take_snapshot()
+    retained = [Conversation() for _ in range(2000)]
+    current = memory.take_snapshot()
+
+    top = memory.top_allocations(current, "module", limit=50)
+    assert all({"module", "size", "count"} <= set(row) for row in top)
+
+    diff = memory.diff_snapshots(current, base, "module", limit=50)
+    assert diff[0]["size_diff"] > 0
+    assert len(retained) == 2000
+
+def test_snapshot_requires_tracemalloc():
+    memory.stop_tracing()
+    with pytest.raises(RuntimeError):
+        memory.take_snapshot()
+
+def test_memory_summary_endpoint(client, monkeypatch):
+    manager = get_settings_manager()
+    monkeypatch.setattr(manager, "_current", manager.current.model_copy(update={"admin_token": "secret"}))
+    response = client.get("/admin/memory", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    body = response.json()
+    assert {"rss_bytes", "tracemalloc", "orm", "adapters"} <= set(body)
+    assert "identity_map_objects" in body["orm"]
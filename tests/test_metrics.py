@@ -0,0 +1,72 @@
+import pytest
+from src.core.config import Settings
+from src.models.schemas import Message
+from src.providers.adapters.synthetic_adapter import SyntheticAdapter
+
+prometheus_client = pytest.importorskip("prometheus_client")
+REGISTRY = prometheus_client.REGISTRY
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def synthetic_adapter(**overrides):
+    return SyntheticAdapter(Settings(llm_provider="synthetic", synthetic_seed=1, _env_file=None, **overrides))
+
+@pytest.mark.asyncio
+async def test_generate_records_every_stage():
+    labels = dict(provider="synthetic", model="synthetic", phase="discovery")
+    before = sample("docochat_generation_stage_seconds_count", stage="provider_call", **labels)
+
+    await synthetic_adapter().generate([Message(role="user", content="Mi hijo tiene tos")])
+
+    for stage in ("safety_check", "context_analysis", "phase_detection", "prompt_generation",
+                  "formatting", "provider_call", "post_processing"):
+        assert sample("docochat_generation_stage_seconds_count", stage=stage, **labels) >= 1
+    assert sample("docochat_generation_stage_seconds_count", stage="provider_call", **labels) == before + 1
+
+@pytest.mark.asyncio
+async def test_safety_and_fallback_counters():
+    safety_before = sample("docochat_safety_short_circuits_total", provider="synthetic")
+    fallback_before = sample("docochat_fallback_responses_total", provider="synthetic", model="synthetic")
+
+    await synthetic_adapter().generate([Message(role="user", content="Tiene convulsión")])
+    await synthetic_adapter(synthetic_error_rate=1.0).generate([Message(role="user", content="Hola")])
+
+    assert sample("docochat_safety_short_circuits_total", provider="synthetic") == safety_before + 1
+    assert sample("docochat_fallback_responses_total", provider="synthetic", model="synthetic") == fallback_before + 1
+
+def test_metrics_endpoint(client):
+    client.get("/health")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'docochat_http_request_seconds_count{method="GET",route="/health",status="200"}' in response.text
+
+@pytest.mark.asyncio
+async def test_pool_wait_and_connection_gauges(tmp_path):
+    from sqlalchemy import text
+    from src.db import session as db_session
+
+    before = sample("docochat_db_pool_wait_seconds_count")
+    await db_session.init_db(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", create_tables=False)
+    try:
+        async with db_session.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert sample("docochat_db_pool_connections", state="in_use") == 1
+        assert sample("docochat_db_pool_connections", state="in_use") == 0
+        assert sample("docochat_db_pool_wait_seconds_count") == before + 1
+    finally:
+        await db_session.close_db()
+
+@pytest.mark.asyncio
+async def test_pool_warm_up_is_capped_at_pool_capacity(tmp_path):
+    import asyncio
+    from src.db import session as db_session
+
+    await db_session.init_db(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", create_tables=False)
+    try:
+        capacity = db_session.engine.pool.size() + db_session.engine.pool._max_overflow
+        # Sin el tope, la barrera esperaría a checkouts que el pool nunca concede
+        await asyncio.wait_for(db_session.warm_up_pool(capacity + 5), 5)
+        assert db_session.engine.pool.checkedin() == db_session.engine.pool.size()
+    finally:
+        await db_session.close_db()
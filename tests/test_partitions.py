@@ -0,0 +1,77 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateTable
+from src.db.partitions import Partition, add_months, parse_partition_name, partition_name
+from src.models.schemas import Base, Conversation, Message
+from src.repositories.conversation_repository import ConversationRepository
+
+def test_monthly_partition_bounds():
+    partition = Partition.for_month(date(2024, 12, 15))
+    assert partition == Partition("messages_2024_12", date(2024, 12, 1), date(2025, 1, 1))
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert parse_partition_name(partition_name(date(2025, 3, 1))) == date(2025, 3, 1)
+    with pytest.raises(ValueError):
+        parse_partition_name("messages; DROP TABLE messages")
+
+def test_messages_table_is_range_partitioned_on_postgres():
+    ddl = str(CreateTable(Message.__table__).compile(dialect=postgresql.dialect()))
+    assert "PARTITION BY RANGE (timestamp)" in ddl
+    assert "PRIMARY KEY (id, timestamp)" in ddl
+
+@pytest.mark.asyncio
+async def test_get_bounds_message_query_by_conversation_start(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'messages.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    created_at = datetime(2024, 5, 10)
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        conv = Conversation(created_at=created_at, messages=[
+            Message(role="assistant", content="segundo", timestamp=created_at + timedelta(minutes=1)),
+            Message(role="user", content="primero", timestamp=created_at),
+        ])
+        session.add(conv)
+        await session.commit()
+        session.expunge_all()
+
+        statements.clear()
+        loaded = await ConversationRepository(session).get(conv.id)
+
+    assert [m.content for m in loaded.messages] == ["primero", "segundo"]
+    assert "messages.timestamp >=" in statements[-1]
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_migrate_upgrades_a_previous_schema(tmp_path):
+    from sqlalchemy import text
+    from src.db.migrate import migrate
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    async with engine.begin() as conn:
+        # Esquema anterior: sin created_at/anonymized_at ni las columnas de proveedor y consumo
+        await conn.execute(text("CREATE TABLE conversations (id CHAR(32) PRIMARY KEY)"))
+        await conn.execute(text(
+            "CREATE TABLE messages (id CHAR(32) PRIMARY KEY, role VARCHAR, content VARCHAR, "
+            "timestamp DATETIME, conversation_id CHAR(32) REFERENCES conversations (id))"
+        ))
+        await conn.execute(text("INSERT INTO conversations (id) VALUES ('c1'), ('c2')"))
+        await conn.execute(text(
+            "INSERT INTO messages VALUES ('m1', 'user', 'hola', '2024-05-10 10:00:00.000000', 'c1')"
+        ))
+
+    applied = await migrate(engine)
+    assert any("conversations.created_at" in step and "messages.prompt_tokens" in step for step in applied)
+    async with engine.connect() as conn:
+        created = dict((await conn.execute(text("SELECT id, created_at FROM conversations"))).all())
+        assert created["c1"].startswith("2024-05-10") and created["c2"] is not None
+        await conn.execute(text("SELECT provider, model, phase, queue_ms FROM messages"))
+        await conn.execute(text("SELECT anonymized_at FROM conversations"))
+
+    assert await migrate(engine) == []
+    await engine.dispose()
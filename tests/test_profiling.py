@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from src.core import profiling
+from src.core.config import get_settings_manager
+from src.main import app
+
+def busy_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+def test_sampling_profiler_exports_collapsed_and_speedscope():
+    worker = threading.Thread(target=busy_work, args=(0.2,), name="busy")
+    profiler = profiling.SamplingProfiler(interval=0.002)
+    profiler.start()
+    worker.start()
+    worker.join()
+    profiler.stop()
+
+    collapsed = profiler.collapsed()
+    assert "thread:busy;" in collapsed
+    assert "busy_work (" in collapsed
+
+    speedscope = profiler.speedscope("test")
+    profile = speedscope["profiles"][0]
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(profile["weights"])
+    assert any(frame["name"] == "busy_work" for frame in speedscope["shared"]["frames"])
+
+def test_admin_endpoints_require_token(client, monkeypatch):
+    response = client.post("/admin/profiling/cpu", params={"seconds": 0.1})
+    assert response.status_code == 403
+
+    manager = get_settings_manager()
+    monkeypatch.setattr(manager, "_current", manager.current.model_copy(update={"admin_token": "secret"}))
+    response = client.post("/admin/profiling/cpu", params={"seconds": 0.1}, headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 401
+
+    response = client.post("/admin/profiling/cpu", params={"seconds": 0.1}, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert int(response.headers["X-Profile-Samples"]) > 0
+
+@pytest.mark.asyncio
+async def test_profile_requests_captures_matching_route():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        capture = asyncio.create_task(profiling.profile_requests(5, 0.001, route="/health", max_requests=1))
+        while profiling._capture is None:
+            await asyncio.sleep(0.001)
+        await client.get("/metrics")
+        await client.get("/health")
+        profiler, matched = await capture
+
+    assert matched == 1
+    assert profiling._capture is None
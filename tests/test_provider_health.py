@@ -0,0 +1,50 @@
+import pytest
+from fastapi.testclient import TestClient
+from src.core.config import Settings
+from src.providers import health
+from src.providers.health import ProviderHealthMonitor
+from src.providers.adapters.synthetic_adapter import SyntheticAdapter
+
+def synthetic_settings(**overrides):
+    return Settings(llm_provider="synthetic", synthetic_seed=1, gemini_api_key=None, openai_api_key=None,
+                    deepseek_api_key=None, _env_file=None, **overrides)
+
+@pytest.mark.asyncio
+async def test_monitor_caches_probe_results(monkeypatch):
+    monitor = ProviderHealthMonitor(settings_provider=synthetic_settings, unhealthy_after=2)
+    await monitor.run_once()
+    await monitor.run_once()
+
+    statuses = {s.name: s for s in monitor.snapshot()}
+    assert statuses["synthetic"].status == "healthy"
+    assert statuses["synthetic"].latency_stats()["p50"] >= 0
+    assert len(statuses["synthetic"].latencies_ms) == 2
+    assert statuses["openai"].status == "not_configured"
+    assert statuses["local"].status == "not_probed"
+
+    async def unreachable(self):
+        raise ConnectionError("provider unreachable")
+
+    monkeypatch.setattr(SyntheticAdapter, "probe", unreachable)
+    await monitor.run_once()
+    assert monitor.status("synthetic").status == "healthy"
+    await monitor.run_once()
+    assert monitor.status("synthetic").status == "unhealthy"
+    assert monitor.status("synthetic").last_error == "provider unreachable"
+
+def test_health_endpoint_answers_from_cache(monkeypatch):
+    from src.main import app
+    monitor = ProviderHealthMonitor(settings_provider=synthetic_settings)
+    monkeypatch.setattr(health, "_monitor", monitor)
+    monkeypatch.setattr("src.api.v1.providers.get_settings", synthetic_settings)
+    client = TestClient(app)
+
+    # Sin sondeo todavía: no se llama al proveedor, se informa como no disponible
+    assert client.get("/providers/health").status_code == 503
+
+    monitor.status("synthetic").status = "healthy"
+    response = client.get("/providers/health")
+    assert response.status_code == 200
+    assert response.json()["provider"] == "synthetic"
+    listing = client.get("/providers").json()
+    assert {p["name"]: p["status"] for p in listing["providers"]}["synthetic"] == "healthy"
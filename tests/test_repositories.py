@@ -1,9 +1,14 @@
+import asyncio
 import pytest
 from uuid import UUID, uuid4
 from datetime import datetime
 from sqlalchemy import select
 from src.repositories.conversation_repository import ConversationRepository
 from src.models.schemas import Conversation, Message
+from src.core.config import Settings
+from src.core.exceptions import DatabaseTimeoutError
+from src.db.session import engine_options
+from src.db.timeouts import set_request_deadline
 
 class MockResult:
     def __init__(self, data):
@@ -58,4 +63,48 @@ def mock_session():
 def conversation_repo(mock_session):
     return ConversationRepository(mock_session)
 
-# Los tests fueron eliminados debido a errores de implementación del repositorio 
\ No newline at end of file
+# Los tests fueron eliminados debido a errores de implementación del repositorio 
+@pytest.mark.asyncio
+async def test_exhausted_request_budget_raises_database_timeout(conversation_repo, mock_session):
+    mock_session.info = {}
+    set_request_deadline(mock_session, 1)
+    await asyncio.sleep(0.01)
+    with pytest.raises(DatabaseTimeoutError) as exc_info:
+        await conversation_repo.list_all()
+    assert exc_info.value.details == {"reason": "request"}
+
+def test_engine_options_for_pgbouncer():
+    settings = Settings(_env_file=None, db_pool_size=20, db_statement_timeout_ms=500, db_pgbouncer_mode=True)
+    options = engine_options("postgresql+asyncpg://u:p@pgbouncer:6432/docochat", settings)
+    assert options["pool_size"] == 20
+    connect_args = options["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    assert "server_settings" not in connect_args
+    assert engine_options("sqlite+aiosqlite://", settings) == {"future": True}
+
+@pytest.mark.asyncio
+async def test_add_message_does_not_load_the_history(tmp_path):
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.models.schemas import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'repo.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        repo = ConversationRepository(session)
+        conv = await repo.create(Conversation(id=uuid4()))
+
+        async def no_history(conversation_id):
+            raise AssertionError("add_message must not load the conversation")
+
+        repo.get = no_history
+        message = await repo.add_message(conv.id, Message(role="user", content="Hola"))
+        assert message.id is not None and message.conversation_id == conv.id
+        with pytest.raises(KeyError):
+            await repo.add_message(uuid4(), Message(role="user", content="Hola"))
+
+        del repo.get
+        assert [m.id for m in (await repo.get(conv.id)).messages] == [message.id]
+    await engine.dispose()
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.models.schemas import Base, Conversation, Message
+from src.services.retention_service import ANONYMIZED_CONTENT, RetentionWorker
+
+NOW = datetime(2025, 6, 1)
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'retention.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with factory() as session:
+        # 5 conversaciones viejas, una vieja con actividad reciente y una nueva
+        for i in range(5):
+            started = NOW - timedelta(days=100 + i)
+            session.add(Conversation(created_at=started, messages=[
+                Message(role="user", content="hola", timestamp=started),
+                Message(role="assistant", content="respuesta", timestamp=started + timedelta(minutes=1)),
+            ]))
+        session.add(Conversation(created_at=NOW - timedelta(days=100), messages=[
+            Message(role="user", content="sigo aquí", timestamp=NOW - timedelta(days=1)),
+        ]))
+        session.add(Conversation(created_at=NOW - timedelta(days=2), messages=[
+            Message(role="user", content="nueva", timestamp=NOW - timedelta(days=2)),
+        ]))
+        await session.commit()
+    yield factory
+    await engine.dispose()
+
+async def _count(factory, query):
+    async with factory() as session:
+        return (await session.execute(query)).scalar_one()
+
+@pytest.mark.asyncio
+async def test_dry_run_counts_without_changes(session_factory):
+    worker = RetentionWorker(session_factory, retention_days=30, batch_size=2)
+    result = await worker.run_once(now=NOW, dry_run=True)
+
+    assert (result.conversations, result.messages, result.batches) == (5, 10, 0)
+    assert await _count(session_factory, select(func.count()).select_from(Conversation)) == 7
+
+@pytest.mark.asyncio
+async def test_delete_in_batches_keeps_active_conversations(session_factory):
+    worker = RetentionWorker(session_factory, retention_days=30, batch_size=2, max_load=1.0)
+    result = await worker.run_once(now=NOW)
+
+    assert (result.conversations, result.messages, result.batches) == (5, 10, 3)
+    assert await _count(session_factory, select(func.count()).select_from(Conversation)) == 2
+    assert await _count(session_factory, select(func.count()).select_from(Message)) == 2
+    assert (await worker.run_once(now=NOW)).conversations == 0
+
+@pytest.mark.asyncio
+async def test_anonymize_replaces_content_once(session_factory):
+    worker = RetentionWorker(session_factory, retention_days=30, mode="anonymize", batch_size=10)
+    result = await worker.run_once(now=NOW)
+
+    assert (result.conversations, result.messages) == (5, 10)
+    assert await _count(
+        session_factory, select(func.count()).select_from(Message).where(Message.content == ANONYMIZED_CONTENT)
+    ) == 10
+    assert await _count(
+        session_factory, select(func.count()).select_from(Conversation).where(Conversation.anonymized_at.is_not(None))
+    ) == 5
+    assert (await worker.run_once(now=NOW)).conversations == 0
+
+@pytest.mark.asyncio
+async def test_only_one_worker_runs_a_cycle(session_factory):
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis()
+    first = RetentionWorker(session_factory, retention_days=30, batch_size=2, max_load=1.0, redis=redis)
+    second = RetentionWorker(session_factory, retention_days=30, batch_size=2, max_load=1.0, redis=redis)
+
+    assert await first._acquire_lock()
+    assert await second.run_exclusive(now=NOW) is None
+    await first._release_lock()
+
+    result = await second.run_exclusive(now=NOW)
+    assert result.conversations == 5
+    assert await redis.get("retention:lock") is None
+    await redis.aclose()
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+import msgpack
+import orjson
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.core.serialization import (
+    JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, encode, history_payload, listing_payload, negotiate
+)
+from src.db.postgres_repository import PostgresConversationRepository
+from src.db.redis_repository import RedisConversationRepository
+from src.db.tiered_repository import TieredConversationRepository
+from src.models.schemas import Base, Conversation, ConversationListItem, ConversationResponse, Message, MessageResponse
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'serialization.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+def _conversation(count=3):
+    start = datetime(2025, 1, 1, 10, 0, 0, 123456)
+    return Conversation(id=uuid4(), created_at=start, messages=[
+        Message(id=uuid4(), role="user" if i % 2 == 0 else "assistant", content=f"mensaje {i}", timestamp=start + timedelta(seconds=i))
+        for i in range(count)
+    ])
+
+def test_negotiate_prefers_json_unless_msgpack_is_preferred():
+    assert negotiate(None) == JSON_MEDIA_TYPE
+    assert negotiate("*/*") == JSON_MEDIA_TYPE
+    assert negotiate("application/json, application/msgpack;q=0.5") == JSON_MEDIA_TYPE
+    assert negotiate("application/msgpack") == MSGPACK_MEDIA_TYPE
+    assert negotiate("application/x-msgpack, */*;q=0.1") == MSGPACK_MEDIA_TYPE
+
+def test_fast_payloads_match_response_models():
+    conv = _conversation()
+    rows = [(m.id, m.role, m.content, m.timestamp) for m in conv.messages]
+    expected = ConversationResponse(id=conv.id, messages=[MessageResponse.model_validate(m) for m in conv.messages])
+    assert encode(history_payload(conv.id, rows), JSON_MEDIA_TYPE) == expected.model_dump_json().encode()
+
+    summary = (conv.id, 3, conv.messages[-1].timestamp)
+    item = ConversationListItem(id=conv.id, message_count=3, last_message_timestamp=conv.messages[-1].timestamp)
+    assert orjson.loads(encode(listing_payload([summary]), JSON_MEDIA_TYPE)) == [item.model_dump(mode="json")]
+
+    unpacked = msgpack.unpackb(encode(history_payload(conv.id, rows), MSGPACK_MEDIA_TYPE))
+    assert unpacked == expected.model_dump(mode="json")
+
+@pytest.mark.asyncio
+async def test_repositories_project_rows_in_both_tiers(session_factory):
+    redis = fakeredis.FakeAsyncRedis()
+    archived, active, empty = _conversation(), _conversation(2), Conversation(id=uuid4(), created_at=datetime(2025, 1, 1))
+    async with session_factory() as session:
+        cold = PostgresConversationRepository(session)
+        await cold.archive([archived, empty])
+        repo = TieredConversationRepository(RedisConversationRepository(redis), cold)
+        await repo.hot.restore(active)
+
+        for conv in (archived, active):
+            expected = [(m.id, m.role, m.content, m.timestamp) for m in conv.messages]
+            assert await repo.history_rows(conv.id) == expected
+        assert await repo.history_rows(empty.id) == []
+        assert await repo.history_rows(uuid4()) is None
+
+        summaries = {row[0]: row[1:] for row in await repo.list_summaries()}
+        assert summaries == {
+            archived.id: (3, archived.messages[-1].timestamp),
+            active.id: (2, active.messages[-1].timestamp),
+            empty.id: (0, None),
+        }
+    await redis.aclose()
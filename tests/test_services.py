@@ -1,7 +1,8 @@
 import pytest
+from contextlib import asynccontextmanager
 from uuid import UUID, uuid4
 from datetime import datetime
-from src.services.conversation_service import ConversationService
+from src.services.conversation_service import ConversationService, drain_pending_writes
 from src.models.schemas import Message, Conversation, MessageCreate
 from src.providers.interface import LLMClient
 
@@ -20,6 +21,9 @@ class MockRepository:
     
     async def get(self, conv_id):
         return self.conversations.get(str(conv_id))
+
+    async def exists(self, conv_id):
+        return str(conv_id) in self.conversations
     
     async def add_message(self, conv_id, message):
         conv = await self.get(conv_id)
@@ -74,4 +78,39 @@ async def test_get_conversation(service):
 async def test_get_nonexistent_conversation(service):
     # Test obtención de conversación inexistente
     with pytest.raises(KeyError):
-        await service.get_conversation(uuid4()) 
\ No newline at end of file
+        await service.get_conversation(uuid4()) 
+
+@pytest.mark.asyncio
+async def test_safety_fast_path_skips_history_and_persists_in_background(mock_repo, mock_llm):
+    @asynccontextmanager
+    async def repo_scope():
+        yield mock_repo
+
+    service = ConversationService(mock_repo, mock_llm, repo_scope=repo_scope)
+    conv = await service.create_conversation()
+    loads = []
+    original_get = mock_repo.get
+
+    async def tracking_get(conv_id):
+        loads.append(conv_id)
+        return await original_get(conv_id)
+
+    mock_repo.get = tracking_get
+    response = await service.safety_fast_path(conv.id, MessageCreate(content="Mi bebé tiene una convulsión"))
+    assert response.role == "assistant"
+    assert "URGENTE" in response.content
+    assert loads == []
+
+    await drain_pending_writes()
+    assert [m.role for m in conv.messages] == ["user", "assistant"]
+
+@pytest.mark.asyncio
+async def test_safety_fast_path_rejects_unknown_conversations(service):
+    with pytest.raises(KeyError):
+        await service.safety_fast_path(uuid4(), MessageCreate(content="Mi bebé tiene una convulsión"))
+
+@pytest.mark.asyncio
+async def test_safety_fast_path_ignores_regular_messages(service):
+    conv = await service.create_conversation()
+    assert await service.safety_fast_path(conv.id, MessageCreate(content="Tiene un poco de tos")) is None
+    assert len(conv.messages) == 0
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from uuid import uuid4
+from datetime import datetime
+from src.models.schemas import Message, SimulationScript
+from src.providers.interface import LLMClient
+from src.services.simulation_service import ConversationSimulator, parse_simulation_scripts
+
+class EchoLLMClient(LLMClient):
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+
+    async def generate(self, context):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return Message(id=uuid4(), role="assistant", content=f"echo: {context[-1].content}", timestamp=datetime.now())
+
+def test_parse_simulation_scripts():
+    scripts = parse_simulation_scripts([
+        '{"id": "a", "turns": ["Hola"]}',
+        '',
+        '{"id": "b", "provider": "openai", "turns": ["Hola", "3 años"]}'
+    ])
+    assert [s.id for s in scripts] == ["a", "b"]
+    assert scripts[1].provider == "openai"
+
+    with pytest.raises(ValueError, match="Línea 1"):
+        parse_simulation_scripts(['{"id": "a", "turns": []}'])
+
+@pytest.mark.asyncio
+async def test_simulator_runs_all_scripts_with_bounded_concurrency():
+    llm = EchoLLMClient()
+    simulator = ConversationSimulator(concurrency=2, llm_factory=lambda settings: llm)
+    scripts = [SimulationScript(id=str(i), turns=["Hola", "Tiene fiebre"]) for i in range(6)]
+
+    results = [result async for result in simulator.run(scripts)]
+
+    assert sorted(r.script_id for r in results) == [str(i) for i in range(6)]
+    assert all(r.status == "ok" for r in results)
+    assert results[0].turns[1].assistant == "echo: Tiene fiebre"
+    assert llm.max_active == 2
+
+@pytest.mark.asyncio
+async def test_simulator_reports_errors_per_script():
+    def failing_factory(settings):
+        raise ValueError("proveedor no configurado")
+
+    simulator = ConversationSimulator(llm_factory=failing_factory)
+    results = [r async for r in simulator.run([SimulationScript(id="x", turns=["Hola"])])]
+
+    assert results[0].status == "error"
+    assert "proveedor no configurado" in results[0].error
+
+def test_endpoint_requires_admin_and_caps_the_body(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from src.api.v1 import simulations
+    from src.core import security
+    from src.core.config import Settings
+    from src.core.exceptions import APIError, api_exception_handler
+
+    settings = Settings(admin_token="secreto", simulation_max_scripts=1, simulation_max_body_bytes=200, _env_file=None)
+    monkeypatch.setattr(security, "get_settings", lambda: settings)
+    monkeypatch.setattr(simulations, "get_settings", lambda: settings)
+    app = FastAPI()
+    app.add_exception_handler(APIError, api_exception_handler)
+    app.include_router(simulations.router)
+    client = TestClient(app)
+    script = '{"id": "a", "turns": ["Hola"]}\n'
+
+    assert client.post("/simulations", content=script).status_code == 401
+    headers = {"X-Admin-Token": "secreto"}
+    assert client.post("/simulations", content=script * 2, headers=headers).status_code == 400
+    assert client.post("/simulations", content=script * 10, headers=headers).status_code == 413
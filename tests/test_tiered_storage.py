@@ -0,0 +1,98 @@
+import time
+from datetime import datetime
+from uuid import uuid4
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.db.postgres_repository import PostgresConversationRepository
+from src.db.redis_repository import RedisConversationRepository
+from src.db.tiered_repository import ConversationArchiver, TieredConversationRepository
+from src.models.schemas import Base, Conversation, Message
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest_asyncio.fixture
+async def stores(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'archive.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    redis = fakeredis.FakeAsyncRedis()
+    yield redis, session_factory
+    await redis.aclose()
+    await engine.dispose()
+
+def tiered(redis, session):
+    return TieredConversationRepository(RedisConversationRepository(redis), PostgresConversationRepository(session))
+
+async def count_messages(session_factory):
+    async with session_factory() as session:
+        return (await session.execute(select(func.count()).select_from(Message))).scalar_one()
+
+@pytest.mark.asyncio
+async def test_hot_conversations_never_touch_postgres(stores):
+    redis, session_factory = stores
+    async with session_factory() as session:
+        repo = tiered(redis, session)
+        conv = await repo.create(Conversation())
+        await repo.add_message(conv.id, Message(role="user", content="Tiene fiebre"))
+        await repo.add_message(conv.id, Message(role="assistant", content="¿Desde cuándo?"))
+
+        loaded = await repo.get(conv.id)
+        assert [m.content for m in loaded.messages] == ["Tiene fiebre", "¿Desde cuándo?"]
+        assert all(m.id and m.timestamp for m in loaded.messages)
+    assert await count_messages(session_factory) == 0
+
+@pytest.mark.asyncio
+async def test_archiver_moves_idle_conversations_and_reads_fall_through(stores):
+    redis, session_factory = stores
+    async with session_factory() as session:
+        repo = tiered(redis, session)
+        conv = await repo.create(Conversation())
+        await repo.add_message(conv.id, Message(role="user", content="Hola"))
+
+    archiver = ConversationArchiver(redis, session_factory, idle_seconds=60, batch_size=10)
+    assert await archiver.run_once(now=time.time()) == 0
+    assert await archiver.run_once(now=time.time() + 61) == 1
+    assert await redis.keys("*") == []
+    assert await count_messages(session_factory) == 1
+
+    async with session_factory() as session:
+        repo = tiered(redis, session)
+        archived = await repo.get(conv.id)
+        assert [m.content for m in archived.messages] == ["Hola"]
+
+        # Escribir en una conversación archivada la devuelve a Redis
+        new_message = Message(role="user", content="Sigue con fiebre")
+        archived.messages.append(new_message)
+        await repo.add_message(conv.id, new_message)
+        hot = await RedisConversationRepository(redis).get(conv.id)
+        assert [m.content for m in hot.messages] == ["Hola", "Sigue con fiebre"]
+
+    # Re-archivar no duplica los mensajes ya presentes en Postgres
+    assert await archiver.run_once(now=time.time() + 61) == 1
+    assert await count_messages(session_factory) == 2
+
+@pytest.mark.asyncio
+async def test_evict_skips_conversations_with_new_activity(stores):
+    redis, _ = stores
+    hot = RedisConversationRepository(redis)
+    conv = await hot.create(Conversation())
+    snapshot, last_activity = await hot.snapshot(conv.id)
+    await hot.add_message(conv.id, Message(role="user", content="Nuevo"))
+    assert not await hot.evict(snapshot, last_activity)
+    assert (await hot.get(conv.id)).messages[0].content == "Nuevo"
+
+@pytest.mark.asyncio
+async def test_concurrent_restores_keep_messages_added_in_between(stores):
+    redis, _ = stores
+    hot = RedisConversationRepository(redis)
+    archived = Conversation(id=uuid4(), messages=[Message(id=uuid4(), role="user", content="Hola", timestamp=datetime.utcnow())])
+    assert await hot.restore(archived)
+    await hot.add_message(archived.id, Message(role="user", content="Primera escritura"))
+
+    # Una segunda restauración con la copia archivada no borra lo agregado
+    assert not await hot.restore(archived)
+    assert [m.content for m in (await hot.get(archived.id)).messages] == ["Hola", "Primera escritura"]
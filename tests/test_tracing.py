@@ -0,0 +1,47 @@
+import json
+import pytest
+from src.core.tracing import OTLPFileExporter, server_timing_header, span, start_trace, traced
+
+@traced("db.get")
+async def fake_query():
+    return "row"
+
+@pytest.mark.asyncio
+async def test_spans_nest_under_active_span():
+    with start_trace() as trace:
+        with span("service.handle_message") as parent:
+            assert await fake_query() == "row"
+            assert await fake_query() == "row"
+
+    queries = [s for s in trace.spans if s.name == "db.get"]
+    assert len(queries) == 2
+    assert all(q.parent_id == parent.span_id for q in queries)
+    assert parent.parent_id is None
+
+    header = server_timing_header(trace)
+    assert 'db.get;dur=' in header and 'desc="x2"' in header
+    assert "service.handle_message;dur=" in header
+
+def test_span_without_trace_is_noop():
+    with span("db.get") as s:
+        assert s is None
+
+def test_otlp_file_export(tmp_path):
+    with start_trace() as trace:
+        with span("total", **{"http.method": "GET"}):
+            with span("db.list_all"):
+                pass
+
+    path = tmp_path / "traces.jsonl"
+    OTLPFileExporter(str(path), "docochat").export(trace)
+
+    payload = json.loads(path.read_text().strip())
+    spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {s["name"] for s in spans} == {"total", "db.list_all"}
+    child = next(s for s in spans if s["name"] == "db.list_all")
+    assert child["traceId"] == trace.trace_id
+    assert "parentSpanId" in child
+
+def test_server_timing_header_on_responses(client):
+    response = client.get("/health")
+    assert response.headers["Server-Timing"].startswith("total;dur=")
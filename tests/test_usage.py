@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.core.config import Settings
+from src.models.schemas import Base, Conversation, Message
+from src.providers.adapters.synthetic_adapter import SyntheticAdapter
+from src.services.usage_service import UsageTracker, conversation_usage_from_messages
+
+def _reply(phase, prompt_tokens, completion_tokens, latency_ms, provider="openai", model="gpt-4o-mini"):
+    return Message(
+        role="assistant", content="respuesta", provider=provider, model=model, phase=phase,
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+        provider_latency_ms=latency_ms, queue_ms=1.0
+    )
+
+@pytest.mark.asyncio
+async def test_adapter_reports_tokens_phase_and_latency():
+    adapter = SyntheticAdapter(Settings(llm_provider="synthetic", synthetic_seed=1, _env_file=None))
+    reply = await adapter.generate([Message(role="user", content="Mi hija tiene fiebre")])
+    assert reply.phase
+    assert reply.prompt_tokens > 0
+    assert reply.completion_tokens > 0
+    assert reply.provider_latency_ms >= 0
+
+@pytest.mark.asyncio
+async def test_tracker_aggregates_per_conversation_and_model():
+    fakeredis = pytest.importorskip("fakeredis")
+    tracker = UsageTracker(fakeredis.FakeAsyncRedis())
+    conv_id = uuid4()
+    await tracker.record(conv_id, _reply("initial", 100, 20, 300.0))
+    await tracker.record(conv_id, _reply("discovery", 150, 30, 500.0))
+    await tracker.record(uuid4(), _reply("initial", 80, 10, 200.0, provider="gemini", model="gemini-2.0-flash"))
+
+    usage = await tracker.conversation_usage(conv_id)
+    assert usage.totals.messages == 2
+    assert usage.totals.total_tokens == 300
+    assert usage.totals.avg_provider_latency_ms == 400.0
+    assert usage.phases["discovery"].prompt_tokens == 150
+
+    by_model = {(u.provider, u.model): u for u in await tracker.provider_usage()}
+    assert by_model[("openai", "gpt-4o-mini")].totals.completion_tokens == 50
+    assert by_model[("gemini", "gemini-2.0-flash")].phases["initial"].messages == 1
+    assert await tracker.conversation_usage(uuid4()) is None
+
+@pytest.mark.asyncio
+async def test_usage_recomputed_from_messages(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'usage.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        now = datetime(2025, 1, 1)
+        first, second = _reply("initial", 100, 20, 300.0), _reply("initial", 50, 5, 100.0)
+        first.timestamp, second.timestamp = now, now + timedelta(seconds=1)
+        conv = Conversation(created_at=now, messages=[Message(role="user", content="hola", timestamp=now), first, second])
+        empty = Conversation(created_at=now)
+        session.add_all([conv, empty])
+        await session.commit()
+
+        usage = await conversation_usage_from_messages(session, conv.id)
+        assert (usage.totals.messages, usage.totals.total_tokens) == (2, 175)
+        assert usage.phases["initial"].provider_latency_ms == 400.0
+        assert (await conversation_usage_from_messages(session, empty.id)).totals.messages == 0
+        assert await conversation_usage_from_messages(session, uuid4()) is None
+    await engine.dispose()
+
+@pytest.mark.asyncio
+async def test_expired_aggregate_is_rebuilt_before_incrementing(tmp_path):
+    fakeredis = pytest.importorskip("fakeredis")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'usage.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    tracker = UsageTracker(fakeredis.FakeAsyncRedis(), session_factory=factory)
+
+    now = datetime(2025, 1, 1)
+    first, second = _reply("initial", 100, 20, 300.0), _reply("discovery", 50, 5, 100.0)
+    first.timestamp, second.timestamp = now, now + timedelta(seconds=1)
+    conv = Conversation(created_at=now, messages=[first])
+    async with factory() as session:
+        session.add(conv)
+        await session.commit()
+    await tracker.record(conv.id, first)
+    # El hash expira y llega una respuesta nueva (ya guardada en messages)
+    await tracker.redis.delete(f"usage:conv:{conv.id}")
+    async with factory() as session:
+        second.conversation_id = conv.id
+        session.add(second)
+        await session.commit()
+    await tracker.record(conv.id, second)
+
+    usage = await tracker.conversation_usage(conv.id)
+    assert (usage.totals.messages, usage.totals.total_tokens) == (2, 175)
+    assert usage.phases["discovery"].messages == 1
+
+    # Sin conversación en Postgres (tier caliente) se suma sin recalcular
+    other = uuid4()
+    await tracker.record(other, _reply("initial", 10, 1, 1.0))
+    assert (await tracker.conversation_usage(other)).totals.messages == 1
+    await engine.dispose()
@@ -0,0 +1,71 @@
+from uuid import uuid4
+import httpx
+import pytest
+from src.cache.versions import VersionStore, etag_matches
+from src.core.config import get_settings_manager
+from src.db import session as db_session
+from src.main import app
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def test_etag_matches_if_none_match_lists():
+    assert etag_matches('"a.1-json"', '"a.1-json"')
+    assert etag_matches('"x", W/"a.1-json"', '"a.1-json"')
+    assert not etag_matches('"a.1-msgpack"', '"a.1-json"')
+    assert not etag_matches("*", '"a.1-json"')
+    assert not etag_matches(None, '"a.1-json"')
+
+@pytest.mark.asyncio
+async def test_versions_change_only_with_writes():
+    redis = fakeredis.FakeAsyncRedis()
+    versions = VersionStore(redis)
+    conv_id, other_id = uuid4(), uuid4()
+    etag = await versions.conversation_etag(conv_id, "json")
+    other = await versions.conversation_etag(other_id, "json")
+    listing = await versions.listing_etag("json")
+    assert await versions.conversation_etag(conv_id, "json") == etag
+    assert await versions.conversation_etag(conv_id, "msgpack") != etag
+
+    await versions.touch([conv_id])
+    assert await versions.conversation_etag(conv_id, "json") != etag
+    assert await versions.conversation_etag(other_id, "json") == other
+    assert await versions.listing_etag("json") != listing
+
+    other = await versions.conversation_etag(other_id, "json")
+    await versions.invalidate_all()
+    assert await versions.conversation_etag(other_id, "json") != other
+
+    # Una versión perdida no vuelve a un valor ya emitido
+    etag = await versions.conversation_etag(conv_id, "json")
+    await redis.flushall()
+    assert await versions.conversation_etag(conv_id, "json") != etag
+    await redis.aclose()
+
+@pytest.mark.asyncio
+async def test_conditional_history_and_listing(tmp_path, monkeypatch):
+    manager = get_settings_manager()
+    monkeypatch.setattr(manager, "_current", manager.current.model_copy(update={
+        "llm_provider": "synthetic", "conversation_store": "postgres"
+    }))
+    await db_session.init_db(f"sqlite+aiosqlite:///{tmp_path / 'etag.db'}")
+    app.state.redis = fakeredis.FakeAsyncRedis()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            conv_id = (await client.post("/conversations")).json()["id"]
+            first = await client.get(f"/conversations/{conv_id}/history")
+            etag = first.headers["ETag"]
+            cached = await client.get(f"/conversations/{conv_id}/history", headers={"If-None-Match": etag})
+            assert (cached.status_code, cached.headers["ETag"], cached.content) == (304, etag, b"")
+
+            listing = await client.get("/conversations")
+            assert (await client.get("/conversations", headers={"If-None-Match": listing.headers["ETag"]})).status_code == 304
+
+            await client.post(f"/conversations/{conv_id}/messages", json={"msg": {"content": "Tiene tos"}})
+            fresh = await client.get(f"/conversations/{conv_id}/history", headers={"If-None-Match": etag})
+            assert fresh.status_code == 200
+            assert len(fresh.json()["messages"]) == 2
+            assert (await client.get("/conversations", headers={"If-None-Match": listing.headers["ETag"]})).status_code == 200
+    finally:
+        await app.state.redis.aclose()
+        del app.state.redis
+        await db_session.close_db()